@@ -0,0 +1,296 @@
+"""Benchmarks of the script executor against a generated script tree.
+
+Generates a synthetic tree of check/remediation scripts, then times the
+GUI's hot paths under the offscreen Qt platform and writes the results as
+JSON that can be compared with an earlier run:
+
+    python benchmark.py --files 10000 -o before.json
+    python benchmark.py --files 10000 -o after.json --baseline before.json
+
+Every timing is reported as min/median/max seconds over --repeat runs;
+comparisons use the median.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RESULTS_VERSION = 1
+# Default allowed slowdown of a median against the baseline before it counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Changes smaller than this are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.001
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the script executor on a synthetic script tree.")
+    parser.add_argument("--files", type=int, default=1000, help="number of scripts to generate (default: 1000)")
+    parser.add_argument("--per-dir", type=int, default=20, help="scripts per leaf directory (default: 20)")
+    parser.add_argument("--fanout", type=int, default=8, help="subdirectories per directory (default: 8)")
+    parser.add_argument("--rem-ratio", type=float, default=0.5, help="share of remediation scripts (default: 0.5)")
+    parser.add_argument("--fail-ratio", type=float, default=0.1, help="share of checks that print FAIL")
+    parser.add_argument("--max-output-lines", type=int, default=2000,
+                        help="largest output of a script; most print far less (default: 2000)")
+    parser.add_argument("--max-sleep-ms", type=int, default=20, help="longest script duration (default: 20)")
+    parser.add_argument("--run-count", type=int, default=200, help="scripts run for the throughput test")
+    parser.add_argument("--append-lines", type=int, default=200_000, help="lines appended in the console test")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timing (default: 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tree", type=Path, help="use (or create) the script tree here instead of a temp dir")
+    parser.add_argument("-o", "--output", type=Path, help="write the results JSON here (default: stdout)")
+    parser.add_argument("--baseline", type=Path, help="compare against a results JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown of a median against the baseline, as a fraction (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+# Synthetic tree
+
+def script_body(name, lines, sleep_ms, fails):
+    body = ["#!/bin/bash", f"# title: Synthetic script {name}"]
+    if lines:
+        body.append(f'yes "{name}: synthetic output line" | head -n {lines}')
+    if sleep_ms:
+        body.append(f"sleep {sleep_ms / 1000:.3f}")
+    body.append(f'echo "{name}: {"FAIL" if fails else "PASS"}"')
+    return "\n".join(body) + "\n"
+
+
+def output_lines(rng, max_lines):
+    """Mostly short outputs with a long tail, like real checks."""
+    return min(max_lines, int(rng.paretovariate(1.2)) - 1)
+
+
+def generate_tree(root, files, per_dir=20, fanout=8, rem_ratio=0.5, fail_ratio=0.1, max_output_lines=2000,
+                  max_sleep_ms=20, seed=0):
+    """Write a tree of numbered sections holding files scripts; returns the base directory."""
+    rng = random.Random(seed)
+    base = Path(root) / "scripts" / "ubuntu" / "v22.04"
+    leaves = max(1, -(-files // per_dir))
+    depth = 1
+    while fanout ** depth < leaves:
+        depth += 1
+    written = 0
+    for leaf in range(leaves):
+        digits, n = [], leaf
+        for _ in range(depth):
+            digits.append(n % fanout + 1)
+            n //= fanout
+        digits.reverse()
+        parts = [".".join(map(str, digits[:level + 1])) + f"_section{level}" for level in range(depth)]
+        directory = base.joinpath(*parts)
+        directory.mkdir(parents=True, exist_ok=True)
+        prefix = ".".join(map(str, digits))
+        for i in range(min(per_dir, files - written)):
+            kind = "rem" if rng.random() < rem_ratio else "chk"
+            name = f"{prefix}.{i + 1}_{kind}.sh"
+            fails = kind == "chk" and rng.random() < fail_ratio
+            body = script_body(name, output_lines(rng, max_output_lines), rng.randint(0, max_sleep_ms), fails)
+            (directory / name).write_text(body)
+            written += 1
+    return base
+
+
+# Timing
+
+def timed(fn, repeat, setup=None):
+    """Run fn repeat times and return min/median/max seconds; setup runs untimed before each."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "max": max(times), "runs": repeat}
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+
+    def pick(q):
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": samples[-1]}
+
+
+def benchmark_app(base_dir, args):
+    """Time the GUI's tree, catalog, run and console paths; returns {name: result}."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QEventLoop, QTimer
+    from PySide6.QtWidgets import QApplication
+
+    import main3
+    from script_search import SearchIndex
+
+    class BenchmarkApp(main3.ScriptExecutorApp):
+        def get_base_directory(self):
+            return base_dir
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = BenchmarkApp()
+    results = {}
+
+    def expand_all():
+        model = window.tree_model
+        pending = [model.root_index()]
+        while pending:
+            index = pending.pop()
+            while model.canFetchMore(index):
+                model.fetchMore(index)
+            pending.extend(model.index(row, 0, index) for row in range(model.rowCount(index))
+                           if model.hasChildren(model.index(row, 0, index)))
+
+    results["populate_tree"] = timed(window.populate_tree, args.repeat)
+    results["expand_all"] = timed(expand_all, args.repeat, setup=window.populate_tree)
+
+    def cold_catalog():
+        window.catalog = main3.ScriptCatalog(base_dir, cache_path=Path(tempfile.mkdtemp()) / "catalog.json")
+        window.catalog_loaded = False
+
+    results["catalog_scan"] = timed(window.refresh_catalog, args.repeat, setup=cold_catalog)
+    results["catalog_revalidate"] = timed(window.refresh_catalog, args.repeat)
+    results["get_scripts_by_name_category"] = timed(lambda: window.get_scripts_by_name("chk"), args.repeat)
+    keywords = iter(f"{n}." for n in range(1, 10 ** 6))
+    results["get_scripts_by_name_substring"] = timed(lambda: window.get_scripts_by_name(next(keywords)),
+                                                     args.repeat)
+    sections = sorted(p for p in base_dir.iterdir() if p.is_dir())
+    results["get_scripts_in_folder"] = timed(lambda: [window.get_scripts_in_folder(s) for s in sections],
+                                             args.repeat)
+
+    # Script search: index build, and the synchronous part of every keystroke while typing queries
+    results["search_index_build"] = timed(lambda: SearchIndex.from_catalog(window.catalog), args.repeat)
+    index = SearchIndex.from_catalog(window.catalog)
+    keystrokes = []
+    for query in ("chk", "1.2.3", "rem 2.1", "zzz"):
+        search = None
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            search = index.search(query[:end], search)
+            search.step()
+            keystrokes.append(time.perf_counter() - start)
+            while not search.step():
+                pass
+    results["search_keystroke"] = percentiles(keystrokes)
+
+    # Run throughput: a fixed sample of scripts through the worker pool, waiting on all_finished
+    scripts = window.get_scripts_by_name(".sh")
+    sample = random.Random(args.seed).sample(scripts, min(args.run_count, len(scripts)))
+    window.force_refresh_checkbox.setChecked(True)
+    loop = QEventLoop()
+    window.pool.all_finished.connect(loop.quit)
+    start = time.perf_counter()
+    window.run_scripts(sample)
+    if not window.pool.is_idle():
+        loop.exec()
+    elapsed = time.perf_counter() - start
+    results["run_throughput"] = {"scripts": len(sample), "seconds": elapsed,
+                                 "scripts_per_second": len(sample) / elapsed if elapsed else None,
+                                 "workers": window.pool.max_workers}
+
+    # Console: append latency per batch as a streaming script would, and the cost of painting it
+    console = window.output_display
+    console.clear()
+    batch = [f"synthetic output line {i}" for i in range(50)]
+    append_times = []
+    start = time.perf_counter()
+    for _ in range(args.append_lines // len(batch)):
+        t = time.perf_counter()
+        console.append_lines(batch, "benchmark")
+        append_times.append(time.perf_counter() - t)
+    flush_start = time.perf_counter()
+    console.flush()
+    app.processEvents()
+    results["output_append"] = {"lines": len(append_times) * len(batch), "seconds": time.perf_counter() - start,
+                                "flush_seconds": time.perf_counter() - flush_start,
+                                "batch_latency": percentiles(append_times)}
+
+    QTimer.singleShot(0, window.close)
+    app.processEvents()
+    return results
+
+
+def median_of(result):
+    """The number a comparison looks at: the median for timings, total seconds otherwise."""
+    return result.get("median", result.get("seconds"))
+
+
+def compare(results, baseline, tolerance):
+    """Return (lines describing each change, names of benchmarks that regressed)."""
+    lines, regressed = [], []
+    for name, result in results["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old is None or not median_of(old) or median_of(result) is None:
+            continue
+        ratio = median_of(result) / median_of(old)
+        flag = ""
+        if ratio > 1 + tolerance and median_of(result) - median_of(old) > MIN_REGRESSION_SECONDS:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        lines.append(f"{name:32} {median_of(old):10.4f}s -> {median_of(result):10.4f}s  x{ratio:.2f}{flag}")
+    if baseline.get("params") != results["params"]:
+        lines.append("Note: the baseline was generated with different parameters.")
+    return lines, regressed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = Path(tempfile.mkdtemp(prefix="script-executor-bench-"))
+    # Keep caches and logs of the benchmark away from the user's
+    os.environ["XDG_CACHE_HOME"] = str(workdir / "cache")
+    tree_root = args.tree or workdir / "tree"
+    base_dir = tree_root / "scripts" / "ubuntu" / "v22.04"
+
+    params = {name: getattr(args, name) for name in ("files", "per_dir", "fanout", "rem_ratio", "fail_ratio",
+                                                     "max_output_lines", "max_sleep_ms", "run_count",
+                                                     "append_lines", "repeat", "seed")}
+    start = time.perf_counter()
+    if not base_dir.exists():
+        generate_tree(tree_root, args.files, args.per_dir, args.fanout, args.rem_ratio, args.fail_ratio,
+                      args.max_output_lines, args.max_sleep_ms, args.seed)
+    generate_seconds = time.perf_counter() - start
+
+    cwd = os.getcwd()
+    os.chdir(workdir)  # The app writes its log files to the working directory
+    try:
+        timings = benchmark_app(base_dir.resolve(), args)
+    finally:
+        os.chdir(cwd)
+        from run_logging import stop_logging
+        stop_logging()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    import PySide6
+    from PySide6.QtCore import qVersion
+    results = {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "pyside": getattr(PySide6, "__version__", None),
+                        "qt": qVersion(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "params": params,
+        "generate_seconds": generate_seconds,
+        "results": timings,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print("\n".join(lines), file=sys.stderr)
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Expected script durations, learnt from the run history.
+
+They drive three things: the longest expected scripts are started first
+(LPT scheduling, which keeps a few slow checks from starting last and
+setting the length of the whole run), the remaining-time estimate of a
+run, and a warning when a script suddenly takes much longer than it used to.
+"""
+import statistics
+import time
+from collections import deque
+
+from run_history import DURATION_SAMPLES
+
+# Expected seconds of a script nothing is known about, when nothing is known about any script
+DEFAULT_EXPECTED = 1.0
+# A script regressed when it took this many times its median...
+REGRESSION_FACTOR = 3.0
+# ...and at least this many seconds more, so jitter in quick scripts never warns
+REGRESSION_MIN_SECONDS = 5.0
+# Durations needed before a script's median is trusted for regression warnings
+REGRESSION_MIN_SAMPLES = 3
+# Bounds of the factor that scales expected durations to how fast the current run is going
+PACE_LIMITS = (0.25, 4.0)
+
+
+class DurationStats:
+    """The latest wall-clock durations of every script, keyed by path string."""
+
+    def __init__(self, samples=DURATION_SAMPLES):
+        self.max_samples = samples
+        self.samples = {}  # path -> deque of seconds, oldest first
+        self.medians = {}  # path -> median of its samples, computed when first asked for
+        self._default = None
+
+    @classmethod
+    def from_history(cls, history, samples=DURATION_SAMPLES):
+        stats = cls(samples)
+        for path, walls in history.recent_durations():
+            stats.samples[path] = deque(walls, maxlen=samples)
+        return stats
+
+    def add(self, path, seconds):
+        """Record one finished run of a script."""
+        key = str(path)
+        durations = self.samples.get(key)
+        if durations is None:
+            durations = self.samples[key] = deque(maxlen=self.max_samples)
+        durations.append(seconds)
+        self.medians.pop(key, None)
+        self._default = None
+
+    def median(self, path):
+        """Return the median of a script's recorded durations, or None."""
+        key = str(path)
+        median = self.medians.get(key)
+        if median is None:
+            durations = self.samples.get(key)
+            if not durations:
+                return None
+            median = self.medians[key] = statistics.median(durations)
+        return median
+
+    def default(self):
+        """Expected seconds of a script with no history: the median over all known scripts."""
+        if self._default is None:
+            medians = [self.median(path) for path in self.samples]
+            self._default = statistics.median(medians) if medians else DEFAULT_EXPECTED
+        return self._default
+
+    def expected(self, scripts):
+        """Return {script: expected seconds} for scripts, guessing for the ones never run."""
+        default = self.default()
+        result = {}
+        for script in scripts:
+            median = self.median(script)
+            result[script] = default if median is None else median
+        return result
+
+    def regression(self, path, seconds):
+        """Return the usual duration of a script if seconds is far above it, else None."""
+        durations = self.samples.get(str(path))
+        if not durations or len(durations) < REGRESSION_MIN_SAMPLES:
+            return None
+        median = self.median(path)
+        if seconds > median * REGRESSION_FACTOR and seconds - median > REGRESSION_MIN_SECONDS:
+            return median
+        return None
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds // 60 % 60:02d}m"
+
+
+class RunEstimate:
+    """Remaining time and throughput of one run, from expected durations and progress so far.
+
+    Expected durations are scaled by the run's pace: how long the scripts
+    finished so far took compared with what was expected of them.
+    """
+
+    def __init__(self, now=None):
+        self.started = time.monotonic() if now is None else now
+        self.expected = {}  # queued or running script -> expected seconds
+        self.running = {}  # script -> start time
+        self.queued_seconds = 0.0
+        self.expected_done = 0.0
+        self.actual_done = 0.0
+        self.done = 0
+
+    def add(self, expected):
+        """Count queued scripts, given as {script: expected seconds}; returns the ones not counted yet."""
+        added = []
+        for script, seconds in expected.items():
+            if script not in self.expected:
+                self.expected[script] = seconds
+                self.queued_seconds += seconds
+                added.append(script)
+        return added
+
+    def remove(self, scripts):
+        """Stop counting queued scripts that will not run after all."""
+        for script in scripts:
+            if script in self.expected and script not in self.running:
+                self.queued_seconds -= self.expected.pop(script)
+
+    def start(self, script, now=None):
+        if script in self.expected and script not in self.running:
+            self.running[script] = time.monotonic() if now is None else now
+            self.queued_seconds -= self.expected[script]
+
+    def finish(self, script, seconds=None):
+        """Count a finished (or dropped, with seconds None) script."""
+        self.done += 1
+        expected = self.expected.pop(script, None)
+        if expected is None:
+            return
+        if self.running.pop(script, None) is None:
+            self.queued_seconds -= expected
+        if seconds is not None:
+            self.expected_done += expected
+            self.actual_done += seconds
+
+    def pace(self):
+        if not self.expected_done or not self.actual_done:
+            return 1.0
+        return min(max(self.actual_done / self.expected_done, PACE_LIMITS[0]), PACE_LIMITS[1])
+
+    def remaining(self, workers, now=None):
+        """Estimated seconds until the run is done with workers scripts at a time."""
+        now = time.monotonic() if now is None else now
+        pace = self.pace()
+        running = [max(self.expected[script] * pace - (now - started), 0.0)
+                   for script, started in self.running.items()]
+        total = max(self.queued_seconds, 0.0) * pace + sum(running)
+        return max(total / max(1, workers), max(running, default=0.0))
+
+    def throughput(self, now=None):
+        """Scripts finished per second since the run started."""
+        elapsed = (time.monotonic() if now is None else now) - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
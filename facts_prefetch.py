@@ -0,0 +1,285 @@
+"""Shared snapshot of system facts that check scripts would otherwise each collect.
+
+A check declares the facts it reads in its header:
+
+    # facts: dpkg sysctl
+
+Before a batch of checks starts, every fact its scripts declare is
+brought up to date in the snapshot directory, the collectors running in
+parallel. Scripts find it through $SCRIPT_FACTS_DIR, which is set for
+every script:
+
+    if [ -r "$SCRIPT_FACTS_DIR/dpkg-l.txt" ]; then list=$(cat "$SCRIPT_FACTS_DIR/dpkg-l.txt")
+    else list=$(dpkg -l); fi
+
+A fact file exists only while it is valid, so a script must fall back to
+collecting the fact itself when the file is missing. Invalidation rules:
+
+- a fact is collected again once any of its input files changed (by stat)
+  or it is older than its max_age;
+- queueing any script that is not a check (a remediation) drops the whole
+  snapshot, since it may change what the facts describe;
+- so does a run that skips the prefetch (turned off, or no script declares
+  any fact), since nothing revalidated the files left by earlier runs;
+- a collector that fails or times out leaves no file behind.
+
+The saving reported per fact assumes every script that declared it would
+have spent as long collecting it as the collector did, minus the time the
+collector itself took in this run (nothing when it was reused).
+"""
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from result_cache import DPKG_STATUS, file_fingerprint
+from script_catalog import default_cache_dir
+from script_meta import meta_list, read_metadata
+
+# Environment variable that points scripts at the snapshot directory
+FACTS_ENV = "SCRIPT_FACTS_DIR"
+MANIFEST_NAME = "facts.json"
+# Seconds a collector may take before it is killed and its fact left out
+COLLECT_TIMEOUT = 300
+
+# file: name in the snapshot directory; command: collector to run, or path: file to copy;
+# inputs: files whose change invalidates the fact; max_age: seconds it stays valid at most;
+# ok_codes: exit statuses of command that still give a usable result
+Fact = namedtuple("Fact", "file command path inputs max_age ok_codes", defaults=((), 0, (0,)))
+
+FACTS = {
+    "dpkg": Fact("dpkg-l.txt", ("dpkg", "-l"), None, (DPKG_STATUS,), 24 * 3600),
+    "sysctl": Fact("sysctl-a.txt", ("sysctl", "-a"), None, (), 600),
+    "login-defs": Fact("login.defs", None, "/etc/login.defs", ("/etc/login.defs",), 24 * 3600),
+    "mounts": Fact("mounts", None, "/proc/self/mounts", (), 0),
+    # find exits with 1 when it could not read some directories; what it did find is still listed
+    "suid": Fact("suid-files.txt", ("find", "/", "-xdev", "-type", "f", "-perm", "/6000"), None, (), 3600, (0, 1)),
+}
+
+
+def facts_dir():
+    """Return the directory the snapshot is kept in."""
+    return default_cache_dir() / "facts"
+
+
+def declared_facts(script_path):
+    """Return the known facts a script declares in its "# facts:" header."""
+    return [name for name in meta_list(read_metadata(script_path), "facts") if name in FACTS]
+
+
+def facts_for(scripts):
+    """Return the set of facts declared by any of scripts."""
+    names = set()
+    for script in scripts:
+        names.update(declared_facts(script))
+    return names
+
+
+def is_check_batch(scripts):
+    """True if every script is a check, so running them leaves the facts as they are."""
+    return all("chk" in Path(script).name for script in scripts)
+
+
+class FactsReport:
+    """What the snapshot held for one run and how many scripts used each fact."""
+
+    def __init__(self):
+        self.facts = {}  # name -> {"seconds", "spent", "reused", "error", "consumers", "available"}
+
+    def add(self, name, seconds, spent=0.0, reused=False, error=None):
+        self.facts[name] = {"seconds": seconds, "spent": spent, "reused": reused, "error": error,
+                            "consumers": 0, "available": error is None}
+
+    def use(self, script_path):
+        """Count a script run while the snapshot was in place."""
+        for name in declared_facts(script_path):
+            info = self.facts.get(name)
+            if info is not None and info["available"]:
+                info["consumers"] += 1
+
+    def drop(self):
+        """Stop counting: the snapshot was dropped."""
+        for info in self.facts.values():
+            info["available"] = False
+
+    def saved(self, name):
+        info = self.facts[name]
+        if info["error"] is not None:
+            return 0.0
+        return info["seconds"] * info["consumers"] - info["spent"]
+
+    def total_saved(self):
+        return sum(self.saved(name) for name in self.facts)
+
+    def describe(self):
+        """One line about the snapshot as it was prepared."""
+        parts = []
+        for name, info in sorted(self.facts.items()):
+            if info["error"] is not None:
+                parts.append(f"{name} failed ({info['error']})")
+            elif info["reused"]:
+                parts.append(f"{name} reused")
+            else:
+                parts.append(f"{name} {info['spent']:.2f}s")
+        return "Facts prefetched: " + ", ".join(parts)
+
+    def lines(self):
+        """Per-fact time saved, for the end-of-run summary."""
+        lines = [f"Time saved by prefetched facts: {self.total_saved():.1f}s"]
+        for name, info in sorted(self.facts.items()):
+            if info["error"] is not None:
+                lines.append(f"  {name}: not available ({info['error']})")
+            else:
+                how = "reused" if info["reused"] else f"collected in {info['spent']:.2f}s"
+                lines.append(f"  {name}: {self.saved(name):.1f}s saved, read by {info['consumers']} scripts ({how})")
+        return lines
+
+    def records(self):
+        return [{"fact": name, "saved": round(self.saved(name), 3), "consumers": info["consumers"],
+                 "collect_seconds": round(info["seconds"], 3), "spent": round(info["spent"], 3),
+                 "reused": info["reused"], "error": info["error"]}
+                for name, info in sorted(self.facts.items())]
+
+
+class FactsSnapshot:
+    """The snapshot directory: its fact files and a manifest of when and from what they were collected."""
+
+    def __init__(self, directory=None, facts=FACTS):
+        self.directory = Path(directory or facts_dir())
+        self.facts = facts
+        self.procs = set()  # Running collector processes, killed by cancel()
+        self.lock = threading.Lock()
+        self.cancelled = False
+
+    def prepare(self, names):
+        """Make every fact in names valid, collecting stale ones in parallel; returns a FactsReport.
+
+        Invalid facts are removed whether they are needed or not.
+        """
+        self.cancelled = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = self._read_manifest()
+        report = FactsReport()
+        now = time.time()
+        stale = []
+        for name in self.facts:
+            entry = manifest.get(name)
+            if entry is not None and self._valid(name, entry, now):
+                if name in names:
+                    report.add(name, entry["seconds"], reused=True)
+                continue
+            manifest.pop(name, None)
+            self._remove(name)
+            if name in names:
+                stale.append(name)
+        if stale:
+            with ThreadPoolExecutor(max_workers=len(stale)) as executor:
+                try:
+                    results = list(executor.map(self._collect, stale))
+                except KeyboardInterrupt:
+                    self.cancel()
+                    raise
+            for name, (entry, error) in zip(stale, results, strict=True):
+                if entry is None:
+                    report.add(name, 0.0, error=error)
+                else:
+                    manifest[name] = entry
+                    report.add(name, entry["seconds"], spent=entry["seconds"])
+        self._write_manifest(manifest)
+        return report
+
+    def drop(self):
+        """Remove every fact file and the manifest."""
+        for name in self.facts:
+            self._remove(name)
+        try:
+            os.unlink(self.directory / MANIFEST_NAME)
+        except OSError:
+            pass
+
+    def cancel(self):
+        """Kill running collectors; their facts are left out."""
+        with self.lock:
+            self.cancelled = True
+            for proc in self.procs:
+                proc.kill()
+
+    def _valid(self, name, entry, now):
+        fact = self.facts[name]
+        if now - entry.get("collected", 0) > fact.max_age or not (self.directory / fact.file).is_file():
+            return False
+        return all(entry.get("inputs", {}).get(path) == file_fingerprint(path) for path in fact.inputs)
+
+    def _collect(self, name):
+        """Collect one fact; returns (manifest entry, None) or (None, error message)."""
+        fact = self.facts[name]
+        target = self.directory / fact.file
+        tmp_path = target.with_name(target.name + ".tmp")
+        # Fingerprinted first, so a change while collecting invalidates the fact next time
+        inputs = {path: file_fingerprint(path) for path in fact.inputs}
+        started = time.monotonic()
+        try:
+            if fact.command is None:
+                shutil.copyfile(fact.path, tmp_path)
+            else:
+                error = self._run(fact, tmp_path)
+                if error is not None:
+                    os.unlink(tmp_path)
+                    return None, error
+            os.replace(tmp_path, target)
+        except OSError as e:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return None, e.strerror or str(e)
+        return {"collected": time.time(), "seconds": time.monotonic() - started, "inputs": inputs}, None
+
+    def _run(self, fact, out_path):
+        with open(out_path, "wb") as out:
+            with self.lock:
+                if self.cancelled:
+                    return "cancelled"
+                proc = subprocess.Popen(fact.command, stdin=subprocess.DEVNULL, stdout=out, stderr=subprocess.DEVNULL,
+                                        start_new_session=True)
+                self.procs.add(proc)
+            try:
+                returncode = proc.wait(timeout=COLLECT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                return f"timed out after {COLLECT_TIMEOUT}s"
+            finally:
+                with self.lock:
+                    self.procs.discard(proc)
+        if self.cancelled:
+            return "cancelled"
+        if returncode not in fact.ok_codes:
+            return f"{fact.command[0]} exited with {returncode}"
+        return None
+
+    def _remove(self, name):
+        try:
+            os.unlink(self.directory / self.facts[name].file)
+        except OSError:
+            pass
+
+    def _read_manifest(self):
+        try:
+            with open(self.directory / MANIFEST_NAME) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest if isinstance(manifest, dict) else {}
+
+    def _write_manifest(self, manifest):
+        path = self.directory / MANIFEST_NAME
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,260 @@
+"""Run the same scripts on many hosts over pooled, persistent connections."""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from script_runner import RunControl, not_started, run_script, script_timeout
+
+# How long an idle SSH master connection stays open after the run, in seconds
+CONTROL_PERSIST = 60
+DEFAULT_PER_HOST_LIMIT = 4
+DEFAULT_GLOBAL_LIMIT = 32
+
+# Interpreter running the script on the remote side, by suffix
+REMOTE_INTERPRETERS = {".sh": "bash", ".py": "python3"}
+# Remote shell command that saves the script sent on stdin to a temporary file and runs it with
+# stdin from /dev/null, as locally; the file is removed however the script ends
+REMOTE_COMMAND = ('f=$(mktemp) || exit; trap \'rm -f "$f"\' EXIT; trap \'exit 129\' HUP INT TERM; '
+                  'cat > "$f" && {interpreter} "$f" </dev/null')
+
+
+class TransportError(Exception):
+    """Raised when a host cannot be reached."""
+
+
+class Transport:
+    """Connection to one host that can run scripts on it."""
+
+    def __init__(self, host):
+        self.host = host
+
+    def connect(self):
+        """Open the connection; called once before the first script."""
+
+    def run(self, script_path, on_lines=None, control=None, timeout=None):
+        """Run a script on the host and return a ScriptRun.
+
+        It is killed after timeout seconds, or when control (a RunControl) is
+        cancelled or passes its deadline.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Close the connection."""
+
+
+class LocalTransport(Transport):
+    """Stand-in transport that "pushes" scripts to a private directory and runs them locally.
+
+    It goes through the same connect/push/run/close steps as a remote
+    transport, so fan-out runs can be exercised without any remote hosts.
+    """
+
+    def __init__(self, host):
+        super().__init__(host)
+        self.workdir = None
+
+    def connect(self):
+        self.workdir = tempfile.mkdtemp(prefix=f"fanout-{self.host.replace('/', '_')}-")
+
+    def push(self, script_path):
+        """Copy the script into the host's directory and return the copy's path."""
+        target_dir = os.path.join(self.workdir, script_path.parent.as_posix().strip("/").replace("/", "_"))
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, script_path.name)
+        shutil.copyfile(script_path, target)
+        return target
+
+    def run(self, script_path, on_lines=None, control=None, timeout=None):
+        target = self.push(script_path)
+        command = ["bash", target] if script_path.suffix == ".sh" else ["python3", target]
+        return run_script(script_path, on_lines=on_lines, command=command, timeout=timeout, control=control)
+
+    def close(self):
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
+
+
+class SSHTransport(Transport):
+    """Runs scripts over one multiplexed SSH master connection per host.
+
+    The script is streamed to the host on stdin and run from a temporary
+    file there (see REMOTE_COMMAND), so a script reading stdin gets end of
+    file instead of its own source, nothing is left behind on the host and
+    every script reuses the same TCP and authentication session.
+    """
+
+    def __init__(self, host, ssh_options=()):
+        super().__init__(host)
+        self.ssh_options = list(ssh_options)
+        self.control_dir = None
+        self.control_path = None
+
+    def base_command(self):
+        return ["ssh", "-o", "BatchMode=yes", "-o", f"ControlPath={self.control_path}", *self.ssh_options]
+
+    def connect(self):
+        self.control_dir = tempfile.mkdtemp(prefix="fanout-ssh-")
+        self.control_path = os.path.join(self.control_dir, "master")
+        command = self.base_command() + ["-o", "ControlMaster=yes", "-o", f"ControlPersist={CONTROL_PERSIST}",
+                                         "-N", "-f", self.host]
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise TransportError(f"Could not connect to {self.host}: {result.stderr.strip()}")
+
+    def run(self, script_path, on_lines=None, control=None, timeout=None):
+        interpreter = REMOTE_INTERPRETERS.get(script_path.suffix, "bash")
+        command = self.base_command() + [self.host, REMOTE_COMMAND.format(interpreter=interpreter)]
+        with open(script_path, "rb") as script:
+            # Stopping kills the local ssh client; the remote side sees its session close
+            return run_script(script_path, on_lines=on_lines, command=command, stdin=script, timeout=timeout,
+                              control=control)
+
+    def close(self):
+        if self.control_path:
+            subprocess.run(self.base_command() + ["-O", "exit", self.host],
+                           stdin=subprocess.DEVNULL, capture_output=True)
+            shutil.rmtree(self.control_dir, ignore_errors=True)
+            self.control_path = None
+
+
+def make_transport(host):
+    """Return the transport for a host name; "local" or "local:<name>" uses LocalTransport."""
+    if host == "local" or host.startswith("local:"):
+        return LocalTransport(host)
+    return SSHTransport(host)
+
+
+class ConnectionPool:
+    """Opens one transport per host on first use and keeps it for the whole run."""
+
+    def __init__(self, transport_factory=make_transport):
+        self.transport_factory = transport_factory
+        self.transports = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.host_locks = {}
+
+    def get(self, host):
+        """Return a connected transport for host, raising TransportError if it is unreachable."""
+        with self.lock:
+            host_lock = self.host_locks.setdefault(host, threading.Lock())
+        with host_lock:
+            if host in self.errors:
+                raise self.errors[host]
+            if host not in self.transports:
+                transport = self.transport_factory(host)
+                try:
+                    transport.connect()
+                except TransportError as e:
+                    self.errors[host] = e
+                    raise
+                except OSError as e:
+                    self.errors[host] = TransportError(f"{host}: {e}")
+                    raise self.errors[host] from e
+                self.transports[host] = transport
+            return self.transports[host]
+
+    def close(self):
+        for transport in self.transports.values():
+            transport.close()
+        self.transports = {}
+
+
+class FanoutRunner:
+    """Runs a list of scripts on every host with per-host and global concurrency limits.
+
+    Tasks are dispatched round-robin over hosts that still have a free slot,
+    so a slow host never holds global slots it cannot use. Scripts are killed
+    after their "# timeout:" header or timeout seconds, and every script
+    still running or not started is stopped once run_timeout passes.
+    """
+
+    def __init__(self, hosts, transport_factory=make_transport, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                 global_limit=DEFAULT_GLOBAL_LIMIT, timeout=None, run_timeout=None):
+        self.hosts = list(hosts)
+        self.pool = ConnectionPool(transport_factory)
+        self.per_host_limit = max(1, per_host_limit)
+        self.global_limit = max(1, global_limit)
+        self.timeout = timeout
+        self.cancelled = False
+        self.control = RunControl(run_timeout)
+
+    def cancel(self):
+        """Stop dispatching new tasks and kill the running scripts; run() reports the rest as cancelled."""
+        self.cancelled = True
+        self.control.cancel()
+
+    def run(self, scripts, on_result=None, on_lines=None):
+        """Run scripts on all hosts and return a list of (host, script_path, outcome, duration).
+
+        outcome is a ScriptRun, or a TransportError when the host could not be
+        reached; tasks left undispatched by cancel() get a cancelled ScriptRun,
+        so there is one result per host and script. on_result(host, script_path, outcome, duration) is called as
+        each task ends and on_lines(host, script_path, lines) receives streamed
+        output; both are called from worker threads.
+        """
+        pending = {host: deque(scripts) for host in self.hosts}
+        active = {host: 0 for host in self.hosts}
+        results = []
+        condition = threading.Condition()
+        running = 0
+
+        def task(host, script_path):
+            start = time.monotonic()
+            try:
+                transport = self.pool.get(host)
+                forward = (lambda lines: on_lines(host, script_path, lines)) if on_lines else None
+                outcome = transport.run(script_path, on_lines=forward, control=self.control,
+                                        timeout=script_timeout(script_path, self.timeout))
+            except Exception as e:
+                # Any failure, not only an unreachable host, becomes an error result for this host
+                outcome = e if isinstance(e, TransportError) else TransportError(f"{host}: {e}")
+            return host, script_path, outcome, time.monotonic() - start
+
+        def done(host, future):
+            nonlocal running
+            try:
+                result = future.result()
+                if on_result:
+                    on_result(*result)
+            finally:
+                with condition:
+                    if future.exception() is None:
+                        results.append(future.result())
+                    active[host] -= 1
+                    running -= 1
+                    condition.notify()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.global_limit) as executor:
+                hosts = deque(self.hosts)
+                with condition:
+                    while not self.cancelled and any(pending.values()):
+                        started = False
+                        for _ in range(len(hosts)):
+                            host = hosts[0]
+                            hosts.rotate(-1)
+                            if pending[host] and active[host] < self.per_host_limit and running < self.global_limit:
+                                active[host] += 1
+                                running += 1
+                                future = executor.submit(task, host, pending[host].popleft())
+                                future.add_done_callback(lambda f, host=host: done(host, f))
+                                started = True
+                        if not started:
+                            condition.wait()
+            for host in self.hosts:
+                for script_path in pending[host]:
+                    result = (host, script_path, not_started(script_path, "cancelled"), 0.0)
+                    results.append(result)
+                    if on_result:
+                        on_result(*result)
+        finally:
+            self.pool.close()
+        return results
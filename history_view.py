@@ -0,0 +1,197 @@
+"""Dialog over the run history: past runs, flaky scripts, run diffs and duration trends."""
+import time
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPlainTextEdit,
+    QPushButton,
+    QSpinBox,
+    QSplitter,
+    QTableWidget,
+    QTableWidgetItem,
+    QTabWidget,
+    QVBoxLayout,
+    QWidget,
+)
+
+from run_history import format_time
+
+RUNS_SHOWN = 200
+
+
+def make_table(headers):
+    table = QTableWidget(0, len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    table.setSelectionBehavior(QAbstractItemView.SelectRows)
+    table.verticalHeader().setVisible(False)
+    table.horizontalHeader().setStretchLastSection(True)
+    table.setSortingEnabled(True)
+    return table
+
+
+def fill_table(table, rows):
+    """Replace a table's rows; numbers are stored as numbers so they sort by value."""
+    table.setSortingEnabled(False)
+    table.setRowCount(len(rows))
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row):
+            item = QTableWidgetItem()
+            if isinstance(value, (int, float)):
+                item.setData(Qt.DisplayRole, round(value, 3) if isinstance(value, float) else value)
+            else:
+                item.setText("" if value is None else str(value))
+            table.setItem(r, c, item)
+    table.setSortingEnabled(True)
+    table.resizeColumnsToContents()
+
+
+class HistoryDialog(QDialog):
+    """Browse the RunHistory; every tab runs its query when shown or when its inputs change."""
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.setWindowTitle("Run History")
+        self.resize(900, 600)
+        layout = QVBoxLayout(self)
+        self.tabs = QTabWidget(self)
+        layout.addWidget(self.tabs)
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
+
+        # Runs, with the results and output of the selected one
+        runs_tab = QSplitter(Qt.Vertical)
+        self.runs_table = make_table(["Run", "Started", "Kind", "Total", "Pass", "Fail", "Error", "Timeout",
+                                      "Cancelled", "Duration (s)"])
+        self.runs_table.itemSelectionChanged.connect(self.show_run_results)
+        runs_tab.addWidget(self.runs_table)
+        self.results_table = make_table(["Result", "Script", "Host", "Status", "Exit code", "Wall (s)"])
+        self.results_table.itemSelectionChanged.connect(self.show_result_output)
+        runs_tab.addWidget(self.results_table)
+        self.output_view = QPlainTextEdit()
+        self.output_view.setReadOnly(True)
+        runs_tab.addWidget(self.output_view)
+        self.tabs.addTab(runs_tab, "Runs")
+
+        # Flaky scripts
+        flaky_tab = QWidget()
+        flaky_layout = QVBoxLayout(flaky_tab)
+        flaky_controls = QHBoxLayout()
+        self.flaky_runs_spin = QSpinBox()
+        self.flaky_runs_spin.setRange(2, 10000)
+        self.flaky_runs_spin.setValue(20)
+        self.flaky_runs_spin.setPrefix("Last ")
+        self.flaky_runs_spin.setSuffix(" runs")
+        self.flaky_runs_spin.valueChanged.connect(self.show_flaky)
+        flaky_controls.addWidget(self.flaky_runs_spin)
+        flaky_controls.addStretch()
+        flaky_layout.addLayout(flaky_controls)
+        self.flaky_table = make_table(["Script", "Host", "Flips", "Runs", "Failures"])
+        flaky_layout.addWidget(self.flaky_table)
+        self.tabs.addTab(flaky_tab, "Flaky")
+
+        # Differences between two runs
+        diff_tab = QWidget()
+        diff_layout = QVBoxLayout(diff_tab)
+        diff_controls = QHBoxLayout()
+        self.diff_old_combo = QComboBox()
+        self.diff_new_combo = QComboBox()
+        for label, combo in (("From", self.diff_old_combo), ("to", self.diff_new_combo)):
+            diff_controls.addWidget(QLabel(label))
+            combo.currentIndexChanged.connect(self.show_diff)
+            diff_controls.addWidget(combo)
+        diff_controls.addStretch()
+        diff_layout.addLayout(diff_controls)
+        self.diff_table = make_table(["Script", "Host", "Before", "After"])
+        diff_layout.addWidget(self.diff_table)
+        self.tabs.addTab(diff_tab, "Diff")
+
+        # Duration trend of one script
+        trend_tab = QWidget()
+        trend_layout = QVBoxLayout(trend_tab)
+        trend_controls = QHBoxLayout()
+        self.trend_script_edit = QLineEdit()
+        self.trend_script_edit.setPlaceholderText("Script path, as shown in the Runs tab")
+        self.trend_script_edit.returnPressed.connect(self.show_trend)
+        trend_controls.addWidget(self.trend_script_edit)
+        trend_button = QPushButton("Show")
+        trend_button.clicked.connect(self.show_trend)
+        trend_controls.addWidget(trend_button)
+        trend_layout.addLayout(trend_controls)
+        self.trend_table = make_table(["Run", "Started", "Status", "Wall (s)"])
+        trend_layout.addWidget(self.trend_table)
+        self.tabs.addTab(trend_tab, "Trend")
+
+        self.tabs.currentChanged.connect(self.refresh_tab)
+        self.load_runs()
+
+    def timed(self, description, query, *args):
+        """Run a query and show how long it took."""
+        start = time.perf_counter()
+        rows = query(*args)
+        self.status_label.setText(f"{description}: {len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return rows
+
+    def load_runs(self):
+        runs = self.timed("Runs", self.history.recent_runs, RUNS_SHOWN)
+        fill_table(self.runs_table, [
+            (run["id"], format_time(run["started"]), run["kind"], run["total"], run["passed"], run["failed"],
+             run["errors"], run["timeouts"], run["cancelled"],
+             run["finished"] - run["started"] if run["finished"] else None) for run in runs])
+        for combo in (self.diff_old_combo, self.diff_new_combo):
+            combo.blockSignals(True)
+            combo.clear()
+            for run in runs:
+                combo.addItem(f"#{run['id']} {format_time(run['started'])}", run["id"])
+            combo.blockSignals(False)
+        if len(runs) > 1:
+            self.diff_old_combo.setCurrentIndex(1)
+            self.diff_new_combo.setCurrentIndex(0)
+
+    def refresh_tab(self, index):
+        if index == 1:
+            self.show_flaky()
+        elif index == 2:
+            self.show_diff()
+
+    def selected_id(self, table):
+        rows = table.selectionModel().selectedRows()
+        return table.item(rows[0].row(), 0).data(Qt.DisplayRole) if rows else None
+
+    def show_run_results(self):
+        run_id = self.selected_id(self.runs_table)
+        if run_id is not None:
+            fill_table(self.results_table, self.timed(f"Run #{run_id}", self.history.run_results, run_id))
+            self.output_view.clear()
+
+    def show_result_output(self):
+        result_id = self.selected_id(self.results_table)
+        if result_id is not None:
+            output = self.history.output(result_id)
+            self.output_view.setPlainText(output if output is not None else "(no output stored)")
+            row = self.results_table.currentRow()
+            self.trend_script_edit.setText(self.results_table.item(row, 1).text())
+
+    def show_flaky(self):
+        fill_table(self.flaky_table, self.timed("Flaky scripts", self.history.flaky_scripts,
+                                                self.flaky_runs_spin.value()))
+
+    def show_diff(self):
+        old_run, new_run = self.diff_old_combo.currentData(), self.diff_new_combo.currentData()
+        if old_run is not None and new_run is not None:
+            fill_table(self.diff_table, [(path, host, old or "(not run)", new or "(not run)") for path, host, old, new
+                                         in self.timed("Changed results", self.history.diff_runs, old_run, new_run)])
+
+    def show_trend(self):
+        script = self.trend_script_edit.text().strip()
+        if script:
+            rows = self.timed("Trend", self.history.duration_trend, script)
+            fill_table(self.trend_table, [(run_id, format_time(started), status, wall)
+                                          for run_id, started, status, wall in rows])
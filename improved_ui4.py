@@ -1,6 +1,8 @@
-from PySide6.QtCore import *
-from PySide6.QtWidgets import *
-from PySide6.QtGui import QColor, QIcon
+from PySide6.QtCore import QCoreApplication, Qt
+from PySide6.QtWidgets import (QAbstractItemView, QCheckBox, QComboBox, QHBoxLayout, QLabel, QLineEdit,
+                               QProgressBar, QPushButton, QSpinBox, QSplitter, QTableView, QTreeView,
+                               QVBoxLayout, QWidget)
+from output_console import OutputConsole
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -44,14 +46,43 @@ class Ui_MainWindow(object):
         self.left_layout = QVBoxLayout(self.left_widget)
         self.left_layout.setSpacing(15)
 
-        # Tree widget (scripts) without header label
-        self.treeWidget = QTreeWidget(self.left_widget)
+        # Fuzzy search over script names, titles and folders; the tree below is filtered as you type
+        self.script_search_edit = QLineEdit(self.left_widget)
+        self.script_search_edit.setPlaceholderText("Search scripts")
+        self.script_search_edit.setClearButtonEnabled(True)
+        self.script_search_edit.setToolTip("Letters may be skipped: \"crmfs\" finds cramfs. Space-separated terms must all match.")
+        self.left_layout.addWidget(self.script_search_edit)
+
+        self.search_layout = QHBoxLayout()
+        self.search_count_label = QLabel("", self.left_widget)
+        self.search_layout.addWidget(self.search_count_label)
+        self.run_matches_button = QPushButton("Run Matches", self.left_widget)
+        self.run_matches_button.setToolTip("Run every script matching the search")
+        self.run_matches_button.setEnabled(False)
+        self.search_layout.addWidget(self.run_matches_button)
+        self.left_layout.addLayout(self.search_layout)
+
+        # Tree view (scripts) without header label; the model lists folders lazily
+        self.treeWidget = QTreeView(self.left_widget)
         self.treeWidget.setObjectName(u"treeWidget")
         self.treeWidget.setStyleSheet(self.get_tree_widget_style())
         self.treeWidget.setToolTip("Select a directory or script to execute.")
         self.treeWidget.setHeaderHidden(True)  # Remove the header label
         self.left_layout.addWidget(self.treeWidget)
 
+        # Shown while the script directory is scanned in the background
+        self.scan_layout = QHBoxLayout()
+        self.scan_status_label = QLabel("", self.left_widget)
+        self.scan_status_label.hide()
+        self.scan_layout.addWidget(self.scan_status_label)
+        self.scan_progress = QProgressBar(self.left_widget)
+        self.scan_progress.setRange(0, 0)  # Busy indicator; the label counts what was found
+        self.scan_progress.setMaximumHeight(12)
+        self.scan_progress.setTextVisible(False)
+        self.scan_progress.hide()
+        self.scan_layout.addWidget(self.scan_progress)
+        self.left_layout.addLayout(self.scan_layout)
+
         # Bottom buttons panel
         self.buttons_panel = QWidget(self.left_widget)
         self.buttons_layout = QVBoxLayout(self.buttons_panel)
@@ -67,6 +98,51 @@ class Ui_MainWindow(object):
         self.complete_fix_button.setToolTip("Run all fix scripts")
         self.buttons_layout.addWidget(self.complete_fix_button)
 
+        # Follow-up runs built from the last recorded run, so a check -> fix -> verify loop stays small
+        self.rerun_failures_button = QPushButton("Re-run Failures", self.buttons_panel)
+        self.rerun_failures_button.setStyleSheet(self.get_button_style())
+        self.rerun_failures_button.setToolTip("Run again the scripts that failed, errored or timed out in the last run")
+        self.buttons_layout.addWidget(self.rerun_failures_button)
+
+        self.recheck_button = QPushButton("Re-check Remediated", self.buttons_panel)
+        self.recheck_button.setStyleSheet(self.get_button_style())
+        self.recheck_button.setToolTip("Run the check scripts of the remediations in the latest fix run")
+        self.buttons_layout.addWidget(self.recheck_button)
+
+        self.fanout_button = QPushButton("Run on Hosts", self.buttons_panel)
+        self.fanout_button.setStyleSheet(self.get_button_style())
+        self.fanout_button.setToolTip("Run the selected scripts on a list of hosts")
+        self.buttons_layout.addWidget(self.fanout_button)
+
+        self.cancel_button = QPushButton("Cancel Run", self.buttons_panel)
+        self.cancel_button.setStyleSheet(self.get_button_style())
+        self.cancel_button.setToolTip("Drop queued scripts and kill the running ones")
+        self.buttons_layout.addWidget(self.cancel_button)
+
+        self.history_button = QPushButton("History", self.buttons_panel)
+        self.history_button.setStyleSheet(self.get_button_style())
+        self.history_button.setToolTip("Browse earlier runs, flaky scripts and duration trends")
+        self.buttons_layout.addWidget(self.history_button)
+
+        self.export_button = QPushButton("Export Report", self.buttons_panel)
+        self.export_button.setStyleSheet(self.get_button_style())
+        self.export_button.setToolTip("Save a report of the last run as HTML, CSV or JSON")
+        self.buttons_layout.addWidget(self.export_button)
+
+        self.force_refresh_checkbox = QCheckBox("Force refresh (ignore cached results)", self.buttons_panel)
+        self.force_refresh_checkbox.setToolTip("Run every check script even if a cached result is still valid")
+        self.buttons_layout.addWidget(self.force_refresh_checkbox)
+
+        self.session_mode_checkbox = QCheckBox("Reuse shell sessions", self.buttons_panel)
+        self.session_mode_checkbox.setToolTip("Run shell scripts in long-lived bash sessions; much faster for many small checks")
+        self.buttons_layout.addWidget(self.session_mode_checkbox)
+
+        self.prefetch_facts_checkbox = QCheckBox("Prefetch system facts", self.buttons_panel)
+        self.prefetch_facts_checkbox.setToolTip("Collect the facts that checks declare (# facts: dpkg sysctl ...) "
+                                                "once before a check run, instead of in every script")
+        self.prefetch_facts_checkbox.setChecked(True)
+        self.buttons_layout.addWidget(self.prefetch_facts_checkbox)
+
         self.left_layout.addWidget(self.buttons_panel)
 
     def setup_center_panel(self):
@@ -80,9 +156,9 @@ class Ui_MainWindow(object):
         self.output_label.setStyleSheet("font-weight: bold; font-size: 16px;")
         self.center_layout.addWidget(self.output_label)
 
-        self.output_display = QTextEdit(self.center_widget)
-        self.output_display.setStyleSheet(self.get_text_edit_style())
-        self.output_display.setReadOnly(True)
+        # Batched, line-capped console instead of a rich-text QTextEdit
+        self.output_display = OutputConsole(self.center_widget)
+        self.output_display.view.setStyleSheet(self.get_text_edit_style())
         self.center_layout.addWidget(self.output_display)
 
         # Buttons below the output area
@@ -110,8 +186,27 @@ class Ui_MainWindow(object):
         self.status_label.setStyleSheet("font-weight: bold; font-size: 16px;")
         self.right_layout.addWidget(self.status_label)
 
-        self.status_list = QListWidget(self.right_widget)
-        self.status_list.setStyleSheet("""
+        # Filters above the results: status and a substring of the script name
+        self.status_filter_layout = QHBoxLayout()
+        self.status_filter_combo = QComboBox(self.right_widget)
+        self.status_filter_combo.setToolTip("Show only results with this status")
+        self.status_filter_layout.addWidget(self.status_filter_combo)
+        self.status_search_edit = QLineEdit(self.right_widget)
+        self.status_search_edit.setPlaceholderText("Filter by script name")
+        self.status_search_edit.setClearButtonEnabled(True)
+        self.status_filter_layout.addWidget(self.status_search_edit)
+        self.right_layout.addLayout(self.status_filter_layout)
+
+        # One row per finished script; click a header to sort, double-click to show its output
+        self.status_table = QTableView(self.right_widget)
+        self.status_table.setSortingEnabled(True)
+        self.status_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.status_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.status_table.setWordWrap(False)
+        self.status_table.verticalHeader().setVisible(False)
+        self.status_table.verticalHeader().setDefaultSectionSize(22)
+        self.status_table.horizontalHeader().setStretchLastSection(True)
+        self.status_table.setStyleSheet("""
             background-color: #FFFFFF;
             color: #333;
             font-size: 14px;
@@ -119,7 +214,56 @@ class Ui_MainWindow(object):
             padding: 5px;
             border: 1px solid #D0D0D0;
         """)
-        self.right_layout.addWidget(self.status_list)
+        self.right_layout.addWidget(self.status_table)
+
+        self.status_counts_label = QLabel("Pass: 0 | Fail: 0 | Error: 0", self.right_widget)
+        self.right_layout.addWidget(self.status_counts_label)
+
+        # Worker pool: live counts and concurrency limit
+        self.pool_layout = QHBoxLayout()
+        self.pool_status_label = QLabel("Queued: 0 | Running: 0 | Done: 0", self.right_widget)
+        self.pool_layout.addWidget(self.pool_status_label)
+
+        self.concurrency_spin = QSpinBox(self.right_widget)
+        self.concurrency_spin.setRange(1, 256)
+        self.concurrency_spin.setPrefix("Parallel: ")
+        self.concurrency_spin.setToolTip("Maximum number of scripts running at once")
+        self.pool_layout.addWidget(self.concurrency_spin)
+
+        self.adaptive_checkbox = QCheckBox("Adapt to system load", self.right_widget)
+        self.adaptive_checkbox.setToolTip("Run fewer scripts at once while the load average or CPU/IO pressure "
+                                          "is high, up to the parallel limit")
+        self.pool_layout.addWidget(self.adaptive_checkbox)
+
+        self.right_layout.addLayout(self.pool_layout)
+
+        # Progress of the current run, with the remaining time expected from earlier runs' durations
+        self.run_progress = QProgressBar(self.right_widget)
+        self.run_progress.setRange(0, 1)
+        self.run_progress.setValue(0)
+        self.run_progress.setFormat("No run in progress")
+        self.run_progress.setToolTip("Longest scripts start first; the estimate is based on their earlier run times")
+        self.right_layout.addWidget(self.run_progress)
+
+        # Time limits; 0 means no limit. A script's "# timeout:" header overrides the script limit
+        self.timeout_layout = QHBoxLayout()
+        self.script_timeout_spin = QSpinBox(self.right_widget)
+        self.script_timeout_spin.setRange(0, 24 * 3600)
+        self.script_timeout_spin.setPrefix("Script timeout: ")
+        self.script_timeout_spin.setSuffix(" s")
+        self.script_timeout_spin.setSpecialValueText("No script timeout")
+        self.script_timeout_spin.setToolTip("Kill a script (and everything it started) after this many seconds")
+        self.timeout_layout.addWidget(self.script_timeout_spin)
+
+        self.run_timeout_spin = QSpinBox(self.right_widget)
+        self.run_timeout_spin.setRange(0, 24 * 60)
+        self.run_timeout_spin.setPrefix("Run timeout: ")
+        self.run_timeout_spin.setSuffix(" min")
+        self.run_timeout_spin.setSpecialValueText("No run timeout")
+        self.run_timeout_spin.setToolTip("Stop the whole run after this many minutes")
+        self.timeout_layout.addWidget(self.run_timeout_spin)
+
+        self.right_layout.addLayout(self.timeout_layout)
 
     def retranslateUi(self, MainWindow):
         MainWindow.setWindowTitle(QCoreApplication.translate("MainWindow", u"Script Executor", None))
@@ -155,7 +299,7 @@ class Ui_MainWindow(object):
         """
 
     def get_text_edit_style(self):
-        """Return style for QTextEdit widget."""
+        """Return style for the output console text view."""
         return """
             background-color: #FFFFFF;
             color: #333;
@@ -0,0 +1,115 @@
+"""Concurrency that follows the load of the machine the scripts run on.
+
+Reads the load average from /proc/loadavg and pressure stall information
+(PSI) from /proc/pressure/{cpu,io}: the share of the last 10 seconds in
+which some task was stalled waiting for CPU or I/O. While the machine is
+busy the number of scripts run at once is cut back by a quarter, and
+while it is idle it grows by one per sample, up to the configured
+maximum. I/O pressure separately steers the limit of io-class scripts,
+so disk sweeps back off without holding back CPU-bound checks.
+"""
+import os
+from collections import namedtuple
+
+# Seconds between samples
+SAMPLE_INTERVAL = 2.0
+# Load average per CPU above which fewer scripts are run, and below which more may be
+LOAD_HIGH = 1.5
+LOAD_LOW = 0.8
+# PSI "some avg10" percentages with the same role for CPU and I/O
+CPU_PRESSURE_HIGH = 40.0
+CPU_PRESSURE_LOW = 10.0
+IO_PRESSURE_HIGH = 20.0
+IO_PRESSURE_LOW = 5.0
+
+# load1 is the 1-minute load average; cpu and io are PSI "some avg10" percentages; None where unavailable
+LoadSample = namedtuple("LoadSample", "load1 cpu io")
+
+
+def read_pressure(path):
+    """Return the "some avg10" percentage of a PSI file, or None."""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith("some "):
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition("=")
+                        if key == "avg10":
+                            return float(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_load(proc="/proc"):
+    """Return a LoadSample of the current system load."""
+    try:
+        with open(os.path.join(proc, "loadavg")) as f:
+            load1 = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        load1 = None
+    return LoadSample(load1, read_pressure(os.path.join(proc, "pressure", "cpu")),
+                      read_pressure(os.path.join(proc, "pressure", "io")))
+
+
+def back_off(limit, minimum):
+    return max(minimum, min(limit - 1, limit * 3 // 4))
+
+
+class LoadMonitor:
+    """Adjusts a worker limit and an io-class limit from samples of the system load.
+
+    Call update() every SAMPLE_INTERVAL seconds; it returns the new
+    (workers, io_limit). available is False where /proc/loadavg can't be
+    read, and the limits then stay at their maximum.
+    """
+
+    def __init__(self, max_workers, max_io, min_workers=1, cpus=None, proc="/proc"):
+        self.max_workers = max(1, max_workers)
+        self.max_io = max(1, max_io)
+        self.min_workers = max(1, min_workers)
+        self.cpus = cpus or os.cpu_count() or 1
+        self.proc = proc
+        self.workers = self.max_workers
+        self.io_limit = self.max_io
+        self.last = None  # latest LoadSample
+        self.available = read_load(proc).load1 is not None
+
+    def set_limits(self, max_workers, max_io=None):
+        """Change the maxima; the current limits are brought under them."""
+        self.max_workers = max(1, max_workers)
+        if max_io is not None:
+            self.max_io = max(1, max_io)
+        self.workers = min(self.workers, self.max_workers)
+        self.io_limit = min(self.io_limit, self.max_io)
+
+    def update(self, sample=None):
+        """Take a sample (or use the one given) and return the adjusted (workers, io_limit)."""
+        self.last = sample = sample or read_load(self.proc)
+        if sample.load1 is None:
+            return self.max_workers, self.max_io
+        load = sample.load1 / self.cpus
+        cpu = sample.cpu or 0.0
+        io = sample.io or 0.0
+        if load > LOAD_HIGH or cpu > CPU_PRESSURE_HIGH:
+            self.workers = back_off(self.workers, self.min_workers)
+        elif load < LOAD_LOW and cpu < CPU_PRESSURE_LOW:
+            self.workers = min(self.max_workers, self.workers + 1)
+        if io > IO_PRESSURE_HIGH:
+            self.io_limit = back_off(self.io_limit, 1)
+        elif io < IO_PRESSURE_LOW:
+            self.io_limit = min(self.max_io, self.io_limit + 1)
+        self.workers = min(self.workers, self.max_workers)
+        return self.workers, self.io_limit
+
+    def describe(self):
+        """Short text of the latest sample, for status displays."""
+        sample = self.last
+        if sample is None or sample.load1 is None:
+            return "load unknown"
+        parts = [f"load {sample.load1:.2f}"]
+        if sample.cpu is not None:
+            parts.append(f"cpu psi {sample.cpu:.0f}%")
+        if sample.io is not None:
+            parts.append(f"io psi {sample.io:.0f}%")
+        return ", ".join(parts)
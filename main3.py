@@ -1,29 +1,137 @@
+import time
+
+STARTUP_STARTED = time.perf_counter()  # Taken before the heavy imports, for the startup trace
+import logging
+import sqlite3
 import sys
-import subprocess
 from pathlib import Path
-from PySide6.QtCore import *
-from PySide6.QtWidgets import *
-from improved_ui4 import Ui_MainWindow  # Assuming this is your UI file
-import logging
-import datetime
 
-# Setup logging for better tracking (logs saved as {date}{time}.log)
-def setup_logging():
-    # Get current date and time for log filename
-    log_filename = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.log")
-    log_path = Path(log_filename)
-    logging.basicConfig(filename=log_path, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-    return log_path
+from PySide6.QtCore import QEvent, Qt, QTimer
+from PySide6.QtWidgets import QAbstractItemView, QApplication, QFileDialog, QInputDialog, QMainWindow
+
+from durations import DurationStats, RunEstimate, format_duration
+from fanout import TransportError
+from history_view import HistoryDialog
+from improved_ui4 import Ui_MainWindow  # Assuming this is your UI file
+from output_store import PREVIEW_CHARS, OutputStore, preview
+from output_viewer import OutputViewer
+from report_export import export_report
+from result_cache import ResultCache
+from result_model import ResultFilterProxy, ResultTableModel, result_label
+from run_history import MAX_OUTPUT_CHARS, RunHistory
+from run_logging import log_event, setup_logging
+from script_catalog import DEFAULT_BASE_DIR, FOLDER_SUFFIXES, ScriptCatalog, counterpart
+from script_dag import CycleError
+from script_pool import FanoutWorker, ScriptPool
+from script_runner import RUNNABLE_SUFFIXES, ScriptResult, Status, format_usage, run_status, slowest
+from script_search import catalog_snapshot
+from script_tree_model import CatalogLoader, ScriptFilterProxy, ScriptTreeModel, SearchIndexBuilder
+from script_watcher import ScriptWatcher
+
+STARTUP_IMPORTED = time.perf_counter()
+
+# Finished results written to the run history per transaction
+HISTORY_BATCH = 200
+# Folders holding the matches are expanded when a search finds at most this many scripts
+SEARCH_EXPAND_LIMIT = 200
 
 class ScriptExecutorApp(QMainWindow, Ui_MainWindow):
     def __init__(self):
         super().__init__()
         self.setupUi(self)
 
-        # Setup logging and get log file path
+        # Logs ({date}_{time}.log plus a .events.jsonl stream) are written by a background thread
         self.log_file_path = setup_logging()
         logging.info(f"Log file created: {self.log_file_path}")
 
+        # Startup trace: milliseconds from the start of the imports to each phase. The script
+        # directory is scanned on a worker thread once the window has been painted
+        self.startup_times = {}
+        self.trace_startup("imports", STARTUP_IMPORTED)
+        self.installEventFilter(self)
+        self.catalog_loader = None
+
+        # Finished scripts: typed records in a sortable, filterable table, with their output kept aside;
+        # large outputs are spilled to a file per run and only a preview is kept in memory
+        self.output_store = OutputStore()
+        self.result_model = ResultTableModel(self)
+        self.result_proxy = ResultFilterProxy(self)
+        self.result_proxy.setSourceModel(self.result_model)
+        self.status_table.setModel(self.result_proxy)
+        self.status_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)  # Finishing order until sorted
+        self.status_filter_combo.addItem("All statuses", None)
+        for status in Status:
+            self.status_filter_combo.addItem(status.value, status)
+        self.status_filter_combo.currentIndexChanged.connect(
+            lambda index: self.result_proxy.set_status_filter(self.status_filter_combo.itemData(index)))
+        self.status_search_edit.textChanged.connect(self.result_proxy.setFilterFixedString)
+        self.status_table.doubleClicked.connect(self.show_result_output)
+        self.result_model.counts_changed.connect(self.update_result_counts)
+
+        # Bounded pool that runs scripts and reports results back through one signal
+        self.pool = ScriptPool(base_dir=self.get_base_directory(), output_store=self.output_store, parent=self)
+        self.pool.script_finished.connect(self.handle_script_output)
+        self.pool.script_skipped.connect(self.handle_skipped_script)
+        self.pool.progress_changed.connect(self.update_pool_status)
+        self.pool.output_lines.connect(self.append_script_lines)
+        self.concurrency_spin.setValue(self.pool.max_workers)
+        self.concurrency_spin.valueChanged.connect(self.pool.set_max_workers)
+        self.session_mode_checkbox.toggled.connect(self.pool.set_session_mode)
+        self.adaptive_checkbox.toggled.connect(self.pool.set_adaptive)
+        self.prefetch_facts_checkbox.toggled.connect(self.pool.set_prefetch)
+        self.pool.facts_ready.connect(self.show_facts_prefetch)
+        self.pool.load_changed.connect(self.update_load_status)
+        self.load_status = ""
+        self.script_timeout_spin.valueChanged.connect(self.pool.set_script_timeout)
+        self.run_timeout_spin.valueChanged.connect(lambda minutes: self.pool.set_run_timeout(minutes * 60))
+        self.fanout_workers = set()
+
+        # Results of unchanged check scripts are reused unless "Force refresh" is ticked
+        self.result_cache = ResultCache()
+        self.result_cache.load()
+        self.cache_keys = {}
+        self.pool.all_finished.connect(self.save_result_cache)
+
+        # (label, ResourceUsage) of every script finished in the current run, for the slowest-scripts summary
+        self.run_usages = []
+        self.pool.all_finished.connect(self.finish_run)
+
+        # Durations of earlier runs (loaded from the history on the first run) order runs longest
+        # first and feed the remaining-time estimate, ticked every second while a run is going
+        self.duration_stats = None
+        self.run_estimate = None
+        self.pool.script_started.connect(self.handle_script_started)
+        self.eta_timer = QTimer(self)
+        self.eta_timer.setInterval(1000)
+        self.eta_timer.timeout.connect(self.update_run_progress)
+
+        # Every run is kept in a SQLite history; results are written in batches
+        try:
+            self.history = RunHistory()
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Run history disabled: {e}")
+            self.history = None
+        self.history_run_id = None
+        self.history_pending = []
+
+        # Saved index of the script directory, loaded on first use
+        self.catalog = ScriptCatalog(self.get_base_directory())
+        self.catalog_loaded = False
+
+        # Apply filesystem changes to the tree and catalog in debounced batches
+        self.watcher = ScriptWatcher(self)
+        self.watcher.directories_changed.connect(self.apply_script_changes)
+
+        # Script search: an index built off the GUI thread, and a search refined a batch per idle tick
+        self.search_index = None
+        self.search_index_builder = None
+        self.search = None
+        self.search_timer = QTimer(self)
+        self.search_timer.setInterval(0)
+        self.search_timer.timeout.connect(self.continue_search)
+        self.script_search_edit.textChanged.connect(self.update_search)
+        self.run_matches_button.clicked.connect(self.run_search_matches)
+
         # Populate the tree with directories and scripts
         self.populate_tree()
 
@@ -34,100 +142,618 @@ class ScriptExecutorApp(QMainWindow, Ui_MainWindow):
         # Connect the new buttons for "Complete Check" and "Complete Fix"
         self.complete_check_button.clicked.connect(lambda: self.run_scripts_by_keyword("chk"))
         self.complete_fix_button.clicked.connect(lambda: self.run_scripts_by_keyword("rem"))
+        self.rerun_failures_button.clicked.connect(self.rerun_failures)
+        self.recheck_button.clicked.connect(self.recheck_remediated)
+        self.fanout_button.clicked.connect(self.run_selected_on_hosts)
+        self.cancel_button.clicked.connect(self.cancel_run)
+        self.history_button.clicked.connect(self.show_history)
+        self.export_button.clicked.connect(self.export_last_run)
+        self.trace_startup("window built")
+
+    def trace_startup(self, phase, at=None):
+        """Log how long after the start of the imports a startup phase was reached."""
+        ms = ((time.perf_counter() if at is None else at) - STARTUP_STARTED) * 1000
+        self.startup_times[phase] = ms
+        logging.info(f"Startup: {phase} after {ms:.0f} ms")
+        log_event("startup", phase=phase, ms=round(ms, 1))
+
+    def eventFilter(self, obj, event):
+        if obj is self and event.type() == QEvent.Paint and "first paint" not in self.startup_times:
+            self.removeEventFilter(self)
+            self.trace_startup("first paint")
+            QTimer.singleShot(0, self.start_catalog_scan)
+        return super().eventFilter(obj, event)
+
+    def start_catalog_scan(self):
+        """Load or scan the script catalog on a worker thread, showing progress below the tree."""
+        if self.catalog_loaded or self.catalog_loader is not None:
+            return
+        self.catalog_loader = CatalogLoader(self.get_base_directory(), self)
+        self.catalog_loader.progress.connect(self.update_scan_progress)
+        self.catalog_loader.loaded.connect(self.catalog_scanned)
+        self.catalog_loader.finished.connect(self.catalog_loader.deleteLater)
+        self.scan_status_label.setText("Scanning scripts...")
+        self.scan_progress.show()
+        self.scan_status_label.show()
+        self.catalog_loader.start()
+
+    def update_scan_progress(self, directories, files):
+        self.scan_status_label.setText(f"Scanning scripts: {directories:,} folders, {files:,} files")
+
+    def catalog_scanned(self, catalog):
+        """Adopt the catalog loaded in the background, unless one was loaded here in the meantime."""
+        self.catalog_loader = None
+        self.scan_progress.hide()
+        self.scan_status_label.hide()
+        if not self.catalog_loaded:
+            self.catalog = catalog
+            self.catalog_loaded = True
+            self.watcher.watch_many(self.catalog.to_path(rel) for rel in self.catalog.dirs)
+            self.update_search_index()
+        if "scan complete" not in self.startup_times:
+            self.trace_startup("scan complete")
+            logging.info(f"Script catalog ready: {len(self.catalog)} files in {len(self.catalog.dirs)} folders")
 
     def populate_tree(self):
-        """Populate the QTreeWidget with directory structure."""
+        """Attach a lazy model of the directory structure to the tree view."""
         base_dir = self.get_base_directory()
         if not base_dir.exists():
             self.output_display.setText(f"Error: Directory '{base_dir}' not found.")
             return
 
-        self.treeWidget.clear()
-        root_item = QTreeWidgetItem(self.treeWidget)
-        root_item.setText(0, base_dir.name)
-        root_item.setData(0, Qt.UserRole, str(base_dir))
-        self.add_items_to_tree(root_item, base_dir)
-        self.treeWidget.expandAll()
+        # Folders are listed when expanded, so only the top level is read here
+        self.tree_model = ScriptTreeModel(base_dir, self)
+        self.tree_model.directory_loaded.connect(self.watcher.watch)
+        self.tree_proxy = ScriptFilterProxy(base_dir, self)
+        self.tree_proxy.setSourceModel(self.tree_model)
+        self.treeWidget.setModel(self.tree_proxy)
+        self.watcher.watch(base_dir)
+        self.treeWidget.expand(self.tree_proxy.mapFromSource(self.tree_model.root_index()))
 
         # Enable multi-selection in the tree widget
         self.treeWidget.setSelectionMode(QAbstractItemView.MultiSelection)
 
     def get_base_directory(self):
         """Return the base directory for scripts (can be customized)."""
-        return Path("./scripts/ubuntu/v22.04")
-
-    def add_items_to_tree(self, parent_item, path):
-        """Recursively add items to the tree."""
-        for item in sorted(path.iterdir()):
-            tree_item = QTreeWidgetItem(parent_item)
-            tree_item.setText(0, item.name)
-            tree_item.setData(0, Qt.UserRole, str(item))  # Store full path for later use
-            if item.is_dir():
-                self.add_items_to_tree(tree_item, item)  # Recursively add subdirectories
+        return DEFAULT_BASE_DIR
 
     def execute_selected_scripts(self):
         """Execute the selected scripts or scripts from selected folders."""
-        selected_items = self.treeWidget.selectedItems()
+        scripts_to_execute = self.get_selected_scripts()
+        if scripts_to_execute:
+            # Execute all selected scripts
+            self.run_scripts(scripts_to_execute)
+
+    def get_selected_scripts(self):
+        """Return the selected scripts and scripts from selected folders, reporting empty selections."""
+        selection_model = self.treeWidget.selectionModel()
+        selected_items = selection_model.selectedIndexes() if selection_model else []
         if not selected_items:
             self.output_display.setText("Error: No script or folder selected.")
-            return
+            return []
 
+        self.refresh_catalog()
+        search = self.active_search()
         scripts_to_execute = []
         for item in selected_items:
-            path = Path(item.data(0, Qt.UserRole))
+            path = Path(item.data(Qt.UserRole))
             if path.is_dir():
-                scripts_to_execute.extend(self.get_scripts_in_folder(path))
-            elif path.is_file() and path.suffix in {".sh", ".ps1"}:
+                scripts = self.get_scripts_in_folder(path)
+                if search is not None:
+                    # A folder selected while searching stands for the matches inside it
+                    scripts = [s for s in scripts if search.matches_rel(self.catalog.relative(s))]
+                scripts_to_execute.extend(scripts)
+            elif path.is_file() and path.suffix in FOLDER_SUFFIXES:
                 scripts_to_execute.append(path)
 
         if not scripts_to_execute:
             self.output_display.setText("Error: No valid scripts selected.")
-            return
-
-        # Execute all selected scripts
-        self.run_scripts(scripts_to_execute)
-
-    def run_scripts(self, scripts_to_execute):
-        """Run all selected scripts."""
+        return scripts_to_execute
+
+    def run_scripts(self, scripts_to_execute, force_refresh=None):
+        """Queue all selected scripts on the worker pool; force_refresh defaults to the checkbox."""
+        if self.pool.is_idle() and not self.fanout_workers:
+            self.output_store.start_run()  # Each run spills large outputs to a file of its own
+        if self.pool.is_idle():
+            self.run_estimate = RunEstimate()
+        runnable = []
+        keys = {}
+        if force_refresh is None:
+            force_refresh = self.force_refresh_checkbox.isChecked()
         for script in scripts_to_execute:
-            self.execute_script(script)
+            if script.suffix not in RUNNABLE_SUFFIXES:
+                self.output_display.append(f"Error: Unsupported script type for {script.name}.")
+                continue
+            key = self.result_cache.key_for(script)
+            entry = None if force_refresh else self.result_cache.get(key)
+            if entry is not None:
+                self.show_cached_result(script, entry)
+                continue
+            if key:
+                keys[script] = key
+            runnable.append(script)
+        expected = self.get_duration_stats().expected(runnable)
+        self.pool.set_expected_durations(expected)
+        # Counted before submitting, since the pool starts scripts right away
+        added = self.run_estimate.add(expected)
+        try:
+            queued = set(self.pool.submit_many(runnable))
+        except CycleError as e:
+            self.output_display.append(f"Error: {e}. Nothing was run.")
+            logging.error(str(e))
+            self.run_estimate.remove(added)
+            return
+        # Scripts already queued or running in this run were not queued again
+        self.run_estimate.remove([script for script in added if script not in queued])
+        self.cache_keys.update((script, key) for script, key in keys.items() if script in queued)
+        self.eta_timer.start()
+        self.update_run_progress()
+        self.report_critical_path()
+        if self.pool.is_idle():
+            self.save_result_cache()
+            self.finish_run()
+
+    def report_critical_path(self):
+        """Show the longest dependency chain of the current run, if there is one."""
+        length, chain = self.pool.scheduler.graph.critical_path(self.pool.durations)
+        if len(chain) > 1:
+            # Lengths are only meaningful in seconds once some durations have been recorded
+            about = f", about {format_duration(length)}" if self.get_duration_stats().samples else ""
+            message = f"Critical path ({len(chain)} scripts{about}): {' -> '.join(s.name for s in chain)}"
+            self.output_display.append(message)
+            logging.info(message)
+
+    def show_cached_result(self, script_path, entry):
+        """Report a result reused from the cache without running the script."""
+        self.output_display.append_lines([f"[cached] {script_path.name}"] + entry["output"].split("\n"), script_path)
+        offset, length = self.output_store.append(entry["output"])
+        self.add_result(ScriptResult(script_path, None, Status.FAIL if entry["failed"] else Status.PASS,
+                                     entry["returncode"], None, offset, length, True))
+
+    def save_result_cache(self):
+        """Write the result cache to disk once a run is over."""
+        try:
+            self.result_cache.save()
+        except OSError as e:
+            logging.warning(f"Could not save result cache: {e}")
 
     def execute_script(self, script_path):
         """Run the specified script and update the output display."""
-        if not script_path.suffix in {".sh", ".py"}:
-            self.output_display.append(f"Error: Unsupported script type for {script_path.name}.")
-            return
-
-        # Execute script in background using QThread
-        self.run_script_in_thread(script_path)
+        self.run_scripts([script_path])
 
     def run_script_in_thread(self, script_path):
-        """Run script in a separate thread to avoid UI blocking."""
-        worker = ScriptWorker(script_path)
-        worker.finished.connect(lambda: self.handle_script_output(worker))
+        """Queue a script on the worker pool to avoid UI blocking."""
+        self.pool.submit(script_path)
+
+    def run_selected_on_hosts(self):
+        """Fan the selected scripts out to a list of hosts."""
+        scripts = [s for s in self.get_selected_scripts() if s.suffix in RUNNABLE_SUFFIXES]
+        if not scripts:
+            return
+        hosts_text = self.get_input_from_user("Hosts, comma-separated (use local:<name> for a local stand-in):")
+        if not hosts_text:
+            return
+        hosts = [host.strip() for host in hosts_text.split(",") if host.strip()]
+        if self.pool.is_idle() and not self.fanout_workers:
+            self.output_store.start_run()
+
+        worker = FanoutWorker(hosts, scripts, timeout=self.pool.script_timeout, run_timeout=self.pool.run_timeout)
+        worker.result_ready.connect(self.handle_fanout_result)
+        worker.output_lines.connect(self.append_script_lines)
+        worker.finished.connect(lambda: self.fanout_workers.discard(worker))
+        worker.finished.connect(self.finish_run)
+        self.fanout_workers.add(worker)
+        logging.info(f"Fan-out of {len(scripts)} scripts to {len(hosts)} hosts: {', '.join(hosts)}")
         worker.start()
 
+    def handle_fanout_result(self, host, script_path, outcome, duration):
+        """Show the result of one script on one host in the status panel."""
+        if isinstance(outcome, TransportError):
+            offset, length = self.output_store.append(str(outcome))
+            self.add_result(ScriptResult(script_path, host, Status.ERROR, None, None, offset, length))
+            logging.info(f"{host}: {script_path.name}: {outcome}")
+        else:
+            offset, length = self.output_store.append(outcome.output)
+            self.add_result(ScriptResult(script_path, host, run_status(outcome), outcome.returncode, outcome.usage,
+                                         offset, length))
+
+    def update_pool_status(self, queued, running, done):
+        """Show the live queued/running/done counts of the worker pool."""
+        self.pool_status_label.setText(f"Queued: {queued} | Running: {running} | Done: {done}{self.load_status}")
+        self.update_run_progress()
+
+    def update_load_status(self, workers, description):
+        """Show how many scripts the pool runs at once while it follows the system load."""
+        self.load_status = f" | Parallel now: {workers} ({description})" if description else ""
+        self.update_pool_status(*self.pool.counts())
+
+    def get_duration_stats(self):
+        """Return the scripts' recent durations, reading them from the run history the first time."""
+        if self.duration_stats is None:
+            self.duration_stats = DurationStats()
+            if self.history is not None:
+                started = time.perf_counter()
+                try:
+                    self.duration_stats = DurationStats.from_history(self.history)
+                except sqlite3.Error as e:
+                    logging.warning(f"Could not read script durations from the run history: {e}")
+                logging.info(f"Loaded durations of {len(self.duration_stats.samples)} scripts in "
+                             f"{(time.perf_counter() - started) * 1000:.0f} ms")
+        return self.duration_stats
+
+    def handle_script_started(self, script_path):
+        if self.run_estimate is not None:
+            self.run_estimate.start(script_path)
+
+    def update_run_progress(self):
+        """Show how far the run is, its expected remaining time and its throughput."""
+        estimate = self.run_estimate
+        if estimate is None:
+            return
+        queued, running, done = self.pool.counts()
+        total = queued + running + done
+        self.run_progress.setRange(0, max(total, 1))
+        self.run_progress.setValue(done)
+        if self.pool.is_idle():
+            self.eta_timer.stop()
+            elapsed = time.monotonic() - estimate.started
+            self.run_progress.setFormat(f"Done: {done} scripts in {format_duration(elapsed)} "
+                                        f"({estimate.throughput():.1f} scripts/s)")
+            return
+        remaining = estimate.remaining(self.pool.worker_limit())
+        self.run_progress.setFormat(f"{done}/{total} | about {format_duration(remaining)} left | "
+                                    f"{estimate.throughput():.1f} scripts/s")
+
+    def check_duration(self, result):
+        """Record a local script's duration, warning if it ran far longer than it usually does."""
+        if result.usage is None or result.host or result.cached or result.status is Status.CANCELLED:
+            return
+        stats = self.get_duration_stats()
+        usual = stats.regression(result.script_path, result.usage.wall)
+        if usual is not None:
+            message = (f"Warning: {result.script_path.name} took {result.usage.wall:.1f}s, "
+                       f"usually {usual:.1f}s")
+            self.output_display.append(message)
+            logging.warning(message)
+            log_event("duration_regression", script=str(result.script_path), seconds=round(result.usage.wall, 3),
+                      usual=round(usual, 3))
+        stats.add(result.script_path, result.usage.wall)
+
     def handle_script_output(self, worker):
         """Handle the output from a script execution."""
         output, script_path = worker.result
-        self.output_display.append(output)
-        status = f"{script_path.name}: {'PASS' if 'FAIL' not in output else 'FAIL'}"
-        self.status_list.addItem(status)
+        cache_key = self.cache_keys.pop(script_path, None)
+        if cache_key and worker.record.status in (Status.PASS, Status.FAIL):
+            self.result_cache.put(cache_key, script_path, output, worker.saw_fail, worker.returncode)
+        if self.run_estimate is not None:
+            self.run_estimate.finish(script_path, worker.usage.wall if worker.usage is not None else None)
+        self.check_duration(worker.record)
+        self.add_result(worker.record)
 
         # Log output to the log file
-        logging.info(f"{script_path.name}: {'PASS' if 'FAIL' not in output else 'FAIL'}")
         logging.info(f"Output:\n{output}")
 
+    def add_result(self, result):
+        """Add a finished script to the status panel and the log, with its resource usage if measured."""
+        self.result_model.add_result(result)
+        label = result_label(result)
+        status = f"{result.status.value} (cached)" if result.cached else result.status.value
+        if result.usage is None:
+            logging.info(f"{label}: {status}")
+        else:
+            logging.info(f"{label}: {status} ({format_usage(result.usage)})")
+            self.run_usages.append((label, result.usage))
+        log_event("script", script=str(result.script_path), host=result.host, status=result.status.value,
+                  exit_code=result.exit_code, cached=result.cached,
+                  usage=result.usage._asdict() if result.usage is not None else None,
+                  output_offset=result.output_offset, output_length=result.output_length)
+        self.record_history(result)
+
+    def record_history(self, result):
+        """Queue a result for the run history, starting a history run on the first one."""
+        if self.history is None:
+            return
+        if self.history_run_id is None:
+            try:
+                self.history_run_id = self.history.start_run("gui")
+            except sqlite3.Error as e:
+                logging.warning(f"Could not write run history: {e}")
+                return
+        output = None
+        if result.output_offset is not None:
+            output = self.output_store.tail(result.output_offset, MAX_OUTPUT_CHARS)
+        self.history_pending.append((result, output, time.time()))
+        if len(self.history_pending) >= HISTORY_BATCH:
+            self.flush_history()
+
+    def flush_history(self):
+        """Write the queued results to the run history."""
+        if not self.history_pending:
+            return
+        try:
+            self.history.add_results(self.history_run_id, self.history_pending)
+        except sqlite3.Error as e:
+            logging.warning(f"Could not write run history: {e}")
+        self.history_pending = []
+
+    def update_result_counts(self):
+        """Show the running totals of the status panel."""
+        counts = self.result_model.counts
+        text = f"Pass: {counts[Status.PASS]} | Fail: {counts[Status.FAIL]} | Error: {counts[Status.ERROR]}"
+        for status in (Status.TIMEOUT, Status.CANCELLED):
+            if counts[status]:
+                text += f" | {status.value.title()}: {counts[status]}"
+        if self.result_model.cached_count:
+            text += f" | Cached: {self.result_model.cached_count}"
+        self.status_counts_label.setText(text)
+
+    def show_result_output(self, index):
+        """Show the stored output of a double-clicked result; large outputs open in a paged viewer."""
+        result = self.result_proxy.result(index)
+        output = None
+        if result.output_offset is not None:
+            if self.output_store.is_spilled(result.output_offset):
+                OutputViewer(self.output_store, result.output_offset, result_label(result), self).show()
+                output = preview(self.output_store.tail(result.output_offset, PREVIEW_CHARS))
+            else:
+                output = self.output_store.read(result.output_offset, result.output_length)
+        if output is None:
+            output = "(output no longer available)"
+        self.output_display.append(f"--- {result_label(result)}: {result.status.value} ---\n{output}")
+
+    def finish_run(self):
+        """Once nothing is running any more, summarise the run and close it in the history."""
+        if not self.pool.is_idle() or self.fanout_workers:
+            return
+        self.report_slowest_scripts()
+        self.report_facts_saved()
+        self.flush_history()
+        if self.history_run_id is not None:
+            try:
+                self.history.finish_run(self.history_run_id)
+            except sqlite3.Error as e:
+                logging.warning(f"Could not write run history: {e}")
+            self.history_run_id = None
+
+    def show_history(self):
+        """Open the run history browser."""
+        if self.history is None:
+            self.output_display.append("Error: The run history is not available; see the log.")
+            return
+        self.flush_history()
+        HistoryDialog(self.history, self).exec()
+
+    def export_last_run(self):
+        """Save a report of the last finished run, in the format picked by the file name."""
+        if self.history is None:
+            self.output_display.append("Error: The run history is not available; see the log.")
+            return
+        if not self.pool.is_idle() or self.fanout_workers:
+            self.output_display.append("Error: Wait for the current run to finish before exporting it.")
+            return
+        runs = self.history.recent_runs(1)
+        if not runs:
+            self.output_display.append("Error: No run to export yet.")
+            return
+        run_id = runs[0]["id"]
+        path, selected_filter = QFileDialog.getSaveFileName(self, "Export Report", f"report-run-{run_id}.html",
+                                                            "HTML (*.html);;CSV (*.csv);;JSON (*.json)")
+        if not path:
+            return
+        path = Path(path)
+        if not path.suffix:
+            path = path.with_suffix(selected_filter[selected_filter.index("*") + 1:-1])
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            written = export_report(self.history, run_id, path, include_output=True)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            self.output_display.append(f"Error: Could not export the report: {e}")
+            logging.error(f"Report export failed: {e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.output_display.append(f"Exported {written} results of run {run_id} to {path}")
+        logging.info(f"Exported {written} results of run {run_id} to {path}")
+
+    def report_slowest_scripts(self):
+        """List the slowest scripts of the run that just finished."""
+        if not self.run_usages:
+            return
+        lines = [f"Slowest scripts of this run ({len(self.run_usages)} measured):"]
+        slowest_scripts = slowest(self.run_usages)
+        for label, usage in slowest_scripts:
+            lines.append(f"  {label}: {format_usage(usage)}")
+        log_event("run_finished", measured=len(self.run_usages),
+                  counts={status.value: count for status, count in self.result_model.counts.items()},
+                  slowest=[{"script": label, **usage._asdict()} for label, usage in slowest_scripts])
+        self.run_usages = []
+        self.output_display.append("\n".join(lines))
+        logging.info("\n".join(lines))
+
+    def show_facts_prefetch(self, report):
+        """Say which facts were prefetched for the run that is starting."""
+        if isinstance(report, OSError):
+            message = f"Could not prefetch system facts: {report}"
+            self.output_display.append(message)
+            logging.warning(message)
+            return
+        message = report.describe()
+        self.output_display.append(message)
+        logging.info(message)
+
+    def report_facts_saved(self):
+        """Show how much time each prefetched fact saved the run that just finished."""
+        report = self.pool.take_facts_report()
+        if report is None or not report.facts:
+            return
+        lines = report.lines()
+        log_event("facts_saved", saved=round(report.total_saved(), 3), facts=report.records())
+        self.output_display.append("\n".join(lines))
+        logging.info("\n".join(lines))
+
+    def handle_skipped_script(self, result):
+        """Report a queued script that was dropped when the run was cancelled or timed out."""
+        self.cache_keys.pop(result.script_path, None)
+        if self.run_estimate is not None:
+            self.run_estimate.finish(result.script_path)
+        self.add_result(result)
+
+    def cancel_run(self):
+        """Drop everything queued and kill running scripts, including fan-out runs."""
+        queued, running, _ = self.pool.counts()
+        for worker in self.fanout_workers:
+            worker.runner.cancel()
+        self.pool.cancel()
+        if queued or running or self.fanout_workers:
+            message = f"Run cancelled: {queued} queued scripts dropped, {running} running scripts stopped."
+            self.output_display.append(message)
+            logging.info(message)
+
+    def append_script_lines(self, script_path, lines):
+        """Show output lines from a running script as soon as they arrive."""
+        self.output_display.append_lines(lines, script_path)
+
+    def refresh_catalog(self):
+        """Load the script catalog, or relist directories that changed since it was saved."""
+        if not self.catalog_loaded and self.catalog_loader is not None:
+            # Take over the background scan's catalog rather than scanning a second time
+            self.catalog_loader.wait()
+            self.catalog = self.catalog_loader.catalog
+            self.catalog_loaded = True
+        try:
+            if not self.catalog_loaded:
+                self.catalog.load()
+                self.catalog_loaded = True
+            elif self.catalog.revalidate():
+                self.catalog.save()
+        except OSError as e:
+            logging.warning(f"Could not save script catalog: {e}")
+        self.watcher.watch_many(self.catalog.to_path(rel) for rel in self.catalog.dirs)
+        self.update_search_index()
+
+    def apply_script_changes(self, directories):
+        """Update the catalog and tree for a batch of changed directories."""
+        if self.catalog_loaded:
+            known_dirs = set(self.catalog.dirs)
+            for directory in sorted(directories, key=lambda d: d.count("/")):
+                rel = self.catalog.relative(directory)
+                if rel is not None:
+                    self.catalog.refresh_dir(rel)
+            self.watcher.unwatch_many(self.catalog.to_path(rel) for rel in known_dirs - set(self.catalog.dirs))
+            self.watcher.watch_many(self.catalog.to_path(rel) for rel in set(self.catalog.dirs) - known_dirs)
+            try:
+                self.catalog.save()
+            except OSError as e:
+                logging.warning(f"Could not save script catalog: {e}")
+            self.update_search_index()
+
+        if hasattr(self, "tree_model"):
+            for directory in directories:
+                self.tree_model.refresh_directory(directory)
+        logging.info(f"Applied script changes in {len(directories)} directories")
+
+    def update_search_index(self):
+        """Rebuild the search index in the background if the catalog changed since it was built."""
+        if not self.catalog_loaded:
+            return
+        if self.search_index is not None and self.search_index.generation == self.catalog.generation:
+            return
+        if self.search_index_builder is not None:
+            return  # The finished index is checked again when it arrives
+        rels, titles = catalog_snapshot(self.catalog)
+        self.search_index_builder = SearchIndexBuilder(rels, titles, self.catalog.generation, self)
+        self.search_index_builder.built.connect(self.search_index_built)
+        self.search_index_builder.finished.connect(self.search_index_builder.deleteLater)
+        self.search_index_builder.start()
+
+    def search_index_built(self, index):
+        self.search_index = index
+        self.search_index_builder = None
+        logging.info(f"Search index built for {len(index)} scripts")
+        self.search = None
+        self.update_search(self.script_search_edit.text())
+        self.update_search_index()  # In case the catalog changed while building
+
+    def update_search(self, text):
+        """Start searching for text; the first batch runs now and the rest on idle ticks."""
+        if not hasattr(self, "tree_proxy"):
+            return  # No script directory, so no tree to filter
+        if not text.strip():
+            self.search_timer.stop()
+            self.search = None
+            self.tree_proxy.set_search(None)
+            self.search_count_label.setText("")
+            self.run_matches_button.setEnabled(False)
+            return
+        if self.search_index is None:
+            self.search_count_label.setText("Indexing scripts...")
+            self.run_matches_button.setEnabled(False)
+            self.refresh_catalog()
+            return
+        self.search = self.search_index.search(text, self.search)
+        if self.search.step():
+            self.apply_search()
+        else:
+            self.search_count_label.setText("Searching...")
+            self.run_matches_button.setEnabled(False)
+            self.search_timer.start()
+
+    def continue_search(self):
+        if self.search is None or self.search.step():
+            self.search_timer.stop()
+            self.apply_search()
+
+    def apply_search(self):
+        """Filter the tree by the finished search and open the folders of a short list of matches."""
+        search = self.search
+        if not hasattr(self, "tree_proxy"):
+            return
+        self.tree_proxy.set_search(search)
+        if search is None:
+            return
+        count = search.count()
+        self.search_count_label.setText(f"{count} matching script{'s' if count != 1 else ''}")
+        self.run_matches_button.setEnabled(count > 0)
+        if count <= SEARCH_EXPAND_LIMIT:
+            folders = {rel.rpartition("/")[0] for rel in search.matched_rels()}
+            for folder in sorted(folders):
+                source = self.tree_model.index_for_rel(folder)
+                while source.isValid():
+                    self.treeWidget.expand(self.tree_proxy.mapFromSource(source))
+                    source = source.parent()
+
+    def active_search(self):
+        """Return the finished search that filters the tree, or None when not searching."""
+        search = self.search
+        if search is None or not search.terms or not search.done:
+            return None
+        return search
+
+    def run_search_matches(self):
+        """Run every runnable script matching the current search."""
+        search = self.active_search()
+        if search is None:
+            return
+        scripts = [self.catalog.to_path(rel) for rel in search.matched_rels()
+                   if Path(rel).suffix in RUNNABLE_SUFFIXES]
+        if scripts:
+            self.run_scripts(scripts)
+        else:
+            self.output_display.append("No runnable scripts match the search.")
+
     def get_scripts_in_folder(self, folder_path):
         """Return all scripts within a folder, recursively."""
+        if self.catalog.relative(folder_path) is not None:
+            return self.catalog.in_folder(folder_path, FOLDER_SUFFIXES)
         scripts = []
         for item in folder_path.rglob('*'):
-            if item.is_file() and item.suffix in {".sh", ".ps1"}:
+            if item.is_file() and item.suffix in FOLDER_SUFFIXES:
                 scripts.append(item)
         return scripts
 
     def run_scripts_by_keyword(self, keyword):
         """Run scripts that contain a specific keyword in their name."""
+        self.refresh_catalog()
         scripts = self.get_scripts_by_name(keyword)
         if scripts:
             self.run_scripts(scripts)
@@ -136,14 +762,46 @@ class ScriptExecutorApp(QMainWindow, Ui_MainWindow):
 
     def get_scripts_by_name(self, filter_text):
         """Get all scripts that contain the filter_text in their filename."""
-        base_dir = self.get_base_directory()
-        scripts = []
+        return self.catalog.by_keyword(filter_text)
 
-        if base_dir.exists():
-            for item in base_dir.rglob('*'):
-                if item.is_file() and filter_text in item.name:
-                    scripts.append(item)
-        return scripts
+    def rerun_failures(self):
+        """Run again the scripts that failed, errored or timed out in the last recorded run."""
+        if self.history is None:
+            self.output_display.append("Re-run needs the run history, which is disabled.")
+            return
+        try:
+            run_id, paths = self.history.failed_scripts()
+        except sqlite3.Error as e:
+            self.output_display.append(f"Error: could not read the run history: {e}")
+            return
+        self.run_from_history(run_id, [Path(path) for path in paths], "failed scripts")
+
+    def recheck_remediated(self):
+        """Run the check scripts of the remediation scripts in the latest run that ran any."""
+        if self.history is None:
+            self.output_display.append("Re-check needs the run history, which is disabled.")
+            return
+        try:
+            run_id, paths = self.history.remediated_scripts()
+        except sqlite3.Error as e:
+            self.output_display.append(f"Error: could not read the run history: {e}")
+            return
+        checks = [counterpart(path, "rem", "chk") for path in paths]
+        self.run_from_history(run_id, [check for check in checks if check is not None],
+                              "checks of remediated scripts")
+
+    def run_from_history(self, run_id, scripts, description):
+        """Run the scripts picked from an earlier run that still exist, ignoring cached results."""
+        if run_id is None:
+            self.output_display.append("No earlier run recorded in the history.")
+            return
+        scripts = [script for script in dict.fromkeys(scripts) if script.is_file()]
+        if not scripts:
+            self.output_display.append(f"No {description} in run {run_id}.")
+            return
+        self.output_display.append(f"Running {len(scripts)} {description} from run {run_id}.")
+        logging.info(f"Running {len(scripts)} {description} from run {run_id}")
+        self.run_scripts(scripts, force_refresh=True)
 
     def get_input_from_user(self, prompt):
         """Display a dialog for user input."""
@@ -153,24 +811,6 @@ class ScriptExecutorApp(QMainWindow, Ui_MainWindow):
         return None
 
 
-class ScriptWorker(QThread):
-    """Worker thread to run scripts in the background."""
-    finished = Signal()
-
-    def __init__(self, script_path):
-        super().__init__()
-        self.script_path = script_path
-        self.result = ("", script_path)
-
-    def run(self):
-        """Run the script and capture its output."""
-        try:
-            command = ["bash", str(self.script_path)] if self.script_path.suffix == ".sh" else ["powershell -File", str(self.script_path)]
-            result = subprocess.run(command, text=True, capture_output=True, check=True)
-            self.result = (result.stdout, self.script_path)
-        except subprocess.CalledProcessError as e:
-            self.result = (f"Error executing {self.script_path.name}:\n{e.stderr}\n{e.stdout}", self.script_path)
-
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = ScriptExecutorApp()
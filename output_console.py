@@ -0,0 +1,157 @@
+from collections import Counter, deque
+from itertools import islice
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QComboBox, QPlainTextEdit, QVBoxLayout, QWidget
+
+# Lines held in memory (and in the view) before the oldest are dropped
+DEFAULT_MAX_LINES = 100_000
+# How often pending lines are pushed to the view, in milliseconds
+DEFAULT_FLUSH_INTERVAL = 50
+
+ALL_SCRIPTS = "All scripts"
+
+
+class OutputConsole(QWidget):
+    """High-volume plain-text console that batches appends on a timer.
+
+    Lines are tagged with the script that produced them so the view can be
+    filtered by script. At most max_lines lines are kept; older ones are
+    dropped from both the buffer and the view, and a script whose lines
+    have all been dropped leaves the filter list.
+    """
+
+    def __init__(self, parent=None, max_lines=DEFAULT_MAX_LINES, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        super().__init__(parent)
+        self.lines = deque(maxlen=max_lines)  # (script key, line)
+        self.pending = []
+        self.script_filter = None
+        self.line_counts = Counter()  # script key -> its lines in the buffer
+
+        self.console_layout = QVBoxLayout(self)
+        self.console_layout.setContentsMargins(0, 0, 0, 0)
+        self.console_layout.setSpacing(5)
+
+        self.filter_combo = QComboBox(self)
+        self.filter_combo.addItem(ALL_SCRIPTS, None)
+        self.filter_combo.setToolTip("Show output from a single script")
+        self.filter_combo.currentIndexChanged.connect(self._on_filter_changed)
+        self.console_layout.addWidget(self.filter_combo)
+
+        self.view = QPlainTextEdit(self)
+        self.view.setReadOnly(True)
+        self.view.setUndoRedoEnabled(False)
+        self.view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.view.setMaximumBlockCount(max_lines)
+        self.console_layout.addWidget(self.view)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(flush_interval)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
+
+    @property
+    def max_lines(self):
+        return self.lines.maxlen
+
+    def set_max_lines(self, max_lines):
+        """Change how many lines are kept in memory and in the view."""
+        self.lines = deque(self.lines, maxlen=max_lines)
+        self.view.setMaximumBlockCount(max_lines)
+        kept = Counter(key for key, _ in self.lines if key is not None)
+        self._forget_scripts([key for key in self.line_counts if key not in kept])
+        self.line_counts = kept
+
+    def append_lines(self, lines, script=None):
+        """Queue lines from a script; they are shown on the next flush."""
+        key = str(script) if script is not None else None
+        lines = lines[-self.max_lines:]
+        if key is not None and lines:
+            # A dropped script that is still selected has kept its entry
+            if key not in self.line_counts and key != self.script_filter:
+                self.filter_combo.addItem(getattr(script, "name", key), key)
+            self.line_counts[key] += len(lines)
+        self._evict(len(self.lines) + len(lines) - self.max_lines)
+        self.lines.extend((key, line) for line in lines)
+        if self._matches(key):
+            self.pending.extend(lines)
+            if len(self.pending) > self.max_lines:
+                del self.pending[:-self.max_lines]
+            if not self.flush_timer.isActive():
+                self.flush_timer.start()
+
+    def append(self, text, script=None):
+        """Queue a block of text, like QTextEdit.append."""
+        self.append_lines(text.split("\n"), script)
+
+    def setText(self, text):
+        """Replace everything shown with text."""
+        self.clear()
+        self.append(text)
+
+    def clear(self):
+        self.lines.clear()
+        self.pending = []
+        self.line_counts.clear()
+        self.script_filter = None
+        self.filter_combo.blockSignals(True)
+        self.filter_combo.clear()
+        self.filter_combo.addItem(ALL_SCRIPTS, None)
+        self.filter_combo.blockSignals(False)
+        self.view.clear()
+
+    def toPlainText(self):
+        self.flush()
+        return self.view.toPlainText()
+
+    def flush(self):
+        """Push pending lines to the view in one edit."""
+        if not self.pending:
+            return
+        scrollbar = self.view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        self.view.appendPlainText("\n".join(self.pending))
+        self.pending = []
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def set_script_filter(self, script):
+        """Show only lines from script, or everything when script is None."""
+        previous = self.script_filter
+        self.script_filter = str(script) if script is not None else None
+        if previous is not None and previous != self.script_filter and previous not in self.line_counts:
+            self._forget_scripts([previous])
+        self.pending = []
+        self.view.setPlainText("\n".join(line for key, line in self.lines if self._matches(key)))
+        self.view.verticalScrollBar().setValue(self.view.verticalScrollBar().maximum())
+
+    def _evict(self, count):
+        """Account for the count oldest lines about to be pushed out of the buffer."""
+        if count <= 0:
+            return
+        emptied = []
+        for key, _ in islice(self.lines, count):
+            if key is not None:
+                self.line_counts[key] -= 1
+                if not self.line_counts[key]:
+                    emptied.append(key)
+        self._forget_scripts(emptied)
+
+    def _forget_scripts(self, keys):
+        # Removing an entry above the selected one moves the current index, which must not refilter the view
+        self.filter_combo.blockSignals(True)
+        for key in keys:
+            self.line_counts.pop(key, None)
+            # The script being shown stays selectable until the filter is changed
+            if key != self.script_filter:
+                index = self.filter_combo.findData(key)
+                if index > 0:
+                    self.filter_combo.removeItem(index)
+        self.filter_combo.blockSignals(False)
+
+    def _matches(self, key):
+        # Messages not tied to a script are always shown
+        return self.script_filter is None or key is None or key == self.script_filter
+
+    def _on_filter_changed(self, index):
+        self.set_script_filter(self.filter_combo.itemData(index))
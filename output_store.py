@@ -0,0 +1,305 @@
+"""Store of finished scripts' output, addressed by (offset, length).
+
+Small outputs are kept in memory. Larger ones go to an append-only spill
+file per run and are read back through mmap only when they are asked for,
+so memory use stays flat however much output a run produces.
+"""
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
+
+# Characters of in-memory output kept across all scripts before the oldest is dropped
+DEFAULT_MAX_CHARS = 64 * 1024 * 1024
+# Outputs longer than this many characters are spilled to disk
+DEFAULT_SPILL_THRESHOLD = 64 * 1024
+# Bytes of spill files kept before the oldest run's file is deleted; the current run's file is never deleted
+DEFAULT_MAX_SPILL_BYTES = 4 * 1024 * 1024 * 1024
+# Characters of output a worker keeps in memory for display once its script has finished
+PREVIEW_CHARS = 16 * 1024
+# Bytes copied at a time when a writer's temporary file is moved into the spill file
+COPY_CHUNK = 1024 * 1024
+# Bytes read past the end of a page looking for the end of its last line
+LINE_LOOKAHEAD = 64 * 1024
+
+def preview(text, max_chars=PREVIEW_CHARS):
+    """Return the end of text, starting at a line, with a note of how much was left out."""
+    if len(text) <= max_chars:
+        return text
+    cut = len(text) - max_chars
+    newline = text.find("\n", cut)
+    if 0 <= newline < len(text) - 1:
+        cut = newline + 1
+    return f"[... {cut} characters of earlier output not shown ...]\n{text[cut:]}"
+
+
+SpilledOutput = namedtuple("SpilledOutput", "segment start size")
+
+
+class SpillSegment:
+    """One run's spill file: outputs written back to back into reserved ranges, read through mmap.
+
+    Space is reserved under the store's lock and filled with positional
+    writes outside it, so a large output being copied in never holds up
+    other scripts or the UI.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        self.size = 0  # bytes reserved so far
+        self.writers = 0  # reserved ranges still being written
+        self.offsets = []  # store offsets of the outputs in this file
+        self.map = None
+
+    def reserve(self, size):
+        start = self.size
+        self.size += size
+        self.writers += 1
+        return start
+
+    def write_at(self, position, data):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.fd, view, position)
+            view = view[written:]
+            position += written
+
+    def read(self, start, size):
+        """Return size bytes at start, mapping the file again if it has grown past the current map."""
+        if self.map is None or len(self.map) < start + size:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            if os.fstat(self.fd).st_size:
+                self.map = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+        return self.map[start:start + size] if self.map is not None else b""
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        os.close(self.fd)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class OutputWriter:
+    """Collects one script's output while it runs, moving it to a temporary file once it gets large.
+
+    Pass write as the runner's on_chunk callback and call finish once the
+    script is done; the output never has to fit in memory. close drops a
+    temporary file finish was not called for.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.chunks = []
+        self.chars = 0
+        self.file = None  # Temporary file, once the output is over the spill threshold
+
+    def write(self, text):
+        self.chars += len(text)
+        if self.file is not None:
+            self.file.write(text.encode("utf-8", "replace"))
+            return
+        self.chunks.append(text)
+        if self.chars > self.store.spill_threshold:
+            # Outlives this call; closed by finish or close
+            self.file = tempfile.TemporaryFile(dir=self.store.spill_directory())  # noqa: SIM115
+            for chunk in self.chunks:
+                self.file.write(chunk.encode("utf-8", "replace"))
+            self.chunks = []
+
+    def finish(self):
+        """Store everything written and return its (offset, length)."""
+        if self.file is None:
+            return self.store.append("".join(self.chunks))
+        with self.file:
+            return self.store.append_file(self.file, self.chars)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class OutputStore:
+    """Keeps script outputs and hands out offsets to them.
+
+    Offsets only grow, so a reference stays valid until its output has been
+    dropped to stay under max_chars (in memory) or max_spill_bytes (on
+    disk); reading it after that returns None. Safe to use from several
+    worker threads.
+    """
+
+    def __init__(self, max_chars=DEFAULT_MAX_CHARS, spill_threshold=DEFAULT_SPILL_THRESHOLD,
+                 max_spill_bytes=DEFAULT_MAX_SPILL_BYTES, spill_dir=None):
+        self.max_chars = max_chars
+        self.spill_threshold = spill_threshold
+        self.max_spill_bytes = max_spill_bytes
+        self.spill_dir = spill_dir  # Created on first spill when None, and removed with the store
+        self.entries = {}  # offset -> text, or SpilledOutput
+        self.in_memory = OrderedDict()  # offset -> length of the in-memory outputs, oldest first
+        self.memory_chars = 0
+        self.segments = []  # SpillSegments, oldest first; the last one is being appended to
+        self.new_segment = True
+        self.end = 0  # offset the next output will get
+        self.lock = threading.Lock()
+
+    def spill_directory(self):
+        with self.lock:
+            return self._spill_directory()
+
+    def _spill_directory(self):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="script-output-")
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        return self.spill_dir
+
+    def start_run(self):
+        """Send spilled output from here on to a new spill file, so whole runs are dropped together."""
+        with self.lock:
+            self.new_segment = True
+
+    def writer(self):
+        """Return an OutputWriter for the output of one script."""
+        return OutputWriter(self)
+
+    def append(self, text):
+        """Store text and return its (offset, length)."""
+        if len(text) > self.spill_threshold:
+            data = text.encode("utf-8", "replace")
+            return self._spill(len(data), len(text), lambda segment, start: segment.write_at(start, data))
+        with self.lock:
+            offset, length = self._add(text, len(text))
+            self.in_memory[offset] = length
+            self.memory_chars += length
+            while self.memory_chars > self.max_chars and len(self.in_memory) > 1:
+                old_offset, old_length = self.in_memory.popitem(last=False)
+                self.entries.pop(old_offset, None)
+                self.memory_chars -= old_length
+            return offset, length
+
+    def append_file(self, source, length):
+        """Store the UTF-8 contents of an open binary file; length is its size in characters."""
+        size = source.seek(0, os.SEEK_END)
+
+        def copy(segment, position):
+            source.seek(0)
+            while True:
+                data = source.read(COPY_CHUNK)
+                if not data:
+                    break
+                segment.write_at(position, data)
+                position += len(data)
+        return self._spill(size, length, copy)
+
+    def _spill(self, size, length, copy):
+        """Reserve size bytes in the current spill file, fill them with copy(segment, start) and index them."""
+        with self.lock:
+            segment = self._segment()
+            start = segment.reserve(size)
+        try:
+            copy(segment, start)
+        finally:
+            with self.lock:
+                segment.writers -= 1
+        with self.lock:
+            return self._add(SpilledOutput(segment, start, size), length)
+
+    def _add(self, entry, length):
+        offset = self.end
+        self.entries[offset] = entry
+        self.end += length
+        if isinstance(entry, SpilledOutput):
+            entry.segment.offsets.append(offset)
+        return offset, length
+
+    def _segment(self):
+        """Return the spill file to append to, deleting the oldest runs' files while over max_spill_bytes."""
+        if self.new_segment or not self.segments:
+            self.segments.append(SpillSegment(os.path.join(self._spill_directory(), f"run-{self.end}.out")))
+            self.new_segment = False
+        while (len(self.segments) > 1 and not self.segments[0].writers
+               and sum(s.size for s in self.segments) > self.max_spill_bytes):
+            self._drop_segment(self.segments.pop(0))
+        return self.segments[-1]
+
+    def _drop_segment(self, segment):
+        for offset in segment.offsets:
+            self.entries.pop(offset, None)
+        segment.close()
+
+    def is_spilled(self, offset):
+        """Whether the output at offset lives in a spill file (and may be too big to show at once)."""
+        with self.lock:
+            return isinstance(self.entries.get(offset), SpilledOutput)
+
+    def read(self, offset, length):
+        """Return the text stored at offset, or None once it has been dropped."""
+        with self.lock:
+            entry = self.entries.get(offset)
+            if entry is None:
+                return None
+            if isinstance(entry, str):
+                return entry[:length]
+            return entry.segment.read(entry.start, entry.size).decode("utf-8", "replace")
+
+    def tail(self, offset, max_chars):
+        """Return at most the last max_chars characters (bytes, for spilled output) stored at offset, or None."""
+        with self.lock:
+            entry = self.entries.get(offset)
+            if entry is None or isinstance(entry, str):
+                return entry if entry is None else entry[-max_chars:]
+            size = min(entry.size, max_chars)
+            data = entry.segment.read(entry.start + entry.size - size, size)
+            # Skip the rest of a character cut off at the start
+            return data.decode("utf-8", "replace").lstrip("\ufffd")
+
+    def byte_size(self, offset):
+        """Return the size in bytes of a spilled output's file part, or None."""
+        with self.lock:
+            entry = self.entries.get(offset)
+            return entry.size if isinstance(entry, SpilledOutput) else None
+
+    def read_window(self, offset, start, size):
+        """Return (text, next start) for about size bytes of a spilled output from byte start.
+
+        The window is widened to the end of its last line, so consecutive
+        pages never split a line or a character.
+        """
+        with self.lock:
+            entry = self.entries.get(offset)
+            if not isinstance(entry, SpilledOutput):
+                return None, None
+            end = min(entry.size, start + size)
+            data = entry.segment.read(entry.start + start, min(entry.size, end + LINE_LOOKAHEAD) - start)
+            if end < entry.size:
+                newline = data.find(b"\n", end - start)
+                if newline >= 0:
+                    end = start + newline + 1
+                else:
+                    # A very long line: cut it, but not inside a UTF-8 sequence
+                    while end > start + 1 and data[end - start] & 0xC0 == 0x80:
+                        end -= 1
+            text = data[:end - start].decode("utf-8", "replace")
+            return (text if start == 0 else text.lstrip("\ufffd")), end
+
+    def size(self):
+        """Characters currently held in memory."""
+        with self.lock:
+            return self.memory_chars
+
+    def clear(self):
+        with self.lock:
+            for segment in self.segments:
+                segment.close()
+            self.segments = []
+            self.entries = {}
+            self.in_memory = OrderedDict()
+            self.memory_chars = 0
@@ -0,0 +1,66 @@
+"""Page-by-page viewer of a script's full output, read from the output store's spill file."""
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QDialog, QHBoxLayout, QLabel, QPlainTextEdit, QPushButton, QVBoxLayout
+
+# Bytes of output shown per page
+PAGE_BYTES = 1024 * 1024
+
+
+class OutputViewer(QDialog):
+    """Shows one spilled output a page at a time, so only the page on screen is held in memory."""
+
+    def __init__(self, store, offset, title, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.offset = offset
+        self.total = store.byte_size(offset) or 0
+        self.page_starts = [0]  # start of every page visited, for going back
+        self.next_start = None
+        self.setWindowTitle(f"Output: {title}")
+        self.resize(900, 600)
+
+        layout = QVBoxLayout(self)
+        self.text = QPlainTextEdit(self)
+        self.text.setReadOnly(True)
+        self.text.setFont(QFont("Monospace"))
+        self.text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        layout.addWidget(self.text)
+        controls = QHBoxLayout()
+        self.first_button = QPushButton("First")
+        self.previous_button = QPushButton("Previous")
+        self.next_button = QPushButton("Next")
+        self.last_button = QPushButton("Last")
+        self.position_label = QLabel()
+        for button in (self.first_button, self.previous_button, self.next_button, self.last_button):
+            controls.addWidget(button)
+        controls.addWidget(self.position_label)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.first_button.clicked.connect(lambda: self.show_page(0, reset=True))
+        self.previous_button.clicked.connect(self.show_previous)
+        self.next_button.clicked.connect(lambda: self.show_page(self.next_start))
+        self.last_button.clicked.connect(lambda: self.show_page(max(0, self.total - PAGE_BYTES), reset=True))
+        self.show_page(0, reset=True)
+
+    def show_page(self, start, reset=False):
+        if reset:
+            self.page_starts = [start]
+        elif start != self.page_starts[-1]:
+            self.page_starts.append(start)
+        text, self.next_start = self.store.read_window(self.offset, start, PAGE_BYTES)
+        if text is None:
+            self.text.setPlainText("(output no longer available)")
+            self.next_start = self.total
+        else:
+            self.text.setPlainText(text)
+        self.position_label.setText(f"Bytes {start:,}-{self.next_start:,} of {self.total:,}")
+        self.previous_button.setEnabled(start > 0)
+        self.next_button.setEnabled(self.next_start < self.total)
+
+    def show_previous(self):
+        if len(self.page_starts) > 1:
+            self.page_starts.pop()
+            self.show_page(self.page_starts[-1])
+        else:
+            self.show_page(max(0, self.page_starts[0] - PAGE_BYTES), reset=True)
@@ -0,0 +1,220 @@
+"""Compliance reports of a stored run as HTML, CSV or JSON.
+
+Reports are written as a stream straight from the run history, so the
+size of a run only affects the time it takes, not the memory:
+
+    python report_export.py -o report.html              latest run
+    python report_export.py --run 42 -o report.csv
+    python report_export.py --run 42 --output -o report.json
+
+The HTML report follows the script directory hierarchy, with a summary
+of every section above its scripts.
+"""
+import argparse
+import csv
+import html
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path, PurePath
+
+from run_history import RunHistory, default_history_path, format_time
+from script_runner import Status
+
+FORMATS = ("html", "csv", "json")
+CSV_COLUMNS = ["script", "host", "status", "exit_code", "cached", "wall", "user", "sys", "max_rss", "finished"]
+
+HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+section {{ margin-left: 1em; }}
+table {{ border-collapse: collapse; margin: 0.5em 0; }}
+td, th {{ border: 1px solid #ccc; padding: 2px 8px; text-align: left; }}
+.summary {{ color: #555; }}
+.PASS {{ color: #2E7D32; }} .FAIL {{ color: #C62828; }} .ERROR {{ color: #EF6C00; }}
+.TIMEOUT {{ color: #6A1B9A; }} .CANCELLED {{ color: #757575; }}
+pre {{ white-space: pre-wrap; margin: 0; }}
+</style></head><body>
+"""
+TABLE_HEAD = "<table><tr><th>Script</th><th>Host</th><th>Status</th><th>Exit code</th><th>Wall (s)</th></tr>\n"
+
+
+def result_fields(row):
+    """Map an iter_results row to the report's field names, without the result id; cached becomes a bool."""
+    fields = dict(zip(CSV_COLUMNS, row[1:], strict=True))
+    fields["cached"] = bool(fields["cached"])
+    return fields
+
+
+def format_counts(counts):
+    text = ", ".join(f"{counts[status.value]} {status.value.lower()}" for status in Status if counts[status.value])
+    return f"{sum(counts.values())} scripts: {text or 'none'}"
+
+
+def section_counts(history, run_id):
+    """Return (base directory, {section parts: Counter of statuses}) of a run.
+
+    Sections are directories relative to the directory all scripts share;
+    every section counts the scripts below it. One pass over the results,
+    keeping one Counter per directory.
+    """
+    by_dir = {}
+    for row in history.iter_results(run_id):
+        by_dir.setdefault(PurePath(row[1]).parent, Counter())[row[3]] += 1
+    if not by_dir:
+        return PurePath(), {}
+    base = PurePath(os.path.commonpath([str(d) for d in by_dir])) if len(by_dir) > 1 else next(iter(by_dir))
+    counts = {}
+    for directory, statuses in by_dir.items():
+        parts = directory.relative_to(base).parts
+        for depth in range(len(parts) + 1):
+            counts.setdefault(parts[:depth], Counter()).update(statuses)
+    return base, counts
+
+
+def write_html(history, run_id, out, include_output=False):
+    """Write the report as HTML with nested sections; returns the number of results written."""
+    run = history.run(run_id)
+    base, counts = section_counts(history, run_id)
+    title = f"Compliance report: run {run_id}"
+    out.write(HTML_HEAD.format(title=html.escape(title)))
+    out.write(f"<h1>{html.escape(title)}</h1>\n<p>Started {format_time(run['started'])}, finished "
+              f"{format_time(run['finished'])} ({html.escape(run['kind'])}) in {html.escape(str(base))}</p>\n")
+    out.write(f"<p class=\"summary\">{format_counts(counts.get((), Counter()))}</p>\n")
+
+    open_sections = ()  # Parts of the innermost open section
+    table_open = False
+    written = 0
+    for row in history.iter_results(run_id):
+        fields = result_fields(row)
+        path = PurePath(fields["script"])
+        parts = path.parent.relative_to(base).parts
+        if parts != open_sections:
+            if table_open:
+                out.write("</table>\n")
+                table_open = False
+            shared = 0
+            while shared < min(len(parts), len(open_sections)) and parts[shared] == open_sections[shared]:
+                shared += 1
+            out.write("</section>\n" * (len(open_sections) - shared))
+            for depth in range(shared + 1, len(parts) + 1):
+                level = min(depth + 1, 6)
+                out.write(f"<section><h{level}>{html.escape(parts[depth - 1])}</h{level}>\n"
+                          f"<p class=\"summary\">{format_counts(counts[parts[:depth]])}</p>\n")
+            open_sections = parts
+        if not table_open:
+            out.write(TABLE_HEAD)
+            table_open = True
+        status = fields["status"]
+        wall = "" if fields["wall"] is None else f"{fields['wall']:.3f}"
+        exit_code = "" if fields["exit_code"] is None else fields["exit_code"]
+        cached = " (cached)" if fields["cached"] else ""
+        out.write(f"<tr><td>{html.escape(path.name)}</td><td>{html.escape(fields['host'])}</td>"
+                  f"<td class=\"{status}\">{status}{cached}</td><td>{exit_code}</td><td>{wall}</td></tr>\n")
+        if include_output:
+            output = history.output(row[0])
+            if output:
+                out.write(f"<tr><td colspan=\"5\"><details><summary>Output</summary>"
+                          f"<pre>{html.escape(output)}</pre></details></td></tr>\n")
+        written += 1
+    if table_open:
+        out.write("</table>\n")
+    out.write("</section>\n" * len(open_sections))
+    out.write(f"<p class=\"summary\">Generated {format_time(time.time())}</p>\n</body></html>\n")
+    return written
+
+
+def write_csv(history, run_id, out, include_output=False):
+    """Write one CSV row per result; returns the number of results written."""
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS + (["output"] if include_output else []))
+    written = 0
+    for row in history.iter_results(run_id):
+        fields = result_fields(row)
+        # Booleans as in the JSON report, not as Python or SQLite write them
+        fields["cached"] = "true" if fields["cached"] else "false"
+        values = list(fields.values())
+        if include_output:
+            values.append(history.output(row[0]) or "")
+        writer.writerow(values)
+        written += 1
+    return written
+
+
+def write_json(history, run_id, out, include_output=False):
+    """Write {"run": ..., "results": [...]}, one result at a time; returns the number of results written."""
+    out.write(f'{{"run": {json.dumps(history.run(run_id))},\n "results": [')
+    written = 0
+    for row in history.iter_results(run_id):
+        fields = result_fields(row)
+        if include_output:
+            fields["output"] = history.output(row[0])
+        out.write(("\n  " if not written else ",\n  ") + json.dumps(fields))
+        written += 1
+    out.write("\n]}\n")
+    return written
+
+
+WRITERS = {"html": write_html, "csv": write_csv, "json": write_json}
+
+
+def export_report(history, run_id, path, fmt=None, include_output=False):
+    """Write the report of a run to path, in fmt or the format named by its suffix; returns the result count.
+
+    The report is written to a temporary file first, so an interrupted
+    export never leaves a truncated report behind.
+    """
+    fmt = fmt or path.suffix.lstrip(".").lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown report format '{fmt}'; use one of {', '.join(FORMATS)}")
+    if history.run(run_id) is None:
+        raise ValueError(f"There is no run {run_id} in the history")
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as out:
+            written = WRITERS[fmt](history, run_id, out, include_output)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the report of a stored run.")
+    parser.add_argument("-o", "--out", type=Path, required=True,
+                        help="report file; the format follows its suffix (.html, .csv or .json)")
+    parser.add_argument("--run", type=int, default=None, help="run id (default: the latest run)")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="override the format given by the suffix")
+    parser.add_argument("--output", action="store_true", help="include the stored output of every script")
+    parser.add_argument("--db", type=Path, default=None,
+                        help=f"history database (default: {default_history_path()})")
+    args = parser.parse_args(argv)
+
+    history = RunHistory(args.db)
+    try:
+        run_id = args.run
+        if run_id is None:
+            runs = history.recent_runs(1)
+            if not runs:
+                print("The run history is empty.", file=sys.stderr)
+                return 1
+            run_id = runs[0]["id"]
+        start = time.perf_counter()
+        try:
+            written = export_report(history, run_id, args.out, args.format, args.output)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        print(f"Wrote {written} results of run {run_id} to {args.out} in {time.perf_counter() - start:.2f}s",
+              file=sys.stderr)
+    finally:
+        history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
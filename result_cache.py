@@ -0,0 +1,212 @@
+"""Cache of check results keyed on script content and declared inputs.
+
+A check script opts in by declaring what it inspects in its header:
+
+    # cache-inputs: file:/etc/ssh/sshd_config pkg:openssh-server sysctl:net.ipv4.ip_forward
+
+or "# cache-inputs: none" when its result depends on nothing outside the
+script. The cache key combines a hash of the script with a fingerprint of
+every declared input, so editing the script or changing any input misses.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from script_catalog import default_cache_dir
+from script_meta import meta_list, read_metadata
+
+DEFAULT_TTL = 3600  # seconds
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024  # stored output across all entries
+MAX_OUTPUT_CHARS = 64 * 1024  # stored output per entry
+DPKG_STATUS = "/var/lib/dpkg/status"
+
+
+def file_fingerprint(path):
+    """Fingerprint a file or directory by its stat data."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def sysctl_fingerprint(key):
+    try:
+        with open(os.path.join("/proc/sys", key.replace(".", "/"))) as f:
+            return f.read().strip()
+    except OSError:
+        return "missing"
+
+
+class PackageVersions:
+    """Installed package versions from the dpkg status file, reparsed only when it changes."""
+
+    def __init__(self, status_path=DPKG_STATUS):
+        self.status_path = status_path
+        self.stamp = None
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, package):
+        with self.lock:
+            stamp = file_fingerprint(self.status_path)
+            if stamp != self.stamp:
+                self.versions = self._parse()
+                self.stamp = stamp
+            return self.versions.get(package, "not-installed")
+
+    def _parse(self):
+        versions = {}
+        package = version = None
+        installed = False
+        try:
+            with open(self.status_path, errors="replace") as f:
+                for line in f:
+                    if line.startswith("Package: "):
+                        package = line[9:].strip()
+                    elif line.startswith("Status: "):
+                        installed = line.rstrip().endswith(" installed")
+                    elif line.startswith("Version: "):
+                        version = line[9:].strip()
+                    elif not line.strip():
+                        if package and installed:
+                            versions[package] = version
+                        package = version = None
+                        installed = False
+            if package and installed:
+                versions[package] = version
+        except OSError:
+            pass
+        return versions
+
+
+class ResultCache:
+    """LRU cache of check results with a time-to-live and size bounds, saved as JSON."""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_dir() / "results.json"
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> {"script", "output", "failed", "returncode", "stored"}
+        self.size = 0
+        self.packages = PackageVersions()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._script_hashes = {}
+
+    # Keys
+
+    def script_hash(self, script_path):
+        stamp = file_fingerprint(script_path)
+        cached = self._script_hashes.get(str(script_path))
+        if cached and cached[0] == stamp:
+            return cached[1]
+        with open(script_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self._script_hashes[str(script_path)] = (stamp, digest)
+        return digest
+
+    def input_fingerprint(self, spec):
+        kind, _, name = spec.partition(":")
+        if kind == "file":
+            return file_fingerprint(name)
+        if kind == "pkg":
+            return self.packages.get(name)
+        if kind == "sysctl":
+            return sysctl_fingerprint(name)
+        return None
+
+    def key_for(self, script_path):
+        """Return the cache key for a check script, or None if it can't be cached.
+
+        Only chk scripts that declare cache-inputs are cacheable; a script
+        with an input of unknown kind is never cached.
+        """
+        if "chk" not in script_path.name:
+            return None
+        meta = read_metadata(script_path)
+        if "cache-inputs" not in meta:
+            return None
+        digest = hashlib.sha256()
+        try:
+            digest.update(self.script_hash(script_path).encode())
+        except OSError:
+            return None
+        for spec in sorted(meta_list(meta, "cache-inputs")):
+            if spec == "none":
+                continue
+            value = self.input_fingerprint(spec)
+            if value is None:
+                return None
+            digest.update(f"\0{spec}={value}".encode())
+        return digest.hexdigest()
+
+    # Entries
+
+    def get(self, key):
+        """Return the cached entry for key, or None if missing or expired."""
+        if not key:
+            return None
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry["stored"] > self.ttl:
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, script_path, output, failed, returncode):
+        if not key:
+            return
+        if key in self.entries:
+            self._remove(key)
+        entry = {"script": str(script_path), "output": output[-MAX_OUTPUT_CHARS:], "failed": failed,
+                 "returncode": returncode, "stored": time.time()}
+        self.entries[key] = entry
+        self.size += len(entry["output"])
+        self.dirty = True
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry["output"])
+        self.dirty = True
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+        self.dirty = True
+
+    # Persistence
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, entry in data.get("entries", []):
+            if now - entry.get("stored", 0) <= self.ttl:
+                self.entries[key] = entry
+                self.size += len(entry.get("output", ""))
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"entries": list(self.entries.items())}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,129 @@
+"""Table model of finished scripts for the status panel."""
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt, Signal
+from PySide6.QtGui import QColor
+
+from script_runner import Status
+
+COLUMNS = ["Script", "Status", "Wall (s)", "User (s)", "Sys (s)", "Max RSS (MiB)", "Blocks in", "Blocks out"]
+SCRIPT_COLUMN, STATUS_COLUMN = 0, 1
+# The invalid index, i.e. the top level; default parent of the row/column queries
+TOP_LEVEL = QModelIndex()
+STATUS_COLORS = {Status.PASS: QColor("#2E7D32"), Status.FAIL: QColor("#C62828"), Status.ERROR: QColor("#EF6C00"),
+                 Status.TIMEOUT: QColor("#6A1B9A"), Status.CANCELLED: QColor("#757575")}
+
+
+def result_label(result):
+    label = result.script_path.name
+    return f"{result.host}: {label}" if result.host else label
+
+
+def usage_values(usage):
+    """Return the numeric columns of a ResourceUsage, None where not measured."""
+    if usage is None:
+        return (None,) * 6
+    rss = usage.max_rss / 1024 if usage.max_rss is not None else None
+    return usage.wall, usage.user, usage.sys, rss, usage.read_blocks, usage.write_blocks
+
+
+class ResultTableModel(QAbstractTableModel):
+    """ScriptResults in the order they finished, with running counts per status.
+
+    Qt.UserRole holds a sort key for every column, so numeric columns sort
+    by value and rows without a measurement sort first.
+    """
+    counts_changed = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.results = []
+        self.counts = dict.fromkeys(Status, 0)
+        self.cached_count = 0
+
+    def rowCount(self, parent=TOP_LEVEL):
+        return 0 if parent.isValid() else len(self.results)
+
+    def columnCount(self, parent=TOP_LEVEL):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        result = self.results[index.row()]
+        column = index.column()
+        if column == SCRIPT_COLUMN:
+            if role in (Qt.DisplayRole, Qt.UserRole):
+                return result_label(result)
+            if role == Qt.ToolTipRole:
+                return str(result.script_path)
+        elif column == STATUS_COLUMN:
+            if role == Qt.DisplayRole:
+                return f"{result.status.value} (cached)" if result.cached else result.status.value
+            if role == Qt.UserRole:
+                return result.status.value
+            if role == Qt.ForegroundRole:
+                return STATUS_COLORS[result.status]
+        else:
+            value = usage_values(result.usage)[column - 2]
+            if role == Qt.DisplayRole:
+                if value is None:
+                    return ""
+                return f"{value:.3f}" if isinstance(value, float) else str(value)
+            if role == Qt.UserRole:
+                return (value is not None, value or 0)
+            if role == Qt.TextAlignmentRole:
+                return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def add_result(self, result):
+        """Append a finished script and update the counts."""
+        row = len(self.results)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.results.append(result)
+        self.endInsertRows()
+        self.counts[result.status] += 1
+        self.cached_count += result.cached
+        self.counts_changed.emit()
+
+    def result(self, row):
+        return self.results[row]
+
+    def clear(self):
+        self.beginResetModel()
+        self.results = []
+        self.counts = dict.fromkeys(Status, 0)
+        self.cached_count = 0
+        self.endResetModel()
+        self.counts_changed.emit()
+
+
+class ResultFilterProxy(QSortFilterProxyModel):
+    """Sorts results by the model's sort keys and filters them by status and script name."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.status = None  # Show only this Status, or everything when None
+        self.setSortRole(Qt.UserRole)
+        self.setFilterKeyColumn(SCRIPT_COLUMN)
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+    def set_status_filter(self, status):
+        self.status = status
+        self.invalidateFilter()
+
+    def lessThan(self, left, right):
+        # The sort keys are Python values (tuples for numeric columns), which QVariant can't compare
+        return left.data(Qt.UserRole) < right.data(Qt.UserRole)
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.status is not None and self.sourceModel().result(source_row).status != self.status:
+            return False
+        return super().filterAcceptsRow(source_row, source_parent)
+
+    def result(self, proxy_index):
+        """Return the ScriptResult shown at a proxy index."""
+        return self.sourceModel().result(self.mapToSource(proxy_index).row())
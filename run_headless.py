@@ -0,0 +1,387 @@
+"""Run check/remediation scripts without the GUI (and without importing Qt).
+
+Examples:
+    python run_headless.py -k chk -j 8
+    python run_headless.py -f 1_initial -f 2_services --format json
+    python run_headless.py -k chk --hosts web1,web2,db1 --per-host 4
+    python run_headless.py --rerun-failures
+    python run_headless.py --recheck-remediated
+    python run_headless.py -k chk -j 16 --adaptive --class-limit io=4
+"""
+import argparse
+import json
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from durations import DurationStats
+from facts_prefetch import FactsSnapshot, facts_for, is_check_batch
+from fanout import DEFAULT_GLOBAL_LIMIT, DEFAULT_PER_HOST_LIMIT, FanoutRunner, TransportError
+from load_monitor import SAMPLE_INTERVAL, LoadMonitor
+from report_export import FORMATS, export_report
+from run_history import RunHistory
+from script_catalog import DEFAULT_BASE_DIR, FOLDER_SUFFIXES, ScriptCatalog, counterpart
+from script_dag import DEFAULT_CLASS_LIMITS, RESOURCE_CLASSES, CycleError, DagScheduler, run_graph
+from script_runner import (
+    RUNNABLE_SUFFIXES,
+    SLOWEST_COUNT,
+    RunControl,
+    ScriptResult,
+    Status,
+    default_concurrency,
+    format_usage,
+    run_script,
+    script_status,
+    script_timeout,
+    slowest,
+)
+from shell_session import SESSION_SUFFIXES, SessionPool
+
+
+def positive_int(value):
+    """Parse an argument that must be a whole number of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a whole number of at least 1, got {value!r}")
+    return number
+
+
+def class_limit(value):
+    """Parse a --class-limit CLASS=N argument into (class, N)."""
+    name, sep, limit = value.partition("=")
+    if not sep or not name.strip() or not limit.strip().isdigit() or int(limit) < 1:
+        raise argparse.ArgumentTypeError(f"expected CLASS=N with N at least 1, got {value!r}")
+    name = name.strip().lower()
+    return RESOURCE_CLASSES.get(name, name), int(limit)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run check/remediation scripts without the GUI.")
+    parser.add_argument("-b", "--base-dir", type=Path, default=DEFAULT_BASE_DIR,
+                        help=f"script directory (default: {DEFAULT_BASE_DIR})")
+    parser.add_argument("-k", "--keyword", action="append", default=[],
+                        help="run scripts whose filename contains KEYWORD, e.g. chk or rem (repeatable)")
+    parser.add_argument("-f", "--folder", action="append", default=[],
+                        help="run all scripts under FOLDER, relative to the base directory (repeatable)")
+    parser.add_argument("--rerun-failures", action="store_true",
+                        help="run the scripts that failed, errored or timed out in the last recorded run")
+    parser.add_argument("--recheck-remediated", action="store_true",
+                        help="run the checks of the remediation scripts in the latest run that had any")
+    parser.add_argument("-j", "--jobs", type=positive_int, default=None,
+                        help="number of scripts to run at once (default: CPU count)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="run fewer scripts at once while the load average or CPU/IO pressure is high")
+    parser.add_argument("--class-limit", type=class_limit, action="append", default=[], metavar="CLASS=N",
+                        help="scripts of a '# resource-class:' run at once, e.g. io=4 (repeatable; defaults: "
+                             + ", ".join(f"{name}={limit}" for name, limit in DEFAULT_CLASS_LIMITS.items()) + ")")
+    parser.add_argument("--hosts", default="",
+                        help="comma-separated hosts to run on over SSH; local:<name> runs a local stand-in")
+    parser.add_argument("--per-host", type=positive_int, default=DEFAULT_PER_HOST_LIMIT,
+                        help=f"scripts running at once on each host (default: {DEFAULT_PER_HOST_LIMIT})")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="kill a script after this many seconds; a '# timeout:' header overrides it")
+    parser.add_argument("--run-timeout", type=float, default=None,
+                        help="stop the whole run after this many seconds; unstarted scripts are not run")
+    parser.add_argument("--sessions", action="store_true",
+                        help="run shell scripts in long-lived bash sessions (faster for many small checks)")
+    parser.add_argument("--no-prefetch", action="store_true",
+                        help="don't collect the facts checks declare ('# facts:') before they run")
+    parser.add_argument("--format", choices=("jsonl", "json", "text"), default="jsonl",
+                        help="jsonl: one record per script as it finishes, then a summary record; "
+                             "json: one document at the end")
+    parser.add_argument("--no-output", action="store_true", help="leave script output out of the results")
+    parser.add_argument("--slowest", type=int, default=SLOWEST_COUNT,
+                        help=f"number of slowest scripts listed in the summary (default: {SLOWEST_COUNT})")
+    parser.add_argument("--no-history", action="store_true", help="don't record this run in the run history")
+    parser.add_argument("--report", type=Path, default=None,
+                        help="write a report of the run to this .html, .csv or .json file")
+    parser.add_argument("--list", action="store_true", help="print the selected scripts without running them")
+    return parser.parse_args(argv)
+
+
+def select_scripts(catalog, keywords, folders):
+    """Return the selected scripts in catalog order, without duplicates."""
+    selected = {}
+    for keyword in keywords:
+        selected.update(dict.fromkeys(catalog.by_keyword(keyword)))
+    for folder in folders:
+        folder_path = catalog.base_dir / folder
+        selected.update(dict.fromkeys(catalog.in_folder(folder_path, FOLDER_SUFFIXES)))
+    return list(selected)
+
+
+def select_from_history(rerun_failures, recheck_remediated):
+    """Return the scripts picked from the run history, in path order, and print what they came from."""
+    selected = {}
+    history = RunHistory()
+    try:
+        if rerun_failures:
+            run_id, paths = history.failed_scripts()
+            print(f"Re-running {len(paths)} failed scripts from run {run_id}.", file=sys.stderr)
+            selected.update(dict.fromkeys(Path(path) for path in paths))
+        if recheck_remediated:
+            run_id, paths = history.remediated_scripts()
+            checks = [counterpart(path, "rem", "chk") for path in paths]
+            checks = [check for check in checks if check is not None and check.is_file()]
+            print(f"Re-checking {len(checks)} scripts remediated in run {run_id}.", file=sys.stderr)
+            selected.update(dict.fromkeys(checks))
+    finally:
+        history.close()
+    return [path for path in selected if path.is_file()]
+
+
+def result_record(run, duration, include_output=True, host=None):
+    record = {"host": host} if host else {}
+    record.update({
+        "script": str(run.script_path),
+        "status": script_status(run),
+        "exit_code": run.returncode,
+        "duration": round(duration, 3),
+    })
+    if run.usage is not None:
+        record["usage"] = usage_record(run.usage)
+    if include_output:
+        record["output"] = run.output
+    return record
+
+
+def usage_record(usage):
+    return {field: round(value, 3) if isinstance(value, float) else value
+            for field, value in usage._asdict().items() if value is not None}
+
+
+def error_record(host, script_path, error):
+    return {"host": host, "script": str(script_path), "status": "ERROR", "exit_code": None, "error": str(error)}
+
+
+def save_history(started, results, report=None):
+    """Store a finished run in the run history and write its report if asked to.
+
+    A broken history only costs a warning.
+    """
+    try:
+        history = RunHistory()
+        try:
+            run_id = history.start_run("headless", started=started)
+            history.add_results(run_id, results)
+            history.finish_run(run_id)
+            if report:
+                export_report(history, run_id, report, include_output=True)
+        finally:
+            history.close()
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Warning: could not write the run history or report: {e}", file=sys.stderr)
+
+
+def load_duration_stats():
+    """Return the scripts' recent durations from the run history; none if it can't be read."""
+    try:
+        history = RunHistory()
+        try:
+            return DurationStats.from_history(history)
+        finally:
+            history.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: could not read script durations from the run history: {e}", file=sys.stderr)
+        return DurationStats()
+
+
+def timed_run(script_path, sessions=None, timeout=None, control=None):
+    start = time.monotonic()
+    stream = sessions.stream if sessions and script_path.suffix in SESSION_SUFFIXES else None
+    run = run_script(script_path, stream=stream, timeout=script_timeout(script_path, timeout), control=control)
+    return run, time.monotonic() - start
+
+
+def write_record(record, fmt, out):
+    if fmt == "jsonl":
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+    elif fmt == "text":
+        host = f"{record['host']}: " if "host" in record else ""
+        out.write(f"{record['status']:<9} {host}{record['script']}\n")
+        out.flush()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from_history = args.rerun_failures or args.recheck_remediated
+    if not args.keyword and not args.folder and not from_history:
+        print("Nothing selected: use --keyword, --folder, --rerun-failures or --recheck-remediated.",
+              file=sys.stderr)
+        return 2
+    if args.report and (args.no_history or args.report.suffix.lstrip(".").lower() not in FORMATS):
+        print("--report needs the run history and a .html, .csv or .json file name.", file=sys.stderr)
+        return 2
+
+    catalog = ScriptCatalog(args.base_dir)
+    try:
+        catalog.load()
+    except OSError:
+        pass  # A read-only cache directory only costs a rescan next time
+    scripts = select_scripts(catalog, args.keyword, args.folder)
+    if from_history:
+        try:
+            scripts = list(dict.fromkeys(scripts + select_from_history(args.rerun_failures, args.recheck_remediated)))
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error: could not read the run history: {e}", file=sys.stderr)
+            return 2
+    runnable = [s for s in scripts if s.suffix in RUNNABLE_SUFFIXES]
+    for script in scripts:
+        if script.suffix not in RUNNABLE_SUFFIXES:
+            print(f"Skipping unsupported script type: {script}", file=sys.stderr)
+
+    if args.list:
+        for script in runnable:
+            print(script)
+        return 0
+
+    records = []
+    counts = {status.value: 0 for status in Status}
+    usages = []  # (label, ResourceUsage) for the slowest-scripts summary
+    history = []  # (ScriptResult, output, finished) for the run history, written at the end
+    started = time.monotonic()
+    started_at = time.time()
+    durations = load_duration_stats()
+    facts_report = None  # FactsReport when facts were prefetched
+
+    def report(record, usage=None, output=None):
+        counts[record["status"]] += 1
+        if facts_report is not None and "host" not in record and record["status"] != Status.CANCELLED.value:
+            facts_report.use(record["script"])
+        if usage is not None and "host" not in record and record["status"] != Status.CANCELLED.value:
+            usual = durations.regression(record["script"], usage.wall)
+            if usual is not None:
+                print(f"Warning: {record['script']} took {usage.wall:.1f}s, usually {usual:.1f}s",
+                      file=sys.stderr)
+            durations.add(record["script"], usage.wall)
+        if not args.no_history:
+            history.append((ScriptResult(Path(record["script"]), record.get("host"), Status(record["status"]),
+                                         record["exit_code"], usage), output, time.time()))
+        if usage is not None:
+            usages.append((f"{record['host']}: {record['script']}" if "host" in record else record["script"], usage))
+        if args.format == "json":
+            records.append(record)
+        else:
+            write_record(record, args.format, sys.stdout)
+
+    def cancelled():
+        print("Cancelled.", file=sys.stderr)
+        if history:
+            save_history(started_at, history, args.report)
+        return 130
+
+    hosts = [host.strip() for host in args.hosts.split(",") if host.strip()]
+    if hosts:
+        lock = threading.Lock()
+
+        def on_result(host, script_path, outcome, duration):
+            # Called from the fan-out worker threads
+            with lock:
+                if isinstance(outcome, TransportError):
+                    report(error_record(host, script_path, outcome), output=str(outcome))
+                else:
+                    report(result_record(outcome, duration, not args.no_output, host), outcome.usage,
+                           outcome.output)
+
+        runner = FanoutRunner(hosts, per_host_limit=args.per_host, global_limit=args.jobs or DEFAULT_GLOBAL_LIMIT,
+                              timeout=args.timeout, run_timeout=args.run_timeout)
+
+        # Cancelling kills the running scripts; the runner then reports every task not run as cancelled
+        previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: runner.cancel())
+        try:
+            runner.run(runnable, on_result=on_result)
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+        if runner.cancelled:
+            return cancelled()
+    else:
+        # Declared dependencies and exclusion groups are honoured, as in the GUI, and the
+        # scripts that took longest in earlier runs start first
+        class_limits = {**DEFAULT_CLASS_LIMITS, **dict(args.class_limit)}
+        scheduler = DagScheduler(args.base_dir, durations.expected(runnable), class_limits)
+        try:
+            scheduler.add(runnable)
+        except CycleError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        # Facts the checks declare are collected once up front; anything else may change them
+        facts = FactsSnapshot()
+        names = facts_for(runnable) if is_check_batch(runnable) and not args.no_prefetch else set()
+        try:
+            if names:
+                facts_report = facts.prepare(names)
+                print(facts_report.describe(), file=sys.stderr)
+            else:
+                facts.drop()  # Files left by earlier runs were not revalidated for this one
+        except OSError as e:
+            print(f"Warning: could not prefetch system facts: {e}", file=sys.stderr)
+        except KeyboardInterrupt:
+            print("Cancelled.", file=sys.stderr)
+            return 130
+        sessions = SessionPool() if args.sessions else None
+        control = RunControl(args.run_timeout)
+
+        def interrupt(signum, frame):
+            # Kill running scripts first, or leaving the thread pool would wait for them
+            control.cancel()
+            raise KeyboardInterrupt
+
+        jobs = args.jobs or default_concurrency()
+        monitor = LoadMonitor(jobs, class_limits.get("io", jobs)) if args.adaptive else None
+        if monitor is not None and not monitor.available:
+            print("Warning: load average not available, running without --adaptive", file=sys.stderr)
+            monitor = None
+
+        def follow_load():
+            workers, io_limit = monitor.update()
+            if "io" in class_limits:
+                scheduler.set_class_limit("io", io_limit)
+            return workers
+
+        previous_handler = signal.signal(signal.SIGINT, interrupt)
+        try:
+            run_graph(scheduler, lambda script: timed_run(script, sessions, args.timeout, control), jobs,
+                      on_done=lambda script, result: report(result_record(*result, not args.no_output),
+                                                            result[0].usage, result[0].output),
+                      adjust=follow_load if monitor is not None else None, interval=SAMPLE_INTERVAL)
+        except KeyboardInterrupt:
+            return cancelled()
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+            if sessions:
+                sessions.close()
+
+    if not args.no_history:
+        save_history(started_at, history, args.report)
+    summary = {"total": len(runnable) * max(1, len(hosts)), "passed": counts["PASS"], "failed": counts["FAIL"],
+               "errors": counts["ERROR"], "timeouts": counts["TIMEOUT"], "cancelled": counts["CANCELLED"],
+               "duration": round(time.monotonic() - started, 3),
+               "slowest": [{"script": label, **usage_record(usage)} for label, usage in slowest(usages, args.slowest)]}
+    if facts_report is not None:
+        summary["facts"] = facts_report.records()
+    if args.format == "json":
+        json.dump({"summary": summary, "results": records}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif args.format == "jsonl":
+        write_record({"summary": summary}, args.format, sys.stdout)
+    elif args.format == "text":
+        print(f"{summary['passed']} passed, {summary['failed']} failed, {summary['errors']} errors, "
+              f"{summary['timeouts']} timed out, {summary['cancelled']} cancelled in {summary['duration']}s")
+        if summary["slowest"]:
+            print("Slowest scripts:")
+            for label, usage in slowest(usages, args.slowest):
+                print(f"  {label}: {format_usage(usage)}")
+        if facts_report is not None:
+            print("\n".join(facts_report.lines()))
+    return 1 if any(count for status, count in counts.items() if status != "PASS") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""SQLite history of every run, for trends and comparisons across runs.
+
+One row per run, per script path and per result; outputs are stored
+compressed in a table of their own so result queries stay on small rows.
+Query from the command line with:
+
+    python run_history.py runs
+    python run_history.py flaky --last 20
+    python run_history.py diff 41 42
+    python run_history.py trend scripts/ubuntu/v22.04/1_initial/1.1_fs/1.1.1_chk.sh
+    python run_history.py fixed --days 7
+    python run_history.py failures
+"""
+import argparse
+import sqlite3
+import sys
+import time
+import zlib
+from pathlib import Path
+
+from script_catalog import default_cache_dir
+from script_runner import Status
+
+SCHEMA_VERSION = 1
+# Runs kept before the oldest are deleted with their results
+DEFAULT_MAX_RUNS = 5000
+# Characters of output stored per result
+MAX_OUTPUT_CHARS = 64 * 1024
+# Statuses that say something about the system rather than the run
+VERDICTS = (Status.PASS.value, Status.FAIL.value)
+# Statuses "Re-run failures" picks up
+RERUN_STATUSES = (Status.FAIL.value, Status.ERROR.value, Status.TIMEOUT.value)
+# Runs looked back through for the latest one that ran remediation scripts
+REMEDIATION_LOOKBACK = 50
+# Latest local, uncached durations kept per script, across runs (and after the runs are deleted)
+DURATION_SAMPLES = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    kind TEXT NOT NULL,
+    label TEXT,
+    total INTEGER NOT NULL DEFAULT 0,
+    passed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    timeouts INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS scripts (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    script_id INTEGER NOT NULL REFERENCES scripts(id),
+    host TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    cached INTEGER NOT NULL DEFAULT 0,
+    wall REAL,
+    user_time REAL,
+    sys_time REAL,
+    max_rss INTEGER,
+    read_blocks INTEGER,
+    write_blocks INTEGER,
+    finished REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    result_id INTEGER PRIMARY KEY REFERENCES results(id) ON DELETE CASCADE,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS durations (
+    script_id INTEGER PRIMARY KEY REFERENCES scripts(id),
+    samples TEXT NOT NULL  -- latest wall-clock seconds, space-separated, oldest first
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS results_run ON results(run_id, script_id, host);
+CREATE INDEX IF NOT EXISTS results_script ON results(script_id, host, run_id, status, wall);
+CREATE INDEX IF NOT EXISTS results_status ON results(status, run_id);
+"""
+
+RUN_COLUMNS = "id, started, finished, kind, label, total, passed, failed, errors, timeouts, cancelled"
+
+
+def default_history_path():
+    return default_cache_dir() / "history.sqlite3"
+
+
+class RunHistory:
+    """Stores runs and their results and answers cross-run questions with indexed queries.
+
+    Use it from one thread; results are written in batches with add_results.
+    """
+
+    def __init__(self, path=None, max_runs=DEFAULT_MAX_RUNS):
+        self.path = path or default_history_path()
+        self.max_runs = max_runs
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        with self.db:
+            self.db.executescript(SCHEMA)
+            self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._script_ids = {}
+
+    def close(self):
+        self.db.close()
+
+    # Writing
+
+    def start_run(self, kind, label=None, started=None):
+        """Record the start of a run and return its id."""
+        with self.db:
+            cursor = self.db.execute("INSERT INTO runs (started, kind, label) VALUES (?, ?, ?)",
+                                     (started or time.time(), kind, label))
+        return cursor.lastrowid
+
+    def script_id(self, path):
+        path = str(path)
+        script_id = self._script_ids.get(path)
+        if script_id is None:
+            self.db.execute("INSERT OR IGNORE INTO scripts (path) VALUES (?)", (path,))
+            script_id = self.db.execute("SELECT id FROM scripts WHERE path = ?", (path,)).fetchone()[0]
+            self._script_ids[path] = script_id
+        return script_id
+
+    def add_results(self, run_id, results):
+        """Store (ScriptResult, output text or None, finished time) tuples in one transaction."""
+        with self.db:
+            for result, output, finished in results:
+                usage = result.usage
+                cursor = self.db.execute(
+                    "INSERT INTO results (run_id, script_id, host, status, exit_code, cached, wall, user_time,"
+                    " sys_time, max_rss, read_blocks, write_blocks, finished) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                    (run_id, self.script_id(result.script_path), result.host or "", result.status.value,
+                     result.exit_code, int(result.cached),
+                     *(usage if usage is not None else (None,) * 6), finished))
+                if output:
+                    self.db.execute("INSERT INTO outputs (result_id, data) VALUES (?, ?)",
+                                    (cursor.lastrowid, zlib.compress(output[-MAX_OUTPUT_CHARS:].encode())))
+                if (usage is not None and usage.wall is not None and not result.host and not result.cached
+                        and result.status is not Status.CANCELLED):
+                    self._add_duration(self.script_id(result.script_path), usage.wall)
+
+    def _add_duration(self, script_id, wall):
+        row = self.db.execute("SELECT samples FROM durations WHERE script_id = ?", (script_id,)).fetchone()
+        samples = (row[0].split() if row else [])[1 - DURATION_SAMPLES:] + [f"{wall:.3f}"]
+        self.db.execute("INSERT OR REPLACE INTO durations (script_id, samples) VALUES (?, ?)",
+                        (script_id, " ".join(samples)))
+
+    def finish_run(self, run_id, finished=None):
+        """Close a run: store its totals and drop runs beyond max_runs."""
+        with self.db:
+            counts = dict(self.db.execute("SELECT status, COUNT(*) FROM results WHERE run_id = ? GROUP BY status",
+                                          (run_id,)).fetchall())
+            self.db.execute(
+                "UPDATE runs SET finished = ?, total = ?, passed = ?, failed = ?, errors = ?, timeouts = ?,"
+                " cancelled = ? WHERE id = ?",
+                (finished or time.time(), sum(counts.values()), *(counts.get(s.value, 0) for s in Status), run_id))
+            if self.max_runs:
+                self.db.execute("DELETE FROM runs WHERE id <= ?", (run_id - self.max_runs,))
+
+    # Queries
+
+    def recent_runs(self, limit=50):
+        """Return the latest runs as dicts, newest first."""
+        rows = self.db.execute(f"SELECT {RUN_COLUMNS} FROM runs ORDER BY id DESC LIMIT ?", (limit,))
+        names = RUN_COLUMNS.split(", ")
+        return [dict(zip(names, row, strict=True)) for row in rows]
+
+    def run(self, run_id):
+        """Return one run as a dict, or None."""
+        row = self.db.execute(f"SELECT {RUN_COLUMNS} FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return dict(zip(RUN_COLUMNS.split(", "), row, strict=True)) if row else None
+
+    def iter_results(self, run_id):
+        """Yield (result id, script, host, status, exit code, cached, wall, user, sys, max rss, finished)
+        for every result of a run in script path order, reading them from the database as they are consumed."""
+        return self.db.execute(
+            "SELECT r.id, s.path, r.host, r.status, r.exit_code, r.cached, r.wall, r.user_time, r.sys_time,"
+            " r.max_rss, r.finished FROM results r JOIN scripts s ON s.id = r.script_id WHERE r.run_id = ?"
+            " ORDER BY s.path, r.host", (run_id,))
+
+    def run_results(self, run_id):
+        """Return (result id, script, host, status, exit code, wall) of every result of a run."""
+        return self.db.execute(
+            "SELECT r.id, s.path, r.host, r.status, r.exit_code, r.wall FROM results r"
+            " JOIN scripts s ON s.id = r.script_id WHERE r.run_id = ? ORDER BY r.id", (run_id,)).fetchall()
+
+    def last_run_id(self):
+        """Return the id of the newest finished run with results, or None."""
+        return self.db.execute("SELECT MAX(id) FROM runs WHERE finished IS NOT NULL AND total > 0").fetchone()[0]
+
+    def run_scripts(self, run_id, statuses=None, host="", pattern="*"):
+        """Return the distinct script paths of a run's results on host, in path order.
+
+        statuses limits them to results with one of those status values and
+        pattern to paths matching a GLOB.
+        """
+        query = ("SELECT DISTINCT s.path FROM results r JOIN scripts s ON s.id = r.script_id"
+                 " WHERE r.run_id = ? AND r.host = ? AND s.path GLOB ?")
+        params = [run_id, host or "", pattern]
+        if statuses is not None:
+            query += f" AND r.status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        return [row[0] for row in self.db.execute(query + " ORDER BY s.path", params)]
+
+    def failed_scripts(self):
+        """Return (run id, script paths) of the local results of the last run that failed, errored or timed out."""
+        run_id = self.last_run_id()
+        return run_id, (self.run_scripts(run_id, RERUN_STATUSES) if run_id is not None else [])
+
+    def remediated_scripts(self, lookback=REMEDIATION_LOOKBACK):
+        """Return (run id, script paths) of the remediation scripts run locally by the latest run that ran any.
+
+        Cancelled results don't count; (None, []) if none of the last
+        lookback runs ran a remediation script.
+        """
+        ran = [s.value for s in Status if s is not Status.CANCELLED]
+        for run in self.recent_runs(lookback):
+            if run["finished"] is None:
+                continue
+            paths = [path for path in self.run_scripts(run["id"], ran, pattern="*rem*")
+                     if "rem" in Path(path).name]
+            if paths:
+                return run["id"], paths
+        return None, []
+
+    def recent_durations(self):
+        """Yield (script, [wall seconds]) with the latest local, uncached durations of every script, oldest first."""
+        for path, samples in self.db.execute("SELECT s.path, d.samples FROM durations d"
+                                             " JOIN scripts s ON s.id = d.script_id"):
+            yield path, [float(wall) for wall in samples.split()]
+
+    def output(self, result_id):
+        """Return the stored output of a result, or None."""
+        row = self.db.execute("SELECT data FROM outputs WHERE result_id = ?", (result_id,)).fetchone()
+        return zlib.decompress(row[0]).decode() if row else None
+
+    def flaky_scripts(self, last_runs=20, min_flips=2):
+        """Return (script, host, flips, runs, failures) for scripts whose PASS/FAIL verdict
+        changed at least min_flips times over the last last_runs runs; cached results don't count."""
+        return self.db.execute(
+            """
+            WITH recent AS (SELECT id FROM runs ORDER BY id DESC LIMIT ?),
+            seq AS (
+                SELECT script_id, host, status,
+                       LAG(status) OVER (PARTITION BY script_id, host ORDER BY run_id, id) AS previous
+                FROM results
+                WHERE run_id >= (SELECT MIN(id) FROM recent) AND status IN (?, ?) AND cached = 0
+            )
+            SELECT s.path, seq.host, SUM(previous IS NOT NULL AND previous != status) AS flips, COUNT(*),
+                   SUM(status = ?)
+            FROM seq JOIN scripts s ON s.id = seq.script_id
+            GROUP BY seq.script_id, seq.host
+            HAVING flips >= ?
+            ORDER BY flips DESC, s.path
+            """, (last_runs, *VERDICTS, Status.FAIL.value, min_flips)).fetchall()
+
+    def duration_trend(self, script_path, host="", limit=50):
+        """Return (run id, run start, status, wall seconds) of a script's latest results, newest first."""
+        return self.db.execute(
+            "SELECT r.run_id, runs.started, r.status, r.wall FROM results r JOIN runs ON runs.id = r.run_id"
+            " WHERE r.script_id = (SELECT id FROM scripts WHERE path = ?) AND r.host = ?"
+            " ORDER BY r.run_id DESC LIMIT ?", (str(script_path), host or "", limit)).fetchall()
+
+    def diff_runs(self, old_run, new_run):
+        """Return (script, host, old status, new status) for every result that differs between two runs.
+
+        A status of None means the script was not part of that run.
+        """
+        return self.db.execute(
+            """
+            SELECT s.path, a.host, a.status, b.status
+            FROM results a JOIN scripts s ON s.id = a.script_id
+            LEFT JOIN results b ON b.run_id = ? AND b.script_id = a.script_id AND b.host = a.host
+            WHERE a.run_id = ? AND (b.status IS NULL OR b.status != a.status)
+            UNION ALL
+            SELECT s.path, b.host, NULL, b.status
+            FROM results b JOIN scripts s ON s.id = b.script_id
+            WHERE b.run_id = ? AND NOT EXISTS (
+                SELECT 1 FROM results a WHERE a.run_id = ? AND a.script_id = b.script_id AND a.host = b.host)
+            ORDER BY 1, 2
+            """, (new_run, old_run, new_run, old_run)).fetchall()
+
+    def fixed_since(self, since):
+        """Return (script, host) of scripts that failed in a run started at or after since
+        (a timestamp) and whose latest verdict is PASS."""
+        first_run = self.db.execute("SELECT MIN(id) FROM runs WHERE started >= ?", (since,)).fetchone()[0]
+        if first_run is None:
+            return []
+        return self.db.execute(
+            """
+            WITH failed AS (SELECT DISTINCT script_id, host FROM results WHERE status = ? AND run_id >= ?)
+            SELECT s.path, f.host FROM failed f JOIN scripts s ON s.id = f.script_id
+            WHERE (SELECT status FROM results r
+                   WHERE r.script_id = f.script_id AND r.host = f.host AND r.status IN (?, ?)
+                   ORDER BY r.run_id DESC, r.id DESC LIMIT 1) = ?
+            ORDER BY s.path, f.host
+            """, (Status.FAIL.value, first_run, *VERDICTS, Status.PASS.value)).fetchall()
+
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the run history.")
+    parser.add_argument("--db", type=Path, default=None,
+                        help=f"history database (default: {default_history_path()})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runs = commands.add_parser("runs", help="list recent runs")
+    runs.add_argument("--limit", type=int, default=20)
+    flaky = commands.add_parser("flaky", help="scripts whose verdict keeps changing")
+    flaky.add_argument("--last", type=int, default=20, help="number of recent runs to look at")
+    flaky.add_argument("--min-flips", type=int, default=2)
+    diff = commands.add_parser("diff", help="results that differ between two runs")
+    diff.add_argument("old_run", type=int)
+    diff.add_argument("new_run", type=int)
+    trend = commands.add_parser("trend", help="durations of a script over recent runs")
+    trend.add_argument("script")
+    trend.add_argument("--host", default="")
+    trend.add_argument("--limit", type=int, default=20)
+    fixed = commands.add_parser("fixed", help="scripts that failed recently and pass now")
+    fixed.add_argument("--days", type=float, default=7)
+    commands.add_parser("failures", help="scripts that failed, errored or timed out in the last run")
+    args = parser.parse_args(argv)
+
+    history = RunHistory(args.db)
+    start = time.perf_counter()
+    if args.command == "runs":
+        for run in history.recent_runs(args.limit):
+            print(f"{run['id']:>6} {format_time(run['started'])} {run['kind']:<8} {run['total']:>5} scripts:"
+                  f" {run['passed']} pass, {run['failed']} fail, {run['errors']} error,"
+                  f" {run['timeouts']} timeout, {run['cancelled']} cancelled")
+    elif args.command == "flaky":
+        for path, host, flips, count, failures in history.flaky_scripts(args.last, args.min_flips):
+            print(f"{flips:>3} flips, {failures}/{count} failed  {host + ': ' if host else ''}{path}")
+    elif args.command == "diff":
+        for path, host, old, new in history.diff_runs(args.old_run, args.new_run):
+            print(f"{old or '-':<9} -> {new or '-':<9} {host + ': ' if host else ''}{path}")
+    elif args.command == "trend":
+        for run_id, started, status, wall in history.duration_trend(args.script, args.host, args.limit):
+            print(f"{run_id:>6} {format_time(started)} {status:<9} {'-' if wall is None else f'{wall:.3f}s'}")
+    elif args.command == "fixed":
+        for path, host in history.fixed_since(time.time() - args.days * 86400):
+            print(f"{host + ': ' if host else ''}{path}")
+    elif args.command == "failures":
+        run_id, paths = history.failed_scripts()
+        for path in paths:
+            print(path)
+        if run_id is not None:
+            print(f"{len(paths)} failed in run {run_id}", file=sys.stderr)
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)", file=sys.stderr)
+    history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Logging that never writes to disk on the calling thread.
+
+Records go through a queue to a listener thread, which writes the human
+readable log and a per-run JSONL stream of structured events next to it:
+
+    2024-05-01_09-30-00.log            human log
+    2024-05-01_09-30-00.events.jsonl   one JSON object per event
+
+Both files are rotated when they grow past max_bytes or get older than
+max_age seconds, keeping backup_count old files (name.1, name.2, ...).
+"""
+import atexit
+import datetime
+import json
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_MAX_AGE = 24 * 3600  # seconds
+DEFAULT_BACKUP_COUNT = 5
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+EVENT_LOGGER = "script_executor.events"
+
+_listener = None
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that also rolls over once the current file is max_age seconds old."""
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE,
+                 backup_count=DEFAULT_BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_age = max_age
+        self.rollover_at = time.time() + max_age
+
+    def shouldRollover(self, record):
+        if self.max_age and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.max_age
+
+
+class EventFormatter(logging.Formatter):
+    """Formats the event dict attached to a record as one JSON line."""
+
+    def format(self, record):
+        event = {"time": round(record.created, 3), "event": record.getMessage()}
+        event.update(getattr(record, "event", {}))
+        return json.dumps(event, default=str)
+
+
+def setup_logging(log_dir=Path("."), max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE,
+                  backup_count=DEFAULT_BACKUP_COUNT):
+    """Route the root logger and the event stream through a background writer.
+
+    Returns the path of the human log; the event stream uses the same name
+    with ".events.jsonl". Calling it again returns the existing log's path.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener.log_path
+    stem = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    log_path = Path(log_dir) / f"{stem}.log"
+
+    log_handler = SizeAndTimeRotatingFileHandler(log_path, max_bytes, max_age, backup_count)
+    log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    event_handler = SizeAndTimeRotatingFileHandler(log_path.with_suffix(".events.jsonl"), max_bytes, max_age,
+                                                   backup_count)
+    event_handler.setFormatter(EventFormatter())
+    # Events only reach the event handler, everything else only the human log
+    log_handler.addFilter(lambda record: record.name != EVENT_LOGGER)
+    event_handler.addFilter(lambda record: record.name == EVENT_LOGGER)
+
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, log_handler, event_handler, respect_handler_level=True)
+    _listener.log_path = log_path
+    _listener.start()
+    atexit.register(stop_logging)
+
+    _listener.queue_handler = QueueHandler(records)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(_listener.queue_handler)
+    return log_path
+
+
+def stop_logging():
+    """Write out everything still queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        logging.getLogger().removeHandler(_listener.queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def log_event(name, **fields):
+    """Add an event to the JSONL stream; fields must be JSON-serialisable (or str()-able)."""
+    logging.getLogger(EVENT_LOGGER).info(name, extra={"event": fields})
@@ -0,0 +1,281 @@
+import bisect
+import hashlib
+import json
+import os
+from collections import namedtuple
+from pathlib import Path
+
+from script_meta import header_title, read_header
+
+# Default location of the script tree, relative to the working directory
+DEFAULT_BASE_DIR = Path("./scripts/ubuntu/v22.04")
+CATALOG_VERSION = 2
+# Filename keywords that get their own index; they back "Complete Check" and "Complete Fix"
+CATEGORIES = ("chk", "rem")
+# Script types picked up by selecting a folder or file; those not in RUNNABLE_SUFFIXES are reported as unsupported
+FOLDER_SUFFIXES = {".sh", ".ps1"}
+# Files whose header is read for a title to search on
+TITLED_SUFFIXES = {".sh", ".py", ".ps1"}
+# Directories listed or checked between calls of a catalog's progress callback
+PROGRESS_EVERY = 256
+
+# title is the script's "# title:" header or first comment line ("" if it has none)
+ScriptEntry = namedtuple("ScriptEntry", "path suffix categories mtime size title", defaults=("",))
+
+
+def default_cache_dir():
+    """Return the directory where catalogs are stored."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "script-executor"
+
+
+def join_rel(parent, name):
+    return f"{parent}/{name}" if parent else name
+
+
+def counterpart(path, category, other):
+    """Return path with the last category keyword in its file name replaced by other, or None.
+
+    counterpart(p, "rem", "chk") is the check that goes with a remediation script.
+    """
+    path = Path(path)
+    i = path.name.rfind(category)
+    if i < 0:
+        return None
+    return path.with_name(path.name[:i] + other + path.name[i + len(category):])
+
+
+class ScriptCatalog:
+    """Index of every file under the script directory.
+
+    The index is saved to disk and revalidated by comparing directory
+    mtimes, so only directories whose entries changed are listed again.
+    Keyword, folder and suffix queries are answered from in-memory indexes.
+    """
+
+    def __init__(self, base_dir, cache_path=None):
+        self.base_dir = Path(base_dir)
+        if cache_path is None:
+            digest = hashlib.sha1(str(self.base_dir.resolve()).encode()).hexdigest()[:16]
+            cache_path = default_cache_dir() / f"catalog-{digest}.json"
+        self.cache_path = Path(cache_path)
+        self.dirs = {}  # relative dir -> {"mtime": ns, "files": [names], "subdirs": [names]}
+        self.files = {}  # relative file path -> ScriptEntry
+        self._indexes = None
+        self._keyword_cache = {}
+        self.generation = 0  # Bumped on every change, so derived indexes can tell they are stale
+        self.progress = None  # Called as progress(directories, files) every PROGRESS_EVERY directories
+
+    # Building and persistence
+
+    def load(self):
+        """Load the saved catalog and bring it up to date; return True if anything changed."""
+        if not self._read_cache():
+            self.scan()
+            self.save()
+            return True
+        changed = self.revalidate()
+        if changed:
+            self.save()
+        return changed
+
+    def scan(self):
+        """Rebuild the whole catalog from the filesystem."""
+        self.dirs = {}
+        self.files = {}
+        if self.base_dir.is_dir():
+            self._scan_tree("")
+        self._invalidate()
+
+    def revalidate(self):
+        """Relist directories whose mtime changed; return True if anything changed."""
+        changed = False
+        if not self.base_dir.is_dir():
+            changed = bool(self.dirs or self.files)
+            self.dirs, self.files = {}, {}
+        else:
+            for checked, rel in enumerate(sorted(self.dirs), 1):
+                if self.progress and checked % PROGRESS_EVERY == 0:
+                    self.progress(checked, len(self.files))
+                info = self.dirs.get(rel)
+                if info is None:
+                    continue  # Removed while relisting a parent
+                mtime = self._dir_mtime(rel)
+                if mtime != info["mtime"]:
+                    self.refresh_dir(rel)
+                    changed = True
+            if "" not in self.dirs:
+                self._scan_tree("")
+                changed = True
+        if changed:
+            self._invalidate()
+        return changed
+
+    def refresh_dir(self, rel):
+        """Relist one directory, adding and dropping its files and subdirectories."""
+        old = self.dirs.get(rel)
+        if old is not None:
+            for name in old["files"]:
+                self.files.pop(join_rel(rel, name), None)
+        if self._dir_mtime(rel) is None:
+            self._drop_tree(rel)
+            self._invalidate()
+            return
+        old_subdirs = set(old["subdirs"]) if old else set()
+        subdirs = self._scan_dir(rel)
+        for name in old_subdirs - set(subdirs):
+            self._drop_tree(join_rel(rel, name))
+        for name in subdirs:
+            child = join_rel(rel, name)
+            if child not in self.dirs:
+                self._scan_tree(child)
+        self._invalidate()
+
+    def save(self):
+        """Write the catalog to its cache file."""
+        data = {
+            "version": CATALOG_VERSION,
+            "base_dir": str(self.base_dir.resolve()),
+            "dirs": self.dirs,
+            "files": {rel: list(entry[1:]) for rel, entry in self.files.items()},
+        }
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != CATALOG_VERSION or data.get("base_dir") != str(self.base_dir.resolve()):
+            return False
+        self.dirs = data["dirs"]
+        self.files = {rel: ScriptEntry(rel, suffix, tuple(categories), mtime, size, title)
+                      for rel, (suffix, categories, mtime, size, title) in data["files"].items()}
+        self._invalidate()
+        return True
+
+    def _dir_mtime(self, rel):
+        try:
+            return os.stat(self.base_dir / rel).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan_dir(self, rel):
+        """List one directory into the catalog and return its subdirectory names."""
+        files, subdirs = [], []
+        try:
+            mtime = os.stat(self.base_dir / rel).st_mtime_ns
+            with os.scandir(self.base_dir / rel) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            st = entry.stat()
+                            path = join_rel(rel, entry.name)
+                            suffix = os.path.splitext(entry.name)[1]
+                            title = ""
+                            if suffix in TITLED_SUFFIXES:
+                                title = header_title(read_header(entry.path) or [])
+                            self.files[path] = ScriptEntry(
+                                path, suffix, tuple(c for c in CATEGORIES if c in entry.name),
+                                st.st_mtime_ns, st.st_size, title)
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return []
+        self.dirs[rel] = {"mtime": mtime, "files": sorted(files), "subdirs": sorted(subdirs)}
+        if self.progress and len(self.dirs) % PROGRESS_EVERY == 0:
+            self.progress(len(self.dirs), len(self.files))
+        return subdirs
+
+    def _scan_tree(self, rel):
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            stack.extend(join_rel(current, name) for name in self._scan_dir(current))
+
+    def _drop_tree(self, rel):
+        info = self.dirs.pop(rel, None)
+        if info is None:
+            return
+        for name in info["files"]:
+            self.files.pop(join_rel(rel, name), None)
+        for name in info["subdirs"]:
+            self._drop_tree(join_rel(rel, name))
+
+    # Queries
+
+    def _invalidate(self):
+        self._indexes = None
+        self._keyword_cache = {}
+        self.generation += 1
+
+    def _build_indexes(self):
+        if self._indexes is None:
+            ordered = sorted(self.files)
+            by_suffix, by_category = {}, {c: [] for c in CATEGORIES}
+            for rel in ordered:
+                entry = self.files[rel]
+                by_suffix.setdefault(entry.suffix, []).append(rel)
+                for category in entry.categories:
+                    by_category[category].append(rel)
+            self._indexes = (ordered, by_suffix, by_category)
+        return self._indexes
+
+    def ordered(self):
+        """Return every relative file path, sorted."""
+        return self._build_indexes()[0]
+
+    def to_path(self, rel):
+        return self.base_dir / rel
+
+    def relative(self, path):
+        """Return path relative to the base directory, or None if it lies outside it."""
+        try:
+            rel = Path(path).relative_to(self.base_dir).as_posix()
+        except ValueError:
+            return None
+        return "" if rel == "." else rel
+
+    def __len__(self):
+        return len(self.files)
+
+    def by_keyword(self, keyword):
+        """Return paths of files whose name contains keyword."""
+        ordered, _, by_category = self._build_indexes()
+        if keyword in by_category:
+            rels = by_category[keyword]
+        else:
+            rels = self._keyword_cache.get(keyword)
+            if rels is None:
+                rels = [rel for rel in ordered if keyword in rel.rsplit("/", 1)[-1]]
+                self._keyword_cache[keyword] = rels
+        return [self.to_path(rel) for rel in rels]
+
+    def by_suffix(self, suffix):
+        """Return paths of files with the given suffix."""
+        return [self.to_path(rel) for rel in self._build_indexes()[1].get(suffix, [])]
+
+    def in_folder(self, folder, suffixes=None):
+        """Return paths of files under folder (recursively), optionally limited to suffixes."""
+        ordered = self._build_indexes()[0]
+        rel = self.relative(folder)
+        if rel is None:
+            return []
+        if rel:
+            prefix = rel + "/"
+            start = bisect.bisect_left(ordered, prefix)
+            end = bisect.bisect_left(ordered, prefix[:-1] + chr(ord("/") + 1))
+            rels = ordered[start:end]
+        else:
+            rels = ordered
+        if suffixes is not None:
+            rels = [r for r in rels if self.files[r].suffix in suffixes]
+        return [self.to_path(r) for r in rels]
@@ -0,0 +1,357 @@
+"""Dependency-aware scheduling of scripts.
+
+Scripts declare ordering and exclusion in their header:
+
+    # depends: 1.1.1_rem.sh 1.1.2_rem.sh
+    # exclusive: apt
+    # resource-class: io-heavy
+
+"depends" lists scripts (by filename, or by a trailing part of their path)
+that must finish before this one starts; dependencies outside the current
+run are ignored. Scripts sharing an "exclusive" group never run at the same
+time, and "conflicts: other.sh" keeps a pair of scripts apart. The same keys
+can be given per script in a "scripts.manifest.json" file in the script
+directory, e.g. {"1.2_rem.sh": {"depends": ["1.1_rem.sh"], "exclusive": ["apt"]}}.
+
+"resource-class" names what a script mostly uses: io (filesystem-wide
+find/stat sweeps), cpu, apt (package manager) or network (network
+configuration). Each class has its own limit on how many of its scripts
+run at once (DEFAULT_CLASS_LIMITS, overridable per run); cpu and
+unclassified scripts are only bound by the overall concurrency.
+"""
+import bisect
+import json
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from script_meta import meta_list, read_metadata
+
+MANIFEST_NAME = "scripts.manifest.json"
+# Spellings accepted in "resource-class" declarations; other names are classes of their own
+RESOURCE_CLASSES = {"io": "io", "io-heavy": "io", "cpu": "cpu", "apt": "apt", "dpkg": "apt", "apt/dpkg": "apt",
+                    "network": "network", "network-config": "network"}
+# Scripts of a class run at once; classes not listed have no limit of their own
+DEFAULT_CLASS_LIMITS = {"io": 2, "apt": 1, "network": 1}
+
+
+class CycleError(Exception):
+    """Raised when script dependencies form a cycle."""
+
+    def __init__(self, cycle):
+        super().__init__("Dependency cycle: " + " -> ".join(p.name for p in cycle))
+        self.cycle = cycle
+
+
+def load_manifest(base_dir):
+    """Return the per-script declarations from the sidecar manifest, if there is one."""
+    if base_dir is None:
+        return {}
+    try:
+        with open(base_dir / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def script_declarations(script_path, manifest):
+    """Return (depends, exclusive groups, conflicts) for a script from its header and the manifest."""
+    meta = read_metadata(script_path)
+    entry = manifest.get(script_path.name, {})
+    depends = meta_list(meta, "depends") + list(entry.get("depends", []))
+    exclusive = meta_list(meta, "exclusive") + list(entry.get("exclusive", []))
+    conflicts = meta_list(meta, "conflicts") + list(entry.get("conflicts", []))
+    return depends, exclusive, conflicts
+
+
+def resource_class(script_path, manifest):
+    """Return a script's resource class from its header or the manifest, or None."""
+    names = meta_list(read_metadata(script_path), "resource-class")
+    names += list(manifest.get(script_path.name, {}).get("resource-class", []))
+    if not names:
+        return None
+    name = names[0].lower()
+    return RESOURCE_CLASSES.get(name, name)
+
+
+class ScriptGraph:
+    """Dependency graph and exclusion groups of a set of scripts."""
+
+    def __init__(self, scripts=(), base_dir=None):
+        self.manifest = load_manifest(base_dir)
+        self.order = []  # scripts in submission order
+        self.deps = {}  # script -> scripts it waits for
+        self.dependents = {}  # script -> scripts waiting for it
+        self.locks = {}  # script -> exclusion group names
+        self.classes = {}  # script -> resource class, for classified scripts
+        self.add(scripts)
+
+    def add(self, scripts):
+        """Add scripts and resolve declarations against everything in the graph.
+
+        Raises CycleError, leaving the graph unchanged, if the new edges form a cycle.
+        """
+        new = [s for s in dict.fromkeys(scripts) if s not in self.deps]
+        if not new:
+            return []
+        order = self.order + new
+        everything, added = set(order), set(new)
+        by_name = {}
+        for script in order:
+            by_name.setdefault(script.name, []).append(script)
+
+        deps = {s: set(d) for s, d in self.deps.items()}
+        locks = {s: set(groups) for s, groups in self.locks.items()}
+        declarations = {script: script_declarations(script, self.manifest) for script in new}
+        # Every new script's groups first, so a conflict naming a later one is not overwritten by them
+        for script in new:
+            locks[script] = set(declarations[script][1])
+        for script in new:
+            depends, _, conflicts = declarations[script]
+            deps[script] = {d for name in depends for d in self._resolve(name, by_name, everything) if d != script}
+            for name in conflicts:
+                for other in self._resolve(name, by_name, everything):
+                    pair = "conflict:" + "|".join(sorted((script.as_posix(), other.as_posix())))
+                    locks[script].add(pair)
+                    locks.setdefault(other, set()).add(pair)
+        # Earlier scripts may depend on ones added now
+        for script in self.order:
+            depends, _, _ = script_declarations(script, self.manifest)
+            deps[script] |= {d for name in depends for d in self._resolve(name, by_name, added) if d != script}
+
+        cycle = find_cycle(order, deps)
+        if cycle:
+            raise CycleError(cycle)
+        self.order, self.deps, self.locks = order, deps, locks
+        for script in new:
+            cls = resource_class(script, self.manifest)
+            if cls:
+                self.classes[script] = cls
+        self.dependents = {s: set() for s in order}
+        for script, required in deps.items():
+            for dep in required:
+                self.dependents[dep].add(script)
+        return new
+
+    @staticmethod
+    def _resolve(name, by_name, candidates):
+        """Return the scripts in candidates that a dependency name refers to."""
+        if "/" not in name:
+            return [s for s in by_name.get(name, []) if s in candidates]
+        suffix = "/" + name.lstrip("/")
+        return [s for s in by_name.get(name.rsplit("/", 1)[-1], [])
+                if s in candidates and (s.as_posix().endswith(suffix) or s.as_posix() == name)]
+
+    def critical_path(self, durations=None):
+        """Return (length, scripts) of the longest dependency chain.
+
+        durations maps scripts to expected seconds; without it every script
+        counts as 1, so the length is the number of scripts in the chain.
+        """
+        weight = (lambda s: durations.get(s, 1.0)) if durations else (lambda s: 1.0)
+        best, prev = {}, {}
+        for script in topological_order(self.order, self.deps):
+            start = 0.0
+            for dep in self.deps[script]:
+                if best[dep] > start:
+                    start, prev[script] = best[dep], dep
+            best[script] = start + weight(script)
+        if not best:
+            return 0, []
+        end = max(best, key=best.get)
+        chain = [end]
+        while chain[-1] in prev:
+            chain.append(prev[chain[-1]])
+        return best[end], chain[::-1]
+
+
+def topological_order(order, deps):
+    """Return scripts so that each comes after its dependencies, keeping the given order otherwise."""
+    indegree = {s: len(deps[s]) for s in order}
+    dependents = {s: [] for s in order}
+    for script in order:
+        for dep in deps[script]:
+            dependents[dep].append(script)
+    ready = deque(s for s in order if not indegree[s])
+    result = []
+    while ready:
+        script = ready.popleft()
+        result.append(script)
+        for child in dependents[script]:
+            indegree[child] -= 1
+            if not indegree[child]:
+                ready.append(child)
+    return result
+
+
+def find_cycle(order, deps):
+    """Return one dependency cycle as a list of scripts, or None."""
+    state = {}  # script -> 1 while on the stack, 2 when done
+    for root in order:
+        if root in state:
+            continue
+        stack = [(root, iter(deps[root]))]
+        path = [root]
+        state[root] = 1
+        while stack:
+            script, children = stack[-1]
+            for child in children:
+                if state.get(child) == 1:
+                    return path[path.index(child):] + [child]
+                if child not in state:
+                    state[child] = 1
+                    path.append(child)
+                    stack.append((child, iter(deps[child])))
+                    break
+            else:
+                state[script] = 2
+                path.pop()
+                stack.pop()
+    return None
+
+
+class DagScheduler:
+    """Hands out scripts whose dependencies are done and whose exclusion groups are free.
+
+    Ready scripts are handed out in submission order, or, given expected
+    durations, longest remaining chain first: a script's priority is its
+    own expected duration plus that of the longest chain of scripts waiting
+    on it. Without dependencies that is longest-processing-time-first. A
+    script blocked only by an exclusion group or by its resource class
+    being at its limit is skipped until a slot is released.
+    """
+
+    def __init__(self, base_dir=None, durations=None, class_limits=None):
+        self.graph = ScriptGraph(base_dir=base_dir)
+        self.durations = durations or {}  # script -> expected seconds
+        self.class_limits = dict(DEFAULT_CLASS_LIMITS if class_limits is None else class_limits)
+        self.class_running = Counter()
+        self.waiting = {}  # script -> number of unfinished dependencies
+        self.ready = []  # sorted by _priority
+        self.rank = {}  # script -> expected seconds from its start to the end of its longest chain
+        self.sequence = {}  # script -> submission position, breaking ties
+        self.held = set()
+        self.started = set()
+        self.finished = set()
+
+    def add(self, scripts):
+        """Queue scripts and return the ones queued, in order.
+
+        Scripts already queued or running are left alone; finished (or
+        drained) ones are queued to run again. Raises CycleError, queueing
+        nothing, if their dependencies form a cycle.
+        """
+        queued = [s for s in dict.fromkeys(scripts)
+                  if s not in self.waiting and (s not in self.started or s in self.finished)]
+        self.graph.add(queued)
+        self.started.difference_update(queued)
+        self.finished.difference_update(queued)
+        pending = set(self.waiting).union(queued)
+        self.sequence = {script: i for i, script in enumerate(self.graph.order)}
+        self.rank = self._ranks() if self.durations else {}
+        # New edges can make queued scripts wait, so recount everything not started yet
+        self.waiting = {}
+        self.ready = []
+        for script in self.graph.order:
+            if script not in pending:
+                continue
+            # Only dependencies queued or running now are waited for; dropped ones are outside the run
+            remaining = sum(1 for dep in self.graph.deps[script]
+                            if dep in pending or (dep in self.started and dep not in self.finished))
+            self.waiting[script] = remaining
+            if not remaining:
+                self.ready.append(script)
+        self.ready.sort(key=self._priority)
+        return queued
+
+    def _ranks(self):
+        rank = {}
+        for script in reversed(topological_order(self.graph.order, self.graph.deps)):
+            rank[script] = self.durations.get(script, 0.0) + max(
+                (rank[child] for child in self.graph.dependents[script]), default=0.0)
+        return rank
+
+    def _priority(self, script):
+        return -self.rank.get(script, 0.0), self.sequence[script]
+
+    def pop_ready(self):
+        """Return the next script that may start now, or None."""
+        for i, script in enumerate(self.ready):
+            if self.graph.locks.get(script, set()) & self.held:
+                continue
+            cls = self.graph.classes.get(script)
+            if cls is not None and self.class_running[cls] >= self.class_limits.get(cls, float("inf")):
+                continue
+            del self.ready[i]
+            self.held |= self.graph.locks.get(script, set())
+            if cls is not None:
+                self.class_running[cls] += 1
+            self.started.add(script)
+            self.waiting.pop(script, None)
+            return script
+        return None
+
+    def finish(self, script):
+        """Mark a started script as done, releasing its groups, class slot and dependents."""
+        self.held -= self.graph.locks.get(script, set())
+        cls = self.graph.classes.get(script)
+        if cls is not None:
+            self.class_running[cls] -= 1
+        self.finished.add(script)
+        for child in self.graph.dependents.get(script, ()):
+            if child in self.waiting:
+                self.waiting[child] -= 1
+                if not self.waiting[child]:
+                    bisect.insort(self.ready, child, key=self._priority)
+
+    def set_class_limit(self, cls, limit):
+        """Change how many scripts of a resource class may run at once; None removes the limit."""
+        if limit is None:
+            self.class_limits.pop(cls, None)
+        else:
+            self.class_limits[cls] = max(1, limit)
+
+    def drain(self):
+        """Drop every script that has not started yet and return them in queue order."""
+        dropped = list(self.waiting)
+        self.waiting = {}
+        self.ready = []
+        return dropped
+
+    def pending_count(self):
+        """Number of scripts added but not started yet."""
+        return len(self.waiting)
+
+    def __len__(self):
+        return self.pending_count()
+
+
+def run_graph(scheduler, run_fn, max_workers, on_done=None, adjust=None, interval=None):
+    """Run everything in scheduler with run_fn on a thread pool, respecting the DAG.
+
+    on_done(script, result) is called in the calling thread as scripts finish.
+    adjust(), if given, is called every interval seconds and returns the
+    number of scripts (at most max_workers) that may run from then on.
+    """
+    limit = max_workers
+    next_adjust = time.monotonic() + interval if adjust else None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while True:
+            while len(running) < limit:
+                script = scheduler.pop_ready()
+                if script is None:
+                    break
+                running[executor.submit(run_fn, script)] = script
+            if not running:
+                break
+            timeout = max(0.0, next_adjust - time.monotonic()) if adjust else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if adjust and time.monotonic() >= next_adjust:
+                limit = max(1, min(max_workers, adjust()))
+                next_adjust = time.monotonic() + interval
+            for future in done:
+                script = running.pop(future)
+                scheduler.finish(script)
+                if on_done:
+                    on_done(script, future.result())
@@ -0,0 +1,86 @@
+"""Metadata declared in script header comments.
+
+A directive is a comment line of the form "# key: value" near the top of a
+script, for example:
+
+    #!/bin/bash
+    # title: Ensure permissions on /etc/login.defs are configured
+    # cache-inputs: file:/etc/login.defs pkg:login sysctl:kernel.randomize_va_space
+
+Keys are case-insensitive; a key given on several lines has its values
+joined with spaces.
+"""
+import itertools
+import os
+import re
+import threading
+
+# Only this many lines from the top of a script are searched for directives
+HEADER_LINES = 40
+
+DIRECTIVE_RE = re.compile(r"^\s*#\s*([A-Za-z][\w-]*)\s*:\s*(.*?)\s*$")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def parse_header(lines):
+    """Return the directives found in an iterable of header lines."""
+    meta = {}
+    for line in lines:
+        if line.startswith("#!"):
+            continue
+        match = DIRECTIVE_RE.match(line)
+        if match:
+            key = match.group(1).lower()
+            meta[key] = f"{meta[key]} {match.group(2)}" if key in meta else match.group(2)
+    return meta
+
+
+def read_header(script_path):
+    """Return the first HEADER_LINES lines of a script, or None if it can't be read."""
+    try:
+        with open(script_path, errors="replace") as f:
+            return list(itertools.islice(f, HEADER_LINES))
+    except OSError:
+        return None
+
+
+def header_title(lines):
+    """Return a script's "# title:" directive, or else its first plain comment line."""
+    title = parse_header(lines).get("title")
+    if title:
+        return title
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("#") and not stripped.startswith("#!") and not DIRECTIVE_RE.match(stripped):
+            text = stripped.lstrip("#").strip()
+            if text:
+                return text
+    return ""
+
+
+def read_metadata(script_path):
+    """Return the header directives of a script, cached until the file changes."""
+    try:
+        st = os.stat(script_path)
+    except OSError:
+        return {}
+    key = str(script_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    lines = read_header(script_path)
+    if lines is None:
+        return {}
+    meta = parse_header(lines)
+    with _cache_lock:
+        _cache[key] = (stamp, meta)
+    return meta
+
+
+def meta_list(meta, key):
+    """Return a directive's value split on whitespace and commas."""
+    return [item for item in re.split(r"[\s,]+", meta.get(key, "")) if item]
@@ -0,0 +1,382 @@
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+from facts_prefetch import FactsSnapshot, facts_for, is_check_batch
+from fanout import DEFAULT_GLOBAL_LIMIT, DEFAULT_PER_HOST_LIMIT, FanoutRunner
+from load_monitor import SAMPLE_INTERVAL, LoadMonitor
+from output_store import PREVIEW_CHARS, preview
+from script_dag import DEFAULT_CLASS_LIMITS, DagScheduler
+from script_runner import (
+    DEFAULT_TAIL_CHARS,
+    RunControl,
+    ScriptResult,
+    Status,
+    default_concurrency,
+    run_script,
+    run_status,
+    script_timeout,
+)
+from shell_session import SESSION_SUFFIXES, SessionPool
+
+
+class ScriptWorker(QThread):
+    """Worker thread to run scripts in the background."""
+    finished = Signal()
+    output_chunk = Signal(object, str)  # script_path, raw text as it is read
+    output_lines = Signal(object, list)  # script_path, complete lines
+
+    def __init__(self, script_path, sessions=None, output_store=None, timeout=None, control=None):
+        super().__init__()
+        self.script_path = script_path
+        self.sessions = sessions
+        self.output_store = output_store
+        self.timeout = timeout  # seconds, or None for no limit
+        self.control = control  # RunControl of the run this script belongs to
+        self.saw_fail = False
+        self.returncode = None
+        self.usage = None  # ResourceUsage once the script has finished
+        self.result = ("", script_path)
+        self.writer = None  # OutputWriter collecting the full output
+        self.record = None  # ScriptResult once the script has finished
+
+    def run(self):
+        """Run the script, streaming its output, and build its result record.
+
+        With an output store the full output goes there as it is produced;
+        self.result then only keeps a preview of its end.
+        """
+        self.writer = self.output_store.writer() if self.output_store is not None else None
+        try:
+            status = self.run_streaming()
+            offset, length = None, None
+            if self.output_store is not None:
+                offset, length = self.store_output()
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+        self.record = ScriptResult(self.script_path, None, status, self.returncode, self.usage, offset, length)
+
+    def store_output(self):
+        """Move the output to the store, keeping only a preview in self.result; returns its (offset, length)."""
+        try:
+            if self.writer.chars:
+                offset, length = self.writer.finish()
+            else:
+                offset, length = self.output_store.append(self.result[0])
+        except OSError as e:
+            # Out of disk space for the spill file: keep at least the preview
+            offset, length = self.output_store.append(f"[full output lost: {e}]\n{self.result[0][-PREVIEW_CHARS:]}")
+        if len(self.result[0]) > PREVIEW_CHARS:
+            self.result = (preview(self.result[0]), self.script_path)
+        return offset, length
+
+    def run_streaming(self):
+        """Run the script and emit its output while it is still running."""
+        stream = self.sessions.stream if self.sessions and self.script_path.suffix in SESSION_SUFFIXES else None
+        tail_chars = PREVIEW_CHARS if self.writer is not None else DEFAULT_TAIL_CHARS
+        run = run_script(self.script_path, on_chunk=self._emit_chunk, on_lines=self._emit_lines, stream=stream,
+                         tail_chars=tail_chars, timeout=self.timeout, control=self.control)
+        self.saw_fail = run.failed
+        self.returncode = run.returncode
+        self.usage = run.usage
+        self.result = (run.output, self.script_path)
+        return run_status(run)
+
+    def _emit_chunk(self, text):
+        if self.writer is not None:
+            self.writer.write(text)
+        self.output_chunk.emit(self.script_path, text)
+
+    def _emit_lines(self, lines):
+        self.output_lines.emit(self.script_path, lines)
+
+
+class FactsWorker(QThread):
+    """Worker thread that brings the facts snapshot up to date before a batch of checks starts."""
+
+    def __init__(self, snapshot, names):
+        super().__init__()
+        self.snapshot = snapshot
+        self.names = names
+        self.report = None  # FactsReport once done, unless the snapshot could not be written
+        self.error = None
+
+    def run(self):
+        try:
+            self.report = self.snapshot.prepare(self.names)
+        except OSError as e:
+            self.error = e
+
+
+class ScriptPool(QObject):
+    """Run scripts on a bounded number of worker threads.
+
+    Scripts start in submission order unless their declared dependencies or
+    exclusion groups (see script_dag) hold them back. Given expected
+    durations (set_expected_durations), the longest ones start first. With
+    load adaptation on, the number running at once (and the io-class
+    limit) follows the machine's load instead of staying at max_workers.
+    A batch of checks submitted to an idle pool first waits for the facts
+    its scripts declare to be prefetched (see facts_prefetch).
+    """
+    script_started = Signal(object)  # script_path
+    script_finished = Signal(object)  # the finished ScriptWorker
+    script_skipped = Signal(object)  # ScriptResult of a queued script dropped by cancel()
+    output_lines = Signal(object, list)  # script_path, complete lines from a worker
+    progress_changed = Signal(int, int, int)  # queued, running, done
+    load_changed = Signal(int, str)  # current worker limit, description of the load it follows
+    facts_ready = Signal(object)  # FactsReport of the snapshot prepared for the run, or an OSError
+    all_finished = Signal()
+
+    def __init__(self, max_workers=None, base_dir=None, output_store=None, parent=None):
+        super().__init__(parent)
+        self.output_store = output_store
+        self.max_workers = max(1, max_workers or default_concurrency())
+        self.base_dir = base_dir
+        self.class_limits = dict(DEFAULT_CLASS_LIMITS)  # resource class -> scripts of it run at once
+        self.scheduler = DagScheduler(base_dir, class_limits=self.class_limits)
+        self.durations = {}  # script -> expected seconds, for longest-first ordering
+        self.monitor = None  # LoadMonitor while load adaptation is on
+        self.load_timer = QTimer(self)
+        self.load_timer.setInterval(int(SAMPLE_INTERVAL * 1000))
+        self.load_timer.timeout.connect(self._sample_load)
+        self.facts = FactsSnapshot()
+        self.prefetch = True
+        self.prefetcher = None  # FactsWorker while the snapshot is being prepared
+        self.facts_report = None  # FactsReport of the current run
+        self.facts_stale = False  # A non-check script was queued while prefetching
+        self.sessions = None  # SessionPool while session mode is on
+        self.retired_sessions = []  # Session pools switched off while scripts were still using them
+        self.running = set()  # Keep workers alive until they finish
+        self.done = 0
+        self.script_timeout = None  # Default per-script limit in seconds; "# timeout:" headers override it
+        self.run_timeout = None  # Limit for a whole run in seconds
+        self.control = RunControl()
+        self.deadline_timer = QTimer(self)
+        self.deadline_timer.setSingleShot(True)
+        self.deadline_timer.timeout.connect(lambda: self.cancel("timeout"))
+
+    def submit(self, script_path):
+        """Queue a single script for execution."""
+        return self.submit_many([script_path])
+
+    def submit_many(self, script_paths):
+        """Queue several scripts, preserving their order where dependencies allow.
+
+        Returns the scripts queued: ones already queued or running in this run
+        are skipped, finished ones run again. Raises CycleError, queueing
+        nothing, if their dependencies form a cycle.
+        """
+        starting = self.is_idle()
+        if starting:
+            self.done = 0
+            self.scheduler = DagScheduler(self.base_dir, self.durations, self._class_limits())
+            self.facts_report = None
+        if self.is_idle() or self.control.stopped:
+            self.control = RunControl(self.run_timeout)
+            self.deadline_timer.stop()
+            if self.run_timeout:
+                self.deadline_timer.start(int(self.run_timeout * 1000))
+        queued = self.scheduler.add(script_paths)
+        if not is_check_batch(script_paths):
+            self._drop_facts()
+        elif starting:
+            names = facts_for(script_paths) if self.prefetch else set()
+            if names:
+                self.prefetcher = FactsWorker(self.facts, names)
+                self.prefetcher.finished.connect(self._on_prefetch_finished)
+                self.prefetcher.start()
+            else:
+                self._drop_facts()  # Files left by earlier runs were not revalidated for this one
+        self._fill()
+        self._emit_progress()
+        return queued
+
+    def set_prefetch(self, enabled):
+        """Prefetch the facts declared by a batch of checks before it starts."""
+        self.prefetch = enabled
+
+    def take_facts_report(self):
+        """Return the FactsReport of the run that just finished, once."""
+        report, self.facts_report = self.facts_report, None
+        return report
+
+    def _drop_facts(self):
+        if self.facts_report is not None:
+            self.facts_report.drop()
+        if self.prefetcher is not None:
+            self.facts_stale = True
+        else:
+            self.facts.drop()
+
+    def _on_prefetch_finished(self):
+        worker, self.prefetcher = self.prefetcher, None
+        worker.deleteLater()
+        if self.facts_stale:
+            self.facts_stale = False
+            self.facts.drop()
+            if worker.report is not None:
+                worker.report.drop()
+        self.facts_report = worker.report
+        self.facts_ready.emit(worker.report if worker.report is not None else worker.error)
+        self._fill()
+        self._emit_progress()
+        if self.is_idle():
+            self.deadline_timer.stop()
+            self.all_finished.emit()
+
+    def set_expected_durations(self, durations):
+        """Order queued scripts longest expected first; durations maps scripts to seconds."""
+        self.durations.update(durations)
+        self.scheduler.durations = self.durations  # Used from the next submit_many on
+
+    def set_max_workers(self, max_workers):
+        """Change the concurrency limit; extra slots are used immediately."""
+        self.max_workers = max(1, max_workers)
+        if self.monitor is not None:
+            self.monitor.set_limits(self.max_workers)
+        self._fill()
+        self._emit_progress()
+
+    def set_adaptive(self, enabled):
+        """Let the system load steer how many scripts run at once, up to max_workers."""
+        if enabled and self.monitor is None:
+            self.monitor = LoadMonitor(self.max_workers, self.class_limits.get("io", self.max_workers))
+            if not self.monitor.available:
+                self.monitor = None
+                self.load_changed.emit(self.max_workers, "load average not available")
+                return
+            self.load_timer.start()
+            self._sample_load()
+        elif not enabled and self.monitor is not None:
+            self.monitor = None
+            self.load_timer.stop()
+            if "io" in self.class_limits:
+                self.scheduler.set_class_limit("io", self.class_limits["io"])
+            self.load_changed.emit(self.max_workers, "")
+            self._fill()
+
+    def worker_limit(self):
+        """Number of scripts that may run at once right now."""
+        return min(self.max_workers, self.monitor.workers) if self.monitor is not None else self.max_workers
+
+    def _class_limits(self):
+        limits = dict(self.class_limits)
+        if self.monitor is not None and "io" in limits:
+            limits["io"] = self.monitor.io_limit
+        return limits
+
+    def _sample_load(self):
+        if self.monitor is None:
+            return
+        workers, io_limit = self.monitor.update()
+        if "io" in self.class_limits:
+            self.scheduler.set_class_limit("io", io_limit)
+        self.load_changed.emit(workers, self.monitor.describe())
+        self._fill()
+        self._emit_progress()
+
+    def set_script_timeout(self, seconds):
+        """Set the default time limit of scripts started from now on; 0 or None means no limit."""
+        self.script_timeout = seconds or None
+
+    def set_run_timeout(self, seconds):
+        """Set the time limit of runs started from now on; 0 or None means no limit."""
+        self.run_timeout = seconds or None
+
+    def cancel(self, reason="cancelled"):
+        """Stop the current run: drop queued scripts and kill the running ones' process groups.
+
+        Dropped scripts are reported through script_skipped; running ones
+        finish through script_finished as their processes exit.
+        """
+        self.deadline_timer.stop()
+        dropped = self.scheduler.drain()
+        self.control.cancel(reason)
+        if self.prefetcher is not None:
+            self.facts.cancel()
+        status = Status.TIMEOUT if reason == "timeout" else Status.CANCELLED
+        message = f"Not started: the run was {'cancelled' if reason == 'cancelled' else 'timed out'}."
+        for script_path in dropped:
+            offset, length = self.output_store.append(message) if self.output_store is not None else (None, None)
+            self.done += 1
+            self.script_skipped.emit(ScriptResult(script_path, None, status, None, None, offset, length))
+        self._emit_progress()
+        if dropped and self.is_idle():
+            self.all_finished.emit()
+
+    def set_session_mode(self, enabled):
+        """Run shell scripts in long-lived shell sessions instead of one process each."""
+        if enabled and self.sessions is None:
+            self.sessions = SessionPool()
+        elif not enabled and self.sessions is not None:
+            self.retired_sessions.append(self.sessions)
+            self.sessions = None
+            self._close_retired_sessions()
+
+    def _close_retired_sessions(self):
+        if not self.running:
+            for sessions in self.retired_sessions:
+                sessions.close()
+            self.retired_sessions = []
+
+    def is_idle(self):
+        """Return True when nothing is queued or running."""
+        return not self.scheduler.pending_count() and not self.running and self.prefetcher is None
+
+    def counts(self):
+        """Return (queued, running, done)."""
+        return self.scheduler.pending_count(), len(self.running), self.done
+
+    def _fill(self):
+        """Start workers until the pool is full or no queued script may start yet."""
+        if self.prefetcher is not None:
+            return
+        while len(self.running) < self.worker_limit():
+            script_path = self.scheduler.pop_ready()
+            if script_path is None:
+                break
+            worker = ScriptWorker(script_path, self.sessions, self.output_store,
+                                  script_timeout(script_path, self.script_timeout), self.control)
+            worker.output_lines.connect(self.output_lines)
+            worker.finished.connect(lambda w=worker: self._on_worker_finished(w))
+            self.running.add(worker)
+            if self.facts_report is not None:
+                self.facts_report.use(script_path)
+            worker.start()
+            self.script_started.emit(script_path)
+
+    def _on_worker_finished(self, worker):
+        """Deliver a worker's result and hand its slot to the next script."""
+        self.running.discard(worker)
+        self.scheduler.finish(worker.script_path)
+        self.done += 1
+        self.script_finished.emit(worker)
+        worker.deleteLater()
+        self._fill()
+        self._emit_progress()
+        if self.is_idle():
+            self.deadline_timer.stop()
+            self._close_retired_sessions()
+            self.all_finished.emit()
+
+    def _emit_progress(self):
+        self.progress_changed.emit(*self.counts())
+
+
+class FanoutWorker(QThread):
+    """Worker thread that runs scripts on several hosts through a FanoutRunner."""
+    result_ready = Signal(str, object, object, float)  # host, script_path, ScriptRun or TransportError, seconds
+    output_lines = Signal(str, list)  # "host:script" label, complete lines
+
+    def __init__(self, hosts, scripts, per_host_limit=DEFAULT_PER_HOST_LIMIT, global_limit=DEFAULT_GLOBAL_LIMIT,
+                 timeout=None, run_timeout=None):
+        super().__init__()
+        self.scripts = list(scripts)
+        self.runner = FanoutRunner(hosts, per_host_limit=per_host_limit, global_limit=global_limit, timeout=timeout,
+                                   run_timeout=run_timeout)
+
+    def run(self):
+        self.runner.run(self.scripts, on_result=self.result_ready.emit, on_lines=self._emit_lines)
+
+    def _emit_lines(self, host, script_path, lines):
+        self.output_lines.emit(f"{host}:{script_path.name}", lines)
@@ -0,0 +1,417 @@
+import codecs
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+from enum import Enum
+
+from facts_prefetch import FACTS_ENV, facts_dir
+from script_meta import read_metadata
+
+try:
+    import resource
+except ImportError:  # Not on Windows; only wall times are measured there
+    resource = None
+
+# Bytes read from a script's pipe per chunk
+CHUNK_SIZE = 64 * 1024
+# Characters of output kept per script once it has finished
+DEFAULT_TAIL_CHARS = 1024 * 1024
+# Scripts whose output contains this marker are reported as failed
+FAIL_MARKER = "FAIL"
+# Script types that can be executed
+RUNNABLE_SUFFIXES = {".sh", ".py"}
+# A line longer than this is emitted in pieces so a script without newlines can't grow the buffer
+MAX_LINE_CHARS = 64 * 1024
+# Number of scripts listed in the "slowest scripts" summary of a run
+SLOWEST_COUNT = 10
+# Seconds between SIGTERM and SIGKILL when a script's process group is stopped
+KILL_GRACE = 2.0
+
+# Resources used by one script: wall/user/sys in seconds, max_rss in KiB, block I/O in
+# 512-byte blocks. Everything but wall is None where it can't be measured (shell sessions),
+# and max_rss is None when the script stayed below the runner's own peak (see wait_with_usage).
+ResourceUsage = namedtuple("ResourceUsage", "wall user sys max_rss read_blocks write_blocks",
+                           defaults=(None, None, None, None, None))
+
+
+def default_concurrency():
+    """Return the default number of scripts to run at once."""
+    return os.cpu_count() or 2
+
+
+def build_command(script_path):
+    """Return the command line used to run a script."""
+    if script_path.suffix == ".sh":
+        return ["bash", str(script_path)]
+    if script_path.suffix == ".py":
+        return ["python3", str(script_path)]
+    return ["pwsh", "-File", str(script_path)]
+
+
+def script_env():
+    """Return the environment for a script run, with unbuffered Python output and the facts snapshot."""
+    env = dict(os.environ)
+    env["PYTHONUNBUFFERED"] = "1"
+    env[FACTS_ENV] = str(facts_dir())
+    return env
+
+
+class OutputTail:
+    """Keep only the last max_chars characters written to it."""
+
+    def __init__(self, max_chars=DEFAULT_TAIL_CHARS):
+        self.max_chars = max_chars
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size > self.max_chars and len(self.chunks) > 1:
+            old = self.chunks.popleft()
+            self.size -= len(old)
+            self.dropped += len(old)
+
+    def getvalue(self):
+        text = "".join(self.chunks)
+        if self.dropped:
+            return f"[... {self.dropped} characters of earlier output omitted ...]\n{text}"
+        return text
+
+
+class LineSplitter:
+    """Turn arbitrary text chunks into complete lines."""
+
+    def __init__(self, max_line=MAX_LINE_CHARS):
+        self.max_line = max_line
+        self.pending = ""
+
+    def feed(self, text):
+        """Return the lines completed by text."""
+        lines = (self.pending + text).split("\n")
+        self.pending = lines.pop()
+        while len(self.pending) > self.max_line:
+            lines.append(self.pending[:self.max_line])
+            self.pending = self.pending[self.max_line:]
+        return lines
+
+    def flush(self):
+        """Return the trailing partial line, if any."""
+        rest, self.pending = self.pending, ""
+        return [rest] if rest else []
+
+
+def stream_script(script_path, on_chunk=None, on_lines=None, tail_chars=DEFAULT_TAIL_CHARS, command=None, stdin=None,
+                  watchdog=None):
+    """Run a script, reporting output as it arrives.
+
+    on_chunk receives decoded text as soon as it is read, on_lines receives
+    lists of complete lines. Returns (returncode, tail) where tail holds at
+    most tail_chars characters of the combined stdout/stderr. command and
+    stdin override how the script is started, e.g. to run it on another host.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    splitter = LineSplitter()
+    tail = OutputTail(tail_chars)
+
+    def deliver(text, final=False):
+        if text:
+            tail.write(text)
+            if on_chunk:
+                on_chunk(text)
+        lines = splitter.feed(text)
+        if final:
+            lines.extend(splitter.flush())
+        if lines and on_lines:
+            on_lines(lines)
+
+    started = time.monotonic()
+    proc = subprocess.Popen(command or build_command(script_path), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            stdin=subprocess.DEVNULL if stdin is None else stdin, env=script_env(),
+                            start_new_session=True)
+    if watchdog:
+        watchdog.watch(lambda: kill_process_group(proc))
+    try:
+        with proc.stdout:
+            while True:
+                data = proc.stdout.read1(CHUNK_SIZE)
+                if not data:
+                    break
+                deliver(decoder.decode(data))
+        deliver(decoder.decode(b"", final=True), final=True)
+        returncode, usage = wait_with_usage(proc, started)
+    finally:
+        if watchdog:
+            watchdog.release()
+    return returncode, tail.getvalue(), usage
+
+
+def kill_process_group(proc, grace=KILL_GRACE):
+    """Stop a process started with start_new_session and everything it started: SIGTERM, then SIGKILL."""
+    if not hasattr(os, "killpg"):
+        proc.kill()
+        return
+
+    def send(sig):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    send(signal.SIGTERM)
+    timer = threading.Timer(grace, send, (signal.SIGKILL,))
+    timer.daemon = True
+    timer.start()
+
+
+class RunControl:
+    """Cancellation and an optional overall time limit shared by every script of a run."""
+
+    def __init__(self, timeout=None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.stopped = None  # "cancelled" or "timeout" once the run has been stopped
+        self.watchdogs = set()
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        """Seconds left before the run's deadline, or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def cancel(self, reason="cancelled"):
+        """Stop the run: kill every running script; callers stop starting new ones."""
+        with self.lock:
+            if self.stopped is None:
+                self.stopped = reason
+            watchdogs = list(self.watchdogs)
+        for watchdog in watchdogs:
+            watchdog.fire(reason)
+
+    def not_started_reason(self):
+        """Return why a script may not start any more ("cancelled"/"timeout"), or None if it may."""
+        if self.stopped is None and self.expired():
+            self.stopped = "timeout"
+        return self.stopped
+
+
+class Watchdog:
+    """Kills one script when its own time limit or its run's deadline passes, or the run is cancelled."""
+
+    def __init__(self, timeout=None, control=None):
+        self.timeout = timeout
+        self.control = control
+        self.reason = None  # "timeout" or "cancelled" once the script has been killed
+        self.kill = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def watch(self, kill):
+        """Start watching a script; kill() stops it and is called at most once."""
+        with self.lock:
+            self.kill = kill
+        limits = [t for t in (self.timeout, self.control.remaining() if self.control else None) if t is not None]
+        if self.control:
+            with self.control.lock:
+                self.control.watchdogs.add(self)
+            if self.control.stopped:
+                self.fire(self.control.stopped)
+                return
+        if limits:
+            self.timer = threading.Timer(min(limits), self.fire, ("timeout",))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def fire(self, reason):
+        with self.lock:
+            kill, self.kill = self.kill, None
+            if kill is None:
+                return
+            self.reason = reason
+        kill()
+
+    def release(self):
+        """Stop watching; the script has ended."""
+        with self.lock:
+            self.kill = None
+        if self.timer:
+            self.timer.cancel()
+        if self.control:
+            with self.control.lock:
+                self.control.watchdogs.discard(self)
+
+
+def script_timeout(script_path, default=None):
+    """Return the time limit of a script in seconds: its "# timeout:" header, else default.
+
+    "# timeout: none" (or 0) lets the script run without a limit.
+    """
+    value = read_metadata(script_path).get("timeout", "").strip().lower()
+    if not value:
+        return default
+    if value in ("none", "off", "0"):
+        return None
+    try:
+        seconds = float(value.rstrip("s"))
+    except ValueError:
+        return default
+    return seconds if seconds > 0 else None
+
+
+def wait_with_usage(proc, started):
+    """Reap a process and return (returncode, ResourceUsage) for it and its waited-for children.
+
+    The kernel carries the peak RSS of the process that started the script
+    over into the script's own, so a peak no higher than ours says nothing
+    about the script and is left out.
+    """
+    if resource is None:
+        return proc.wait(), ResourceUsage(time.monotonic() - started)
+    try:
+        _, status, rusage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        # Already reaped elsewhere; only the wall time is known
+        return proc.wait(), ResourceUsage(time.monotonic() - started)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    max_rss = rusage.ru_maxrss if rusage.ru_maxrss > resource.getrusage(resource.RUSAGE_SELF).ru_maxrss else None
+    return proc.returncode, ResourceUsage(time.monotonic() - started, rusage.ru_utime, rusage.ru_stime,
+                                          max_rss, rusage.ru_inblock, rusage.ru_oublock)
+
+
+def format_usage(usage):
+    """Return a one-line description of a ResourceUsage."""
+    if usage is None:
+        return "no resource data"
+    text = f"wall {usage.wall:.3f}s"
+    if usage.user is not None:
+        text += f", cpu {usage.user:.3f}s user {usage.sys:.3f}s sys"
+        if usage.max_rss is not None:
+            text += f", max RSS {usage.max_rss / 1024:.1f} MiB"
+        text += f", I/O {usage.read_blocks} blocks in {usage.write_blocks} out"
+    return text
+
+
+def slowest(usages, count=SLOWEST_COUNT):
+    """Return the count (script_path, usage) pairs with the longest wall time."""
+    measured = [(script, usage) for script, usage in usages if usage is not None]
+    return sorted(measured, key=lambda item: item[1].wall, reverse=True)[:count]
+
+
+# stopped is "timeout" or "cancelled" when the script was killed or never started
+ScriptRun = namedtuple("ScriptRun", "script_path returncode output failed usage stopped", defaults=(None, None))
+
+
+class Status(Enum):
+    """Outcome of one script run."""
+    PASS = "PASS"
+    FAIL = "FAIL"
+    ERROR = "ERROR"  # the script exited non-zero or could not be started, or its host could not be reached
+    TIMEOUT = "TIMEOUT"  # killed after running past its time limit or the run's deadline
+    CANCELLED = "CANCELLED"  # killed or never started because the run was cancelled
+
+
+# Finished script as shown and counted by the GUI. host is None for local runs;
+# output_offset/output_length locate the output in an OutputStore (None if not stored).
+ScriptResult = namedtuple("ScriptResult", "script_path host status exit_code usage output_offset output_length cached",
+                          defaults=(None, None, None, False))
+
+
+def lines_have_failure(lines):
+    """Return True if any line carries the failure marker."""
+    return any(FAIL_MARKER in line for line in lines)
+
+
+def run_status(run):
+    """Return the Status of a finished ScriptRun.
+
+    A script that printed the failure marker is FAIL whatever its exit
+    code; otherwise a non-zero exit is an ERROR, not a pass.
+    """
+    if run.stopped == "timeout":
+        return Status.TIMEOUT
+    if run.stopped == "cancelled":
+        return Status.CANCELLED
+    if run.returncode is None:
+        return Status.ERROR
+    if run.failed:
+        return Status.FAIL
+    return Status.ERROR if run.returncode else Status.PASS
+
+
+def not_started(script_path, reason):
+    """Return the ScriptRun of a script dropped before it started because the run was stopped."""
+    message = f"Not started: the run was {'cancelled' if reason == 'cancelled' else 'timed out'}."
+    return ScriptRun(script_path, None, message, False, None, reason)
+
+
+def script_status(run):
+    """Return the status of a finished ScriptRun as text."""
+    return run_status(run).value
+
+
+def run_script(script_path, on_lines=None, on_chunk=None, tail_chars=DEFAULT_TAIL_CHARS, command=None, stdin=None,
+               stream=None, timeout=None, control=None):
+    """Run a script with streamed output and return a ScriptRun.
+
+    A non-zero exit code is reported in a line after the output, as is a
+    failure to start the script (returncode None) and a kill; the line
+    also goes to on_lines and on_chunk, after everything else. The failure marker is looked for
+    in every line, not only in the retained tail. stream replaces
+    stream_script for other ways of executing, e.g. a shell session.
+    The script is killed after timeout seconds, or when control (a
+    RunControl) is cancelled or passes its deadline.
+    """
+    failed = False
+    if control is not None:
+        reason = control.not_started_reason()
+        if reason:
+            run = not_started(script_path, reason)
+            if on_lines:
+                on_lines([run.output])
+            return run
+    watchdog = Watchdog(timeout, control) if timeout or control is not None else None
+
+    def check_lines(lines):
+        nonlocal failed
+        if not failed:
+            failed = lines_have_failure(lines)
+        if on_lines:
+            on_lines(lines)
+
+    def add_trailer(output, line):
+        text = ("" if not output or output.endswith("\n") else "\n") + line + "\n"
+        check_lines([line])
+        if on_chunk:
+            on_chunk(text)
+        return output + text
+
+    try:
+        if stream is not None:
+            returncode, output, usage = stream(script_path, on_chunk=on_chunk, on_lines=check_lines,
+                                               tail_chars=tail_chars, watchdog=watchdog)
+        else:
+            returncode, output, usage = stream_script(script_path, on_chunk=on_chunk, on_lines=check_lines,
+                                                      tail_chars=tail_chars, command=command, stdin=stdin,
+                                                      watchdog=watchdog)
+    except OSError as e:
+        returncode, output, usage = None, str(e), None
+        check_lines([f"Error executing {script_path.name}: {e}"])
+    stopped = watchdog.reason if watchdog else None
+    if stopped:
+        elapsed = f" after {usage.wall:.1f}s" if usage else ""
+        if stopped == "timeout":
+            line = f"Timed out: {script_path.name} was killed{elapsed}."
+        else:
+            line = f"Cancelled: {script_path.name} was killed{elapsed}."
+        return ScriptRun(script_path, returncode, add_trailer(output, line), failed, usage, stopped)
+    if returncode:
+        line = f"Error executing {script_path.name}: exited with code {returncode}."
+        return ScriptRun(script_path, returncode, add_trailer(output, line), failed, usage)
+    return ScriptRun(script_path, returncode, output, failed, usage)
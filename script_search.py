@@ -0,0 +1,175 @@
+"""Incremental fuzzy search over the script catalog.
+
+Every script is indexed by its file name, header title and folder path.
+A query is split on whitespace and every term has to match one of those
+fields as a subsequence ("crmfs" finds "cramfs", "1.1.3" finds
+"1.1.3.2_chk.sh"). Matching happens in two stages so that typing stays
+fast on large trees:
+
+1. A bitset of the scripts containing every character of the query,
+   computed with a few integer ANDs, narrowed further by the previous
+   query's result when the user is typing on at its end.
+2. The exact subsequence test, run over those candidates in batches
+   (Search.step) that the GUI spreads over idle time.
+
+Sets of scripts are Python ints used as bitsets: bit i is script i in
+sorted path order, so a folder is a contiguous range of bits.
+"""
+import bisect
+import operator
+import re
+import time
+from itertools import compress, repeat
+
+from script_catalog import TITLED_SUFFIXES
+
+# Script ids scanned per batch of Search.step
+VERIFY_BATCH = 4096
+# Maps the b"\x00"/b"\x01" flags from bytes(map(...)) to the digits int() expects
+_FLAG_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+_DIGIT_FLAGS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def bits_from_flags(flags):
+    """Turn bytes of 0/1 flags, one per script, into a bitset."""
+    return int(flags[::-1].translate(_FLAG_DIGITS), 2) if flags else 0
+
+
+def flags_from_bits(bits, count):
+    """Turn a bitset into bytes of 0/1 flags, one per script."""
+    return format(bits, f"0{count}b")[::-1].encode().translate(_DIGIT_FLAGS) if count else b""
+
+
+def ids_from_bits(bits, count):
+    """Return the positions of the set bits among the first count bits, ascending."""
+    return list(compress(range(count), flags_from_bits(bits, count))) if bits else []
+
+
+def term_pattern(term):
+    """Regex that finds term as a subsequence inside one tab-separated field.
+
+    Each character is consumed possessively up to the next wanted one, so
+    the search never backtracks.
+    """
+    parts = [re.escape(term[0])]
+    for char in term[1:]:
+        parts.append(f"[^{re.escape(char)}\\t]*+{re.escape(char)}")
+    return re.compile("".join(parts))
+
+
+def catalog_snapshot(catalog):
+    """Return the (rels, titles) of the catalog's searchable scripts, for building an index elsewhere."""
+    rels = [rel for rel in catalog.ordered() if catalog.files[rel].suffix in TITLED_SUFFIXES]
+    return rels, [catalog.files[rel].title for rel in rels]
+
+
+class SearchIndex:
+    """Searchable text and per-character bitsets of every script in a catalog."""
+
+    def __init__(self, rels, titles):
+        self.rels = rels  # sorted relative paths; a script's id is its position here
+        self.texts = []
+        for rel, title in zip(rels, titles, strict=True):
+            folder, _, name = rel.rpartition("/")
+            self.texts.append(f"{name}\t{title}\t{folder}".lower())
+        self.ids = {rel: i for i, rel in enumerate(rels)}
+        self.all = (1 << len(rels)) - 1
+        self.char_bits = {}
+        for char in set().union(*map(set, self.texts)) - {"\t"}:
+            self.char_bits[char] = bits_from_flags(bytes(map(operator.contains, self.texts, repeat(char))))
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        rels, titles = catalog_snapshot(catalog)
+        index = cls(rels, titles)
+        index.generation = catalog.generation
+        return index
+
+    def __len__(self):
+        return len(self.rels)
+
+    def prefilter(self, terms):
+        """Bitset of the scripts that contain every character of every term."""
+        bits = self.all
+        for char in set("".join(terms)):
+            bits &= self.char_bits.get(char, 0)
+            if not bits:
+                break
+        return bits
+
+    def folder_range(self, rel):
+        """Return the (start, end) ids of the scripts under a folder."""
+        if not rel:
+            return 0, len(self.rels)
+        prefix = rel + "/"
+        return (bisect.bisect_left(self.rels, prefix),
+                bisect.bisect_left(self.rels, prefix[:-1] + chr(ord("/") + 1)))
+
+    def search(self, query, previous=None):
+        """Start a Search for query; previous is the Search it refines, if any."""
+        return Search(self, query, previous)
+
+
+class Search:
+    """The matches of one query, exact once done is True.
+
+    bits always holds a superset of the matches; step() narrows it to the
+    exact set a batch at a time.
+    """
+
+    def __init__(self, index, query, previous=None):
+        self.index = index
+        self.query = query
+        self.terms = query.lower().split()
+        bits = index.prefilter(self.terms)
+        # Typing on at the end can only drop matches, so start from what the previous query kept
+        if (previous is not None and previous.index is index and previous.terms
+                and query.lower().startswith(previous.query.lower())):
+            bits &= previous.bits
+        self.bits = bits
+        self.patterns = [term_pattern(term) for term in self.terms]
+        # Candidates still to check are the set flags from position on; rejected ones are cleared
+        self.flags = bytearray(flags_from_bits(bits, len(index))) if self.patterns and bits else None
+        self.position = 0
+        self.done = self.flags is None
+        if not self.terms:
+            self.bits = index.all
+
+    def step(self, budget=0.003):
+        """Check candidates for up to budget seconds; returns True once the result is exact."""
+        deadline = time.perf_counter() + budget
+        texts = self.index.texts
+        while not self.done:
+            start, end = self.position, min(self.position + VERIFY_BATCH, len(self.flags))
+            candidates = list(compress(range(start, end), self.flags[start:end]))
+            kept = candidates
+            for pattern in self.patterns:
+                if not kept:
+                    break
+                kept = list(compress(kept, map(pattern.search, [texts[i] for i in kept])))
+            if len(kept) < len(candidates):
+                for i in set(candidates).difference(kept):
+                    self.flags[i] = 0
+            self.position = end
+            if end >= len(self.flags):
+                self.bits = bits_from_flags(bytes(self.flags))
+                self.flags = None
+                self.done = True
+            elif time.perf_counter() >= deadline:
+                break
+        return self.done
+
+    def count(self):
+        return self.bits.bit_count()
+
+    def matches_rel(self, rel):
+        i = self.index.ids.get(rel)
+        return i is not None and bool(self.bits >> i & 1)
+
+    def matches_in_folder(self, rel):
+        start, end = self.index.folder_range(rel)
+        return start < end and bool(self.bits >> start & ((1 << (end - start)) - 1))
+
+    def matched_rels(self):
+        """Relative paths of the matches (of the candidates while not done), in path order."""
+        return [self.index.rels[i] for i in ids_from_bits(self.bits, len(self.index))]
@@ -0,0 +1,300 @@
+import logging
+import os
+from pathlib import Path
+
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, QSortFilterProxyModel, Qt, QThread, QTimer, Signal
+
+from script_catalog import ScriptCatalog
+from script_search import SearchIndex
+
+# Rows inserted per event-loop tick when a folder is listed, so a huge folder never blocks painting
+INSERT_BATCH = 500
+# The invalid index, i.e. the top level; default parent of the row/column queries
+TOP_LEVEL = QModelIndex()
+
+
+class TreeNode:
+    """A file or directory in the script tree; children are listed on demand."""
+    __slots__ = ("path", "name", "is_dir", "parent", "row", "children", "loaded", "pending")
+
+    def __init__(self, path, is_dir, parent=None, row=0):
+        self.path = path
+        self.name = path.name or str(path)
+        self.is_dir = is_dir
+        self.parent = parent
+        self.row = row  # Position in parent.children, kept so parent() is O(1)
+        self.children = []
+        self.loaded = not is_dir
+        self.pending = []  # (name, is_dir) listed but not inserted yet; they sort after every child
+
+
+def list_directory(path):
+    """Return (name, is_dir) entries of a directory, sorted by name."""
+    entries = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    entries.append((entry.name, entry.is_dir()))
+                except OSError:
+                    continue
+    except OSError:
+        return []
+    return sorted(entries)
+
+
+class ScriptTreeModel(QAbstractItemModel):
+    """Item model over the script directory that lists a folder only when it is expanded.
+
+    A listed folder's rows are inserted INSERT_BATCH at a time, one batch
+    per event-loop tick.
+    """
+    directory_loaded = Signal(str)  # path of a directory listed for the first time
+
+    def __init__(self, base_dir, parent=None):
+        super().__init__(parent)
+        self.root = TreeNode(Path(""), True)  # invisible root
+        self.root.loaded = True
+        self.root.children = [TreeNode(Path(base_dir), True, self.root)]
+        self.dir_nodes = {str(base_dir): self.root.children[0]}
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def node_index(self, node):
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def index(self, row, column, parent=TOP_LEVEL):
+        if column != 0:
+            return QModelIndex()
+        children = self.node(parent).children
+        if 0 <= row < len(children):
+            return self.createIndex(row, 0, children[row])
+        return QModelIndex()
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=TOP_LEVEL):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=TOP_LEVEL):
+        return 1
+
+    def hasChildren(self, parent=TOP_LEVEL):
+        node = self.node(parent)
+        # Unlisted directories report children so the view draws an expand arrow
+        return node.is_dir and (not node.loaded or bool(node.children) or bool(node.pending))
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return node.is_dir and (not node.loaded or bool(node.pending))
+
+    def fetchMore(self, parent):
+        """List a directory the first time it is expanded, inserting the first batch of its rows."""
+        node = self.node(parent)
+        if not node.loaded:
+            node.loaded = True
+            node.pending = list_directory(node.path)
+            self.directory_loaded.emit(str(node.path))
+        self._insert_pending(node)
+
+    def _insert_pending(self, node):
+        """Insert the next batch of a folder's listed entries, and schedule the one after."""
+        if not node.pending or (node is not self.root and self.dir_nodes.get(str(node.path)) is not node):
+            return  # Done, or the folder has been removed from the tree since
+        batch, node.pending = node.pending[:INSERT_BATCH], node.pending[INSERT_BATCH:]
+        start = len(node.children)
+        self.beginInsertRows(self.node_index(node), start, start + len(batch) - 1)
+        node.children.extend(self._new_node(node, name, is_dir, row)
+                             for row, (name, is_dir) in enumerate(batch, start))
+        self.endInsertRows()
+        if node.pending:
+            QTimer.singleShot(0, self, lambda: self._insert_pending(node))
+
+    def refresh_directory(self, path):
+        """Apply additions and removals in one listed directory as row inserts/removes.
+
+        Directories that were never expanded are skipped; they are listed
+        fresh when the view asks for them.
+        """
+        node = self.dir_nodes.get(str(path))
+        if node is None or not node.loaded:
+            return
+        parent = self.node_index(node)
+        entries = list_directory(node.path)
+        wanted = dict(entries)
+        pending = bool(node.pending)
+
+        # Removals, one contiguous run at a time from the bottom so earlier rows stay valid
+        row = len(node.children) - 1
+        while row >= 0:
+            if wanted.get(node.children[row].name) == node.children[row].is_dir:
+                row -= 1
+                continue
+            start = row
+            while start > 0 and wanted.get(node.children[start - 1].name) != node.children[start - 1].is_dir:
+                start -= 1
+            self.beginRemoveRows(parent, start, row)
+            for child in node.children[start:row + 1]:
+                self._forget(child)
+            del node.children[start:row + 1]
+            self._renumber(node, start)
+            self.endRemoveRows()
+            row = start - 1
+
+        # Insertions, one contiguous run at a time in ascending order. While the folder is
+        # still being filled in, entries past its last row go to the pending batches instead
+        existing = {child.name for child in node.children}
+        added = [(name, is_dir) for name, is_dir in entries if name not in existing]
+        if pending:
+            last = node.children[-1].name if node.children else ""
+            node.pending = [(name, is_dir) for name, is_dir in added if name > last]
+            added = [(name, is_dir) for name, is_dir in added if name <= last]
+        if not added:
+            return
+        merged = sorted([(child.name, child) for child in node.children] +
+                        [(name, is_dir) for name, is_dir in added], key=lambda item: item[0])
+        row = 0
+        while row < len(merged):
+            if isinstance(merged[row][1], TreeNode):
+                row += 1
+                continue
+            end = row
+            while end + 1 < len(merged) and not isinstance(merged[end + 1][1], TreeNode):
+                end += 1
+            self.beginInsertRows(parent, row, end)
+            node.children[row:row] = [self._new_node(node, name, is_dir, row)
+                                      for name, is_dir in merged[row:end + 1]]
+            self._renumber(node, row)
+            self.endInsertRows()
+            row = end + 1
+
+    def _new_node(self, parent, name, is_dir, row):
+        child = TreeNode(parent.path / name, is_dir, parent, row)
+        if is_dir:
+            self.dir_nodes[str(child.path)] = child
+        return child
+
+    def _forget(self, node):
+        if node.is_dir:
+            self.dir_nodes.pop(str(node.path), None)
+            for child in node.children:
+                self._forget(child)
+
+    def _renumber(self, node, start):
+        for row in range(start, len(node.children)):
+            node.children[row].row = row
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.name
+        if role == Qt.UserRole:
+            return str(node.path)  # Full path, as stored on the old QTreeWidgetItems
+        if role == Qt.ToolTipRole:
+            return str(node.path)
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def root_index(self):
+        """Return the index of the base directory item."""
+        return self.index(0, 0)
+
+    def index_for_rel(self, rel):
+        """Return the index of a path relative to the base directory, listing folders on the way."""
+        index = self.root_index()
+        for name in rel.split("/") if rel else []:
+            node = self.node(index)
+            child = next((c for c in node.children if c.name == name), None)
+            while child is None and self.canFetchMore(index):
+                start = len(node.children)
+                self.fetchMore(index)
+                child = next((c for c in node.children[start:] if c.name == name), None)
+            if child is None:
+                return QModelIndex()
+            index = self.node_index(child)
+        return index
+
+
+class ScriptFilterProxy(QSortFilterProxyModel):
+    """Shows only the scripts matching a Search, and the folders that contain them.
+
+    Folders are kept by checking the search's bitset over their range of the
+    index, so matches are found in folders that were never listed.
+    """
+
+    def __init__(self, base_dir, parent=None):
+        super().__init__(parent)
+        self.base = str(base_dir)
+        self.search = None
+
+    def set_search(self, search):
+        """Filter by search, or show everything when it is None."""
+        self.search = search
+        self.invalidateFilter()
+
+    def relative(self, path):
+        return "" if path == self.base else path[len(self.base) + 1:]
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        search = self.search
+        if search is None or not search.terms:
+            return True
+        node = self.sourceModel().node(self.sourceModel().index(source_row, 0, source_parent))
+        rel = self.relative(str(node.path))
+        if node.is_dir:
+            return rel == "" or search.matches_in_folder(rel)
+        return search.matches_rel(rel)
+
+
+class CatalogLoader(QThread):
+    """Loads (or scans) a ScriptCatalog off the GUI thread, reporting progress as it goes."""
+    progress = Signal(int, int)  # directories, files
+    loaded = Signal(object)  # the ScriptCatalog
+
+    def __init__(self, base_dir, parent=None):
+        super().__init__(parent)
+        self.base_dir = base_dir
+        self.catalog = None  # Set before loaded is emitted
+
+    def run(self):
+        self.catalog = catalog = ScriptCatalog(self.base_dir)
+        catalog.progress = self.progress.emit
+        try:
+            catalog.load()
+        except OSError as e:
+            logging.warning(f"Could not save script catalog: {e}")
+        catalog.progress = None
+        self.loaded.emit(catalog)
+
+
+class SearchIndexBuilder(QThread):
+    """Builds a SearchIndex from a snapshot of catalog paths and titles off the GUI thread."""
+    built = Signal(object)  # the SearchIndex
+
+    def __init__(self, rels, titles, generation, parent=None):
+        super().__init__(parent)
+        self.rels = rels
+        self.titles = titles
+        self.generation = generation
+
+    def run(self):
+        index = SearchIndex(self.rels, self.titles)
+        index.generation = self.generation
+        self.built.emit(index)
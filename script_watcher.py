@@ -0,0 +1,69 @@
+import os
+
+from PySide6.QtCore import QElapsedTimer, QFileSystemWatcher, QObject, QTimer, Signal
+
+# Quiet period after the last event before a batch is delivered, in milliseconds
+DEFAULT_DEBOUNCE_MS = 250
+# Upper bound on how long a steady stream of events can delay a batch
+DEFAULT_MAX_DELAY_MS = 2000
+
+
+class ScriptWatcher(QObject):
+    """Watch script directories and report changes in debounced, coalesced batches.
+
+    Every directory that changed while events kept arriving is reported once
+    in a single directories_changed emission, so a bulk update of thousands of
+    files costs one refresh.
+    """
+    directories_changed = Signal(list)  # sorted, de-duplicated directory paths
+
+    def __init__(self, parent=None, debounce_ms=DEFAULT_DEBOUNCE_MS, max_delay_ms=DEFAULT_MAX_DELAY_MS):
+        super().__init__(parent)
+        self.max_delay_ms = max_delay_ms
+        self.watched = set()
+        self.pending = set()
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_directory_changed)
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(debounce_ms)
+        self.debounce_timer.timeout.connect(self.flush)
+        self.first_event = QElapsedTimer()
+
+    def watch(self, path):
+        """Start watching a directory."""
+        self.watch_many([path])
+
+    def watch_many(self, paths):
+        """Start watching several directories; already watched ones are skipped."""
+        new = [str(p) for p in paths if str(p) not in self.watched]
+        if new:
+            failed = set(self.watcher.addPaths(new))
+            self.watched.update(p for p in new if p not in failed)
+
+    def unwatch_many(self, paths):
+        """Stop watching directories that were removed."""
+        old = [str(p) for p in paths if str(p) in self.watched]
+        if old:
+            self.watcher.removePaths(old)
+            self.watched.difference_update(old)
+
+    def _on_directory_changed(self, path):
+        if not self.pending:
+            self.first_event.start()
+        self.pending.add(path)
+        if not os.path.isdir(path):
+            self.watched.discard(path)  # Qt drops watches on deleted directories
+        if self.first_event.elapsed() >= self.max_delay_ms:
+            self.flush()
+        else:
+            self.debounce_timer.start()
+
+    def flush(self):
+        """Deliver the pending batch now."""
+        self.debounce_timer.stop()
+        if self.pending:
+            batch, self.pending = sorted(self.pending), set()
+            self.directories_changed.emit(batch)
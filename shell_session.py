@@ -0,0 +1,167 @@
+"""Long-lived bash sessions that run many scripts without a fork/exec from the caller each time.
+
+Each script runs in its own subshell of the session, with stdin from
+/dev/null and $0 set to the script path, so it cannot change the session's
+state. The end of a script's output is framed by a marker line carrying a
+random token and the exit status.
+"""
+import codecs
+import queue
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+
+from script_runner import (
+    CHUNK_SIZE,
+    DEFAULT_TAIL_CHARS,
+    LineSplitter,
+    OutputTail,
+    ResourceUsage,
+    kill_process_group,
+    script_env,
+)
+
+# Script types a session can run; anything else uses a normal process
+SESSION_SUFFIXES = {".sh"}
+MARKER_PREFIX = "__SCRIPT_EXECUTOR_END_"
+
+
+class SessionError(OSError):
+    """Raised when a session's shell exits unexpectedly."""
+
+
+class ShellSession:
+    """One bash process that runs scripts in isolated subshells, one at a time."""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(["bash", "--noprofile", "--norc"], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=script_env(),
+                                     start_new_session=True)
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.scripts_run = 0
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def stream(self, script_path, on_chunk=None, on_lines=None, tail_chars=DEFAULT_TAIL_CHARS, watchdog=None):
+        """Run a script in a subshell; same contract as script_runner.stream_script.
+
+        Only the wall time is reported: the subshell is the session's child,
+        not ours, so its rusage can't be read here. A script stopped by the
+        watchdog takes the whole session down with it.
+        """
+        started = time.monotonic()
+        token = uuid.uuid4().hex
+        marker = f"{MARKER_PREFIX}{token} "
+        path = shlex.quote(str(script_path))
+        # The leading newline guarantees the marker starts a line; it is removed again below
+        command = f"( BASH_ARGV0={path}; . {path} ) </dev/null 2>&1; printf '\\n{marker}%d\\n' $?\n"
+        try:
+            self.proc.stdin.write(command.encode())
+            self.proc.stdin.flush()
+        except OSError as e:
+            raise SessionError(f"Shell session is gone: {e}") from e
+
+        if watchdog:
+            watchdog.watch(lambda: kill_process_group(self.proc))
+        try:
+            return self._read_until_marker(marker, on_chunk, on_lines, tail_chars, started, watchdog)
+        finally:
+            if watchdog:
+                watchdog.release()
+
+    def _read_until_marker(self, marker, on_chunk, on_lines, tail_chars, started, watchdog):
+        splitter = LineSplitter()
+        tail = OutputTail(tail_chars)
+        held = None  # Last line seen, held back in case it is the injected newline
+        while True:
+            data = self.proc.stdout.read1(CHUNK_SIZE)
+            if not data:
+                if watchdog and watchdog.reason:
+                    rest = ([held] if held is not None else []) + splitter.flush()
+                    if rest:
+                        tail.write("\n".join(rest))
+                        if on_lines:
+                            on_lines(rest)
+                    return self.proc.wait(), tail.getvalue(), ResourceUsage(time.monotonic() - started)
+                raise SessionError("Shell session exited while running a script")
+            out = []
+            returncode = None
+            partial = False  # The script's output did not end with a newline
+            for line in splitter.feed(self.decoder.decode(data)):
+                if line.startswith(marker):
+                    returncode = int(line[len(marker):])
+                    if held:
+                        out.append(held)
+                        partial = True
+                    held = None
+                    break
+                if held is not None:
+                    out.append(held)
+                held = line
+            if out:
+                text = "\n".join(out) if partial else "\n".join(out) + "\n"
+                tail.write(text)
+                if on_chunk:
+                    on_chunk(text)
+                if on_lines:
+                    on_lines(out)
+            if returncode is not None:
+                self.scripts_run += 1
+                return returncode, tail.getvalue(), ResourceUsage(time.monotonic() - started)
+
+    def close(self):
+        if self.alive():
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+class SessionPool:
+    """Idle shell sessions shared by worker threads; a new one is started when none is free."""
+
+    def __init__(self):
+        self.idle = queue.SimpleQueue()
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            try:
+                session = self.idle.get_nowait()
+            except queue.Empty:
+                session = ShellSession()
+                with self.lock:
+                    self.sessions.append(session)
+                return session
+            if session.alive():
+                return session
+
+    def release(self, session):
+        if session.alive():
+            self.idle.put(session)
+
+    def stream(self, script_path, on_chunk=None, on_lines=None, tail_chars=DEFAULT_TAIL_CHARS, watchdog=None):
+        """Run a script on a free session; a session that breaks is dropped."""
+        session = self.acquire()
+        try:
+            return session.stream(script_path, on_chunk=on_chunk, on_lines=on_lines, tail_chars=tail_chars,
+                                  watchdog=watchdog)
+        except SessionError:
+            session.close()
+            raise
+        finally:
+            self.release(session)
+
+    def close(self):
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.close()
@@ -0,0 +1,35 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep catalogs, the run history and the facts snapshot of every test in its own directory."""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+    return path / "script-executor"
+
+
+@pytest.fixture
+def write_script(tmp_path):
+    """Return a function that writes a script under tmp_path and returns its path."""
+    def write(rel, body="", header=()):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = ["#!/bin/bash", *(f"# {line}" for line in header), body]
+        path.write_text("\n".join(lines) + "\n")
+        return path
+    return write
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    widgets = pytest.importorskip("PySide6.QtWidgets")
+    return widgets.QApplication.instance() or widgets.QApplication([])
@@ -0,0 +1,75 @@
+import threading
+from pathlib import Path
+
+from fanout import FanoutRunner, Transport, TransportError
+from script_runner import ScriptRun, Status, run_status
+
+SCRIPTS = [Path(f"{i}_chk.sh") for i in range(4)]
+
+
+class FakeTransport(Transport):
+    def __init__(self, host, fail=()):
+        super().__init__(host)
+        self.fail = fail
+
+    def run(self, script_path, on_lines=None, control=None, timeout=None):
+        if script_path in self.fail:
+            raise ValueError("broken transport")
+        return ScriptRun(script_path, 0, "ok\n", False)
+
+    def close(self):
+        pass
+
+
+def run_in_thread(runner, **kwargs):
+    """Run runner in a thread and return its results, or None if it did not finish in time."""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(runner.run(SCRIPTS, **kwargs)), daemon=True)
+    thread.start()
+    thread.join(10)
+    return None if thread.is_alive() else results[0]
+
+
+def test_every_host_runs_every_script():
+    runner = FanoutRunner(["a", "b"], transport_factory=FakeTransport, per_host_limit=2)
+    results = run_in_thread(runner)
+    assert sorted((host, script) for host, script, _, _ in results) == sorted(
+        (host, script) for host in ("a", "b") for script in SCRIPTS)
+    assert all(run_status(outcome) is Status.PASS for _, _, outcome, _ in results)
+
+
+def test_failing_result_callback_still_frees_the_slot():
+    calls = []
+
+    def on_result(host, script_path, outcome, duration):
+        calls.append(script_path)
+        raise RuntimeError("callback failed")
+
+    runner = FanoutRunner(["a"], transport_factory=FakeTransport, per_host_limit=1, global_limit=1)
+    results = run_in_thread(runner, on_result=on_result)
+    assert results is not None
+    assert len(calls) == len(results) == len(SCRIPTS)
+
+
+def test_transport_exceptions_become_error_results():
+    # Regression: an exception other than OSError left the host's slot taken and the run hung
+    runner = FanoutRunner(["a"], transport_factory=lambda host: FakeTransport(host, fail={SCRIPTS[1]}),
+                          per_host_limit=1)
+    results = run_in_thread(runner)
+    assert results is not None
+    outcomes = {script: outcome for _, script, outcome, _ in results}
+    assert isinstance(outcomes[SCRIPTS[1]], TransportError)
+    assert all(isinstance(outcomes[script], ScriptRun) for script in SCRIPTS if script != SCRIPTS[1])
+
+
+def test_cancel_reports_undispatched_tasks_as_cancelled():
+    runner = FanoutRunner(["a"], transport_factory=FakeTransport, per_host_limit=1, global_limit=1)
+
+    def on_result(host, script_path, outcome, duration):
+        runner.cancel()
+
+    results = run_in_thread(runner, on_result=on_result)
+    assert len(results) == len(SCRIPTS)
+    statuses = [run_status(outcome) for _, _, outcome, _ in results]
+    assert statuses[0] is Status.PASS
+    assert Status.CANCELLED in statuses
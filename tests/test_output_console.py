@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+
+A, B, C = Path("/scripts/a_chk.sh"), Path("/scripts/b_chk.sh"), Path("/scripts/c_chk.sh")
+
+
+@pytest.fixture
+def console(qapp):
+    from output_console import OutputConsole
+    return OutputConsole(max_lines=4)
+
+
+def listed(console):
+    return [console.filter_combo.itemData(i) for i in range(console.filter_combo.count())]
+
+
+def test_scripts_are_listed_once(console):
+    console.append_lines(["1"], A)
+    console.append_lines(["2"], A)
+    console.append_lines(["3"], B)
+    assert listed(console) == [None, str(A), str(B)]
+
+
+def test_evicted_script_leaves_the_list(console):
+    console.append_lines(["a1", "a2"], A)
+    console.append_lines(["b1", "b2", "b3", "b4"], B)
+    assert listed(console) == [None, str(B)]
+    assert console.line_counts == {str(B): 4}
+
+
+def test_eviction_above_the_selection_does_not_refilter(console, monkeypatch):
+    # Regression: removing an entry above the selected one moved the current index and refiltered the view
+    console.append_lines(["a1"], A)
+    console.append_lines(["b1"], B)
+    console.filter_combo.setCurrentIndex(2)
+    assert console.script_filter == str(B)
+    refilters = []
+    monkeypatch.setattr(console, "set_script_filter", refilters.append)
+    console.append_lines(["c1", "c2", "c3"], C)
+    assert listed(console) == [None, str(B), str(C)]
+    assert refilters == []
+    assert console.filter_combo.currentData() == str(B)
+
+
+def test_selected_script_stays_listed_until_the_filter_changes(console):
+    console.append_lines(["a1"], A)
+    console.filter_combo.setCurrentIndex(1)
+    console.append_lines(["b1", "b2", "b3", "b4"], B)
+    assert listed(console) == [None, str(A), str(B)]
+    console.filter_combo.setCurrentIndex(0)
+    assert listed(console) == [None, str(B)]
+
+
+def test_filter_shows_one_script(console):
+    console.append_lines(["a1"], A)
+    console.append_lines(["b1"], B)
+    console.append("note")
+    console.filter_combo.setCurrentIndex(2)
+    assert console.toPlainText() == "b1\nnote"
+
+
+def test_clear_resets_the_list(console):
+    console.append_lines(["a1"], A)
+    console.filter_combo.setCurrentIndex(1)
+    console.clear()
+    assert listed(console) == [None]
+    assert console.script_filter is None
+    assert console.toPlainText() == ""
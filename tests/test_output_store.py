@@ -0,0 +1,115 @@
+import pytest
+
+from output_store import OutputStore, preview
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OutputStore(spill_threshold=100, spill_dir=str(tmp_path))
+    yield store
+    store.clear()
+
+
+def numbered_lines(count, text="line"):
+    return "".join(f"{text} {i}\n" for i in range(count))
+
+
+def test_small_output_stays_in_memory(store):
+    offset, length = store.append("hello\n")
+    assert store.read(offset, length) == "hello\n"
+    assert not store.is_spilled(offset)
+    assert store.size() == 6
+
+
+def test_large_output_is_spilled(store):
+    text = numbered_lines(50, "ünïcode")
+    offset, length = store.append(text)
+    assert length == len(text)
+    assert store.is_spilled(offset)
+    assert store.byte_size(offset) == len(text.encode())
+    assert store.read(offset, length) == text
+    assert store.size() == 0
+    assert store.tail(offset, 20) == text.encode()[-20:].decode("utf-8", "replace").lstrip("�")
+
+
+def test_offsets_only_grow(store):
+    first = store.append("a" * 10)
+    second = store.append(numbered_lines(50))
+    third = store.append("b" * 10)
+    assert first[0] < second[0] < third[0]
+    assert [store.read(*ref) for ref in (first, third)] == ["a" * 10, "b" * 10]
+
+
+def test_writer_spills_once_over_the_threshold(store):
+    writer = store.writer()
+    chunks = [numbered_lines(5, f"chunk{i}") for i in range(10)]
+    for chunk in chunks:
+        writer.write(chunk)
+    assert writer.file is not None
+    offset, length = writer.finish()
+    assert store.is_spilled(offset)
+    assert store.read(offset, length) == "".join(chunks)
+
+
+def test_small_writer_output_stays_in_memory(store):
+    writer = store.writer()
+    writer.write("short\n")
+    offset, length = writer.finish()
+    assert not store.is_spilled(offset)
+    assert store.read(offset, length) == "short\n"
+
+
+def test_read_window_pages_end_at_lines(store):
+    text = numbered_lines(200, "€ page")
+    offset, _ = store.append(text)
+    pages, start = [], 0
+    while start < store.byte_size(offset):
+        page, start = store.read_window(offset, start, 64)
+        assert page.endswith("\n")
+        pages.append(page)
+    assert len(pages) > 1
+    assert "".join(pages) == text
+
+
+def test_read_window_cuts_a_long_line_between_characters(store):
+    text = "é" * 500
+    offset, _ = store.append(text)
+    page, start = store.read_window(offset, 0, 101)
+    rest, end = store.read_window(offset, start, 10_000)
+    assert "�" not in page + rest
+    assert page + rest == text
+    assert end == store.byte_size(offset)
+
+
+def test_read_window_of_in_memory_output(store):
+    offset, _ = store.append("small\n")
+    assert store.read_window(offset, 0, 64) == (None, None)
+
+
+def test_oldest_in_memory_output_is_dropped(tmp_path):
+    store = OutputStore(max_chars=10, spill_threshold=100, spill_dir=str(tmp_path))
+    old = store.append("a" * 6)
+    new = store.append("b" * 6)
+    assert store.read(*old) is None
+    assert store.read(*new) == "b" * 6
+
+
+def test_oldest_run_spill_file_is_deleted(tmp_path):
+    store = OutputStore(spill_threshold=10, max_spill_bytes=150, spill_dir=str(tmp_path))
+    try:
+        old = store.append("x" * 100)
+        store.start_run()
+        same_run = [store.append("y" * 100), store.append("z" * 100)]
+        # The current run's file is kept even over the limit
+        assert [store.read(*ref) for ref in same_run] == ["y" * 100, "z" * 100]
+        assert store.read(*old) is None
+    finally:
+        store.clear()
+
+
+def test_preview_starts_at_a_line():
+    text = numbered_lines(100)
+    shown = preview(text, 50)
+    assert shown.startswith("[... ") and text.endswith(shown.split("\n", 1)[1])
+    assert shown.split("\n", 1)[1].startswith("line ")
+    assert preview("short", 50) == "short"
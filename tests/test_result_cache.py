@@ -0,0 +1,87 @@
+import os
+
+from result_cache import ResultCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return ResultCache(path=tmp_path / "results.json", **kwargs)
+
+
+def test_get_returns_what_was_put(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("key", "1_chk.sh", "ok\n", False, 0)
+    entry = cache.get("key")
+    assert (entry["output"], entry["failed"], entry["returncode"]) == ("ok\n", False, 0)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = make_cache(tmp_path, ttl=10)
+    cache.put("key", "1_chk.sh", "ok\n", False, 0)
+    cache.entries["key"]["stored"] -= 11
+    assert cache.get("key") is None
+    assert "key" not in cache.entries
+    assert cache.size == 0
+
+
+def test_expired_entries_are_not_loaded(tmp_path):
+    cache = make_cache(tmp_path, ttl=10)
+    cache.put("old", "1_chk.sh", "ok\n", False, 0)
+    cache.put("new", "2_chk.sh", "ok\n", False, 0)
+    cache.entries["old"]["stored"] -= 11
+    cache.save()
+    loaded = make_cache(tmp_path, ttl=10)
+    loaded.load()
+    assert list(loaded.entries) == ["new"]
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.put("a", "a_chk.sh", "a", False, 0)
+    cache.put("b", "b_chk.sh", "b", False, 0)
+    cache.get("a")
+    cache.put("c", "c_chk.sh", "c", False, 0)
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_stored_output_stays_under_max_bytes(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=10)
+    cache.put("a", "a_chk.sh", "x" * 6, False, 0)
+    cache.put("b", "b_chk.sh", "y" * 6, False, 0)
+    assert list(cache.entries) == ["b"]
+    assert cache.size == 6
+
+
+def test_only_checks_with_cache_inputs_have_a_key(tmp_path, write_script):
+    cache = make_cache(tmp_path)
+    assert cache.key_for(write_script("1_chk.sh")) is None
+    assert cache.key_for(write_script("2_rem.sh", header=["cache-inputs: none"])) is None
+    assert cache.key_for(write_script("3_chk.sh", header=["cache-inputs: bogus:thing"])) is None
+    assert cache.key_for(write_script("4_chk.sh", header=["cache-inputs: none"])) is not None
+
+
+def test_key_changes_with_the_script_and_its_inputs(tmp_path, write_script):
+    config = tmp_path / "sshd_config"
+    config.write_text("PermitRootLogin no\n")
+    script = write_script("1_chk.sh", "grep PermitRootLogin", header=[f"cache-inputs: file:{config}"])
+    cache = make_cache(tmp_path)
+    key = cache.key_for(script)
+    assert key is not None and cache.key_for(script) == key
+
+    config.write_text("PermitRootLogin yes\nPort 22\n")
+    input_changed = cache.key_for(script)
+    assert input_changed != key
+
+    st = os.stat(script)
+    script.write_text(script.read_text() + "echo done\n")
+    os.utime(script, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert cache.key_for(script) not in (key, input_changed)
+
+
+def test_key_tracks_a_missing_input(tmp_path, write_script):
+    config = tmp_path / "limits.conf"
+    script = write_script("1_chk.sh", header=[f"cache-inputs: file:{config}"])
+    cache = make_cache(tmp_path)
+    missing = cache.key_for(script)
+    config.write_text("* hard core 0\n")
+    assert cache.key_for(script) != missing
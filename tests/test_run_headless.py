@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import run_headless
+from facts_prefetch import MANIFEST_NAME
+from run_history import RunHistory
+
+
+@pytest.fixture
+def tree(write_script, tmp_path):
+    base = tmp_path / "scripts"
+    write_script("scripts/1_initial/1.1_chk.sh", "echo ok")
+    write_script("scripts/1_initial/1.2_chk.sh", "echo 'FAIL: not configured'")
+    write_script("scripts/2_services/2.1_chk.sh", "echo ok; exit 3")
+    write_script("scripts/2_services/2.1_rem.sh", "echo fixed")
+    return base
+
+
+def run(capsys, *args):
+    code = run_headless.main([*map(str, args)])
+    return code, capsys.readouterr()
+
+
+def test_json_run(tree, capsys):
+    code, out = run(capsys, "-b", tree, "-k", "chk", "--format", "json", "--no-history")
+    document = json.loads(out.out)
+    assert code == 1
+    statuses = {record["script"].rpartition("/")[2]: record["status"] for record in document["results"]}
+    assert statuses == {"1.1_chk.sh": "PASS", "1.2_chk.sh": "FAIL", "2.1_chk.sh": "ERROR"}
+    summary = document["summary"]
+    assert (summary["total"], summary["passed"], summary["failed"], summary["errors"]) == (3, 1, 1, 1)
+
+
+def test_jsonl_ends_with_the_summary(tree, capsys):
+    code, out = run(capsys, "-b", tree, "-f", "1_initial", "--format", "jsonl", "--no-history")
+    *results, last = [json.loads(line) for line in out.out.splitlines()]
+    assert code == 1
+    assert [record["status"] for record in results] == ["PASS", "FAIL"]
+    assert last["summary"]["total"] == 2
+
+
+def test_all_passing_run_exits_0(tree, capsys):
+    code, out = run(capsys, "-b", tree, "-k", "rem", "--format", "text", "--no-history")
+    assert code == 0
+    assert "1 passed, 0 failed" in out.out
+
+
+def test_run_is_recorded_and_rerun_picks_the_failures(tree, capsys, cache_dir):
+    run(capsys, "-b", tree, "-k", "chk", "--format", "text")
+    history = RunHistory()
+    try:
+        run_id, failed = history.failed_scripts()
+        assert history.run(run_id)["total"] == 3
+    finally:
+        history.close()
+    assert [path.rpartition("/")[2] for path in failed] == ["1.2_chk.sh", "2.1_chk.sh"]
+
+    code, out = run(capsys, "-b", tree, "--rerun-failures", "--list")
+    assert code == 0
+    assert [line.rpartition("/")[2] for line in out.out.splitlines()] == ["1.2_chk.sh", "2.1_chk.sh"]
+
+
+def test_non_positive_jobs_are_rejected(tree, capsys):
+    with pytest.raises(SystemExit):
+        run_headless.main(["-b", str(tree), "-k", "chk", "-j", "0"])
+    assert "at least 1" in capsys.readouterr().err
+
+
+def test_stale_facts_are_dropped_when_nothing_is_prefetched(tree, capsys, cache_dir):
+    # Regression: a run without prefetch left earlier facts in place for its scripts to read
+    facts = cache_dir / "facts"
+    facts.mkdir(parents=True)
+    (facts / "sysctl-a.txt").write_text("kernel.randomize_va_space = 2\n")
+    (facts / MANIFEST_NAME).write_text(json.dumps({"sysctl": {"collected": 0, "seconds": 1.0, "inputs": {}}}))
+    run(capsys, "-b", tree, "-k", "chk", "--format", "text", "--no-history")
+    assert not (facts / "sysctl-a.txt").exists()
+    assert not (facts / MANIFEST_NAME).exists()
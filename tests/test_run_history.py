@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pytest
+
+from run_history import RunHistory
+from script_runner import ResourceUsage, ScriptResult, Status
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = RunHistory(tmp_path / "history.sqlite3")
+    yield history
+    history.close()
+
+
+def record_run(history, statuses, started, cached=(), walls=None):
+    """Store a finished run with {script: Status} results and return its id."""
+    run_id = history.start_run("test", started=started)
+    results = []
+    for script, status in statuses.items():
+        usage = ResourceUsage(walls[script]) if walls and script in walls else None
+        result = ScriptResult(Path(script), None, status, 0 if status is Status.PASS else 1, usage,
+                              cached=script in cached)
+        results.append((result, f"{script}: {status.value}\n", started))
+    history.add_results(run_id, results)
+    history.finish_run(run_id, finished=started + 1)
+    return run_id
+
+
+def test_finished_run_has_its_totals(history):
+    run_id = record_run(history, {"a.sh": Status.PASS, "b.sh": Status.FAIL, "c.sh": Status.TIMEOUT}, 100)
+    run = history.run(run_id)
+    assert (run["total"], run["passed"], run["failed"], run["errors"], run["timeouts"]) == (3, 1, 1, 0, 1)
+    assert history.last_run_id() == run_id
+    assert history.failed_scripts() == (run_id, ["b.sh", "c.sh"])
+
+
+def test_outputs_are_stored(history):
+    run_id = record_run(history, {"a.sh": Status.PASS}, 100)
+    (result_id, *_), = history.run_results(run_id)
+    assert history.output(result_id) == "a.sh: PASS\n"
+
+
+def test_flaky_scripts_count_verdict_flips(history):
+    record_run(history, {"flaky.sh": Status.PASS, "steady.sh": Status.PASS}, 100)
+    record_run(history, {"flaky.sh": Status.FAIL, "steady.sh": Status.PASS}, 200)
+    record_run(history, {"flaky.sh": Status.PASS, "steady.sh": Status.ERROR}, 300)
+    assert history.flaky_scripts(last_runs=20, min_flips=2) == [("flaky.sh", "", 2, 3, 1)]
+    assert history.flaky_scripts(last_runs=2, min_flips=2) == []
+
+
+def test_cached_results_are_not_flips(history):
+    record_run(history, {"a.sh": Status.PASS}, 100)
+    record_run(history, {"a.sh": Status.FAIL}, 200, cached={"a.sh"})
+    record_run(history, {"a.sh": Status.PASS}, 300)
+    assert history.flaky_scripts(min_flips=1) == []
+
+
+def test_diff_runs(history):
+    old = record_run(history, {"a.sh": Status.PASS, "b.sh": Status.FAIL, "same.sh": Status.PASS}, 100)
+    new = record_run(history, {"a.sh": Status.FAIL, "c.sh": Status.PASS, "same.sh": Status.PASS}, 200)
+    assert history.diff_runs(old, new) == [("a.sh", "", "PASS", "FAIL"), ("b.sh", "", "FAIL", None),
+                                           ("c.sh", "", None, "PASS")]
+
+
+def test_duration_trend_is_newest_first(history):
+    first = record_run(history, {"a.sh": Status.PASS}, 100, walls={"a.sh": 1.5})
+    second = record_run(history, {"a.sh": Status.FAIL}, 200, walls={"a.sh": 2.5})
+    assert history.duration_trend("a.sh") == [(second, 200, "FAIL", 2.5), (first, 100, "PASS", 1.5)]
+    assert history.duration_trend("a.sh", limit=1) == [(second, 200, "FAIL", 2.5)]
+    assert dict(history.recent_durations()) == {"a.sh": [1.5, 2.5]}
+
+
+def test_fixed_since(history):
+    record_run(history, {"old.sh": Status.FAIL}, 100)
+    record_run(history, {"fixed.sh": Status.FAIL, "broken.sh": Status.FAIL, "old.sh": Status.PASS}, 200)
+    record_run(history, {"fixed.sh": Status.PASS, "broken.sh": Status.FAIL}, 300)
+    # An ERROR is no verdict, so fixed.sh stays fixed
+    record_run(history, {"fixed.sh": Status.ERROR}, 400)
+    assert history.fixed_since(150) == [("fixed.sh", "")]
+    assert history.fixed_since(50) == [("fixed.sh", ""), ("old.sh", "")]
+    assert history.fixed_since(500) == []
+
+
+def test_old_runs_are_dropped(tmp_path):
+    history = RunHistory(tmp_path / "history.sqlite3", max_runs=2)
+    try:
+        ids = [record_run(history, {"a.sh": Status.PASS}, started) for started in (100, 200, 300)]
+        assert [run["id"] for run in history.recent_runs()] == ids[:0:-1]
+    finally:
+        history.close()
@@ -0,0 +1,140 @@
+import pytest
+
+from script_dag import CycleError, DagScheduler
+
+
+def pop_all(scheduler):
+    popped = []
+    while (script := scheduler.pop_ready()) is not None:
+        popped.append(script)
+    return popped
+
+
+def test_ready_scripts_come_in_submission_order(write_script):
+    scripts = [write_script(f"{name}_chk.sh") for name in ("c", "a", "b")]
+    scheduler = DagScheduler()
+    assert scheduler.add(scripts) == scripts
+    assert pop_all(scheduler) == scripts
+
+
+def test_longest_chain_first_with_durations(write_script):
+    short, long_, chained = (write_script(f"{name}_chk.sh") for name in ("short", "long", "chained"))
+    before = write_script("before_chk.sh", header=["depends: chained_chk.sh"])
+    # chained is short itself, but before waits on it: 1 + 5 beats long's 4
+    durations = {short: 1.0, long_: 4.0, chained: 1.0, before: 5.0}
+    scheduler = DagScheduler(durations=durations)
+    scheduler.add([short, long_, chained, before])
+    assert pop_all(scheduler) == [chained, long_, short]
+
+
+def test_dependents_wait_for_their_dependencies(write_script):
+    first = write_script("1_rem.sh")
+    second = write_script("2_rem.sh", header=["depends: 1_rem.sh"])
+    scheduler = DagScheduler()
+    scheduler.add([second, first])
+    assert pop_all(scheduler) == [first]
+    scheduler.finish(first)
+    assert pop_all(scheduler) == [second]
+
+
+def test_dependencies_outside_the_run_are_ignored(write_script):
+    write_script("1_rem.sh")
+    second = write_script("2_rem.sh", header=["depends: 1_rem.sh"])
+    scheduler = DagScheduler()
+    scheduler.add([second])
+    assert pop_all(scheduler) == [second]
+
+
+def test_exclusive_groups_never_overlap(write_script):
+    first = write_script("1_rem.sh", header=["exclusive: apt"])
+    second = write_script("2_rem.sh", header=["exclusive: apt"])
+    other = write_script("3_rem.sh")
+    scheduler = DagScheduler()
+    scheduler.add([first, second, other])
+    assert pop_all(scheduler) == [first, other]
+    scheduler.finish(first)
+    assert pop_all(scheduler) == [second]
+
+
+def test_conflicts_keep_a_pair_apart(write_script):
+    first = write_script("1_rem.sh", header=["conflicts: 2_rem.sh"])
+    second = write_script("2_rem.sh")
+    scheduler = DagScheduler()
+    scheduler.add([first, second])
+    assert pop_all(scheduler) == [first]
+    scheduler.finish(first)
+    assert pop_all(scheduler) == [second]
+
+
+def test_class_limits(write_script):
+    scripts = [write_script(f"{i}_chk.sh", header=["resource-class: io-heavy"]) for i in range(3)]
+    scheduler = DagScheduler(class_limits={"io": 2})
+    scheduler.add(scripts)
+    assert pop_all(scheduler) == scripts[:2]
+    scheduler.finish(scripts[0])
+    assert pop_all(scheduler) == scripts[2:]
+
+
+def test_class_limit_can_change_during_a_run(write_script):
+    scripts = [write_script(f"{i}_chk.sh", header=["resource-class: io"]) for i in range(3)]
+    scheduler = DagScheduler(class_limits={"io": 1})
+    scheduler.add(scripts)
+    assert pop_all(scheduler) == scripts[:1]
+    scheduler.set_class_limit("io", 3)
+    assert pop_all(scheduler) == scripts[1:]
+
+
+def test_cycle_is_rejected_and_nothing_queued(write_script):
+    first = write_script("1_rem.sh", header=["depends: 2_rem.sh"])
+    second = write_script("2_rem.sh", header=["depends: 1_rem.sh"])
+    scheduler = DagScheduler()
+    with pytest.raises(CycleError) as error:
+        scheduler.add([first, second])
+    assert set(error.value.cycle) == {first, second}
+    assert scheduler.pending_count() == 0
+    assert scheduler.pop_ready() is None
+
+
+def test_finished_scripts_are_queued_again(write_script):
+    # Regression: a script run once was never handed out again in the same session
+    script = write_script("1_chk.sh")
+    scheduler = DagScheduler()
+    scheduler.add([script])
+    assert scheduler.pop_ready() == script
+    scheduler.finish(script)
+    assert scheduler.add([script]) == [script]
+    assert scheduler.pop_ready() == script
+
+
+def test_queued_or_running_scripts_are_not_queued_twice(write_script):
+    running, queued = write_script("1_chk.sh"), write_script("2_chk.sh", header=["depends: 1_chk.sh"])
+    scheduler = DagScheduler()
+    scheduler.add([running, queued])
+    assert scheduler.pop_ready() == running
+    assert scheduler.add([running, queued]) == []
+    assert scheduler.pending_count() == 1
+
+
+def test_drained_scripts_are_queued_again(write_script):
+    scripts = [write_script(f"{i}_chk.sh") for i in range(2)]
+    scheduler = DagScheduler()
+    scheduler.add(scripts)
+    assert scheduler.drain() == scripts
+    assert scheduler.pop_ready() is None
+    assert scheduler.add(scripts) == scripts
+    assert pop_all(scheduler) == scripts
+
+
+def test_requeued_dependent_waits_for_running_dependency(write_script):
+    first = write_script("1_rem.sh")
+    second = write_script("2_rem.sh", header=["depends: 1_rem.sh"])
+    scheduler = DagScheduler()
+    scheduler.add([first, second])
+    scheduler.finish(scheduler.pop_ready())
+    scheduler.finish(scheduler.pop_ready())
+    scheduler.add([first])
+    assert scheduler.pop_ready() == first
+    scheduler.add([second])
+    assert scheduler.pop_ready() is None
+    scheduler.finish(first)
+    assert scheduler.pop_ready() == second
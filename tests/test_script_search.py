@@ -0,0 +1,88 @@
+from script_search import VERIFY_BATCH, SearchIndex
+
+RELS = ["1_initial/1.1_fs/1.1.1_chk.sh", "1_initial/1.1_fs/1.1.1_rem.sh", "1_initial/1.1_fs/1.1.3.2_chk.sh",
+        "2_services/2.1_chk.sh"]
+TITLES = ["Ensure cramfs is disabled", "Disable cramfs", "Ensure nodev on /tmp", "Ensure sshd is configured"]
+
+
+def is_subsequence(term, text):
+    chars = iter(text)
+    return all(char in chars for char in term)
+
+
+def run(search, budget=0.003):
+    steps = 1
+    while not search.step(budget):
+        steps += 1
+    return steps
+
+
+def matches(index, query):
+    search = index.search(query)
+    run(search)
+    return search.matched_rels()
+
+
+def test_terms_match_as_subsequences_of_any_field():
+    index = SearchIndex(RELS, TITLES)
+    assert matches(index, "crmfs") == RELS[:2]
+    assert matches(index, "1.1.3") == [RELS[2]]
+    assert matches(index, "services") == [RELS[3]]
+    assert matches(index, "ENSURE chk") == [RELS[0], RELS[2], RELS[3]]
+
+
+def test_every_term_has_to_match_within_one_field():
+    index = SearchIndex(RELS, TITLES)
+    # "cramfs" is in the title and "_rem" in the name, but "cramfs_rem" is in neither
+    assert matches(index, "cramfs _rem") == [RELS[1]]
+    assert matches(index, "cramfs_rem") == []
+
+
+def test_empty_query_matches_everything():
+    search = SearchIndex(RELS, TITLES).search("  ")
+    assert search.done
+    assert search.matched_rels() == RELS
+
+
+def test_prefilter_result_is_a_superset_until_done():
+    index = SearchIndex(RELS, TITLES)
+    # The cramfs scripts have every character of "sfmarc" in their title, 1.1.3.2 spread over its fields
+    search = index.search("sfmarc")
+    assert not search.done and search.count() == 3
+    run(search)
+    assert search.count() == 0
+
+
+def test_refining_a_query_starts_from_the_previous_result():
+    index = SearchIndex(RELS, TITLES)
+    previous = index.search("ensure")
+    run(previous)
+    refined = index.search("ensure cra", previous)
+    assert refined.bits & ~previous.bits == 0
+    run(refined)
+    assert refined.matched_rels() == [RELS[0]]
+
+
+def test_folder_matches():
+    index = SearchIndex(RELS, TITLES)
+    search = index.search("sshd")
+    run(search)
+    assert search.matches_in_folder("2_services")
+    assert not search.matches_in_folder("1_initial")
+    assert search.matches_in_folder("")
+    assert search.matches_rel(RELS[3]) and not search.matches_rel(RELS[0])
+
+
+def test_step_budget_spreads_a_large_search_over_several_steps():
+    count = 3 * VERIFY_BATCH + 10
+    rels = [f"d{i // 100:04d}/{i:06d}_chk.sh" for i in range(count)]
+    index = SearchIndex(rels, [""] * count)
+    expected = [rel for rel in rels if any(is_subsequence("73", field) for field in rel.split("/"))]
+
+    exhaustive = index.search("73")
+    assert run(exhaustive, budget=60) == 1
+    stepped = index.search("73")
+    # A budget of 0 stops after every batch
+    assert run(stepped, budget=0) == 4
+    assert stepped.matched_rels() == exhaustive.matched_rels()
+    assert stepped.matched_rels() == expected